@@ -61,7 +61,22 @@ validate_labels_path = intermediate_dir + "/validate_labels.npy"
 test_features_path = intermediate_dir + "/test_features.npy"
 test_labels_prob_path = intermediate_dir + "/test_labels_prob.npy"
 
+# The hyper-parameters search results log
+search_log_path = intermediate_dir + "/search_results.jsonl"
+
 # The trained n-gram model file
 ngram_model_path = "../out/counter.pkl"
+# The compact n-gram counts store file
+ngram_store_path = "../out/ngram_store.npz"
+# The binary n-gram model bundle opened through mmap
+ngram_bundle_path = "../out/ngram_model.bin"
+# The binary bundle of reversed n-grams (the right context index)
+ngram_reversed_bundle_path = "../out/ngram_model_reversed.bin"
+# The compiled context to best article decision table
+ngram_decision_table_path = "../out/ngram_decisions.npz"
+# The pruned n-gram model bundle
+ngram_pruned_path = "../out/ngram_model_pruned.bin"
+# The n-gram model with quantized log probabilities
+ngram_quantized_path = "../out/ngram_model_quantized.npz"
 # The test results file
 test_reults_path = out_dir + "/submission_test.txt"
\ No newline at end of file
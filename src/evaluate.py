@@ -4,6 +4,8 @@ Perform prediction results evaluation
 import json
 import argparse
 
+import numpy as np
+
 def evaluate(text_file, correct_file, submission_file):
     with open(text_file) as f:
         text = json.load(f)
@@ -34,28 +36,81 @@ def evaluate(text_file, correct_file, submission_file):
                         
                 if s is None or s[0] == w:
                     s = ['', float('-inf')]
-                data.append((-s[1], s[0] == c, c is not None)) # (confidence, TP, TP + FN)
+                data.append((-s[1], s[0] == c, c is not None)) # (-confidence, TP, TP + FN)
                 
-    data.sort()
-    fp2 = 0
-    fp = 0
-    tp = 0
-    all_mistakes = sum(x[2] for x in data)
-    score = 0
-    acc = 0
-    for _, c, r in data:
-        fp2 += not c #=~TP
-        fp += not r #=~(TP + FN)
-        tp += c
-        acc = max(acc, 1 - (0. + fp + all_mistakes - tp) / len(data))
-        if fp2 * 1. / len(data) <= 0.02:
-            score = tp * 1. / all_mistakes
+    # the corpora without articles scored as zero
+    neg_confidence, is_correct, is_mistake = zip(*data) if len(data) > 0 else ((), (), ())
+    score, acc = targetScore(-np.array(neg_confidence), is_correct, is_mistake)
+    tp = sum(is_correct)
+    fp = len(data) - sum(is_mistake)
+    fp2 = len(data) - tp
 
     print('tp: %d, fp: %d, fp2: %d, from: %d' % (tp, fp, fp2, len(data)))
     print('FP counts: %s \nFN counts: %s\nTP counts: %s\nTN counts: %s' % (count_fp, count_fn, count_tp, count_tn))
     print( '>>> target score = %.2f %%' % (score * 100))
     print( '>>> accuracy (just for info) = %.2f %%' % (acc * 100))
+    return (score, acc)
+
+def targetScore(confidence, correct, mistake, fp_rate = 0.02):
+    """
+    Calculates target score (recall level at specified false positive rate level) and accuracy
+    in vectorized form over all articles in corpora
+    Arguments:
+        confidence: the confidence of suggested correction per article, -inf if no correction suggested
+        correct: the flags whether suggested correction equals to the ground truth correction
+        mistake: the flags whether article has ground truth correction
+        fp_rate: the false positive rate level
+    Return:
+        the tuple with target score and accuracy
+    """
+    confidence = np.asarray(confidence, dtype = np.float64)
+    correct = np.asarray(correct, dtype = bool)
+    mistake = np.asarray(mistake, dtype = bool)
+    n = len(confidence)
+    if n == 0:
+        return (0., 0.)
+    
+    # sort by descending confidence with ties broken the same way as tuples sort
+    order = np.lexsort((mistake, correct, -confidence))
+    correct = correct[order]
+    mistake = mistake[order]
+    
+    fp2 = np.cumsum(~correct)
+    fp = np.cumsum(~mistake)
+    tp = np.cumsum(correct)
+    all_mistakes = mistake.sum()
+    
+    acc = max(0., (1 - (fp + all_mistakes - tp) / n).max())
+    score = 0.
+    within = np.flatnonzero(fp2 <= fp_rate * n)
+    if len(within) > 0 and all_mistakes > 0:
+        score = tp[within[-1]] / all_mistakes
+    return (score, acc)
 
+def targetScoreFromLabels(labels_prob, labels, classes = None, fp_rate = 0.02):
+    """
+    Calculates target score and accuracy directly from predicted labels probabilities and 
+    ground truth labels of features generated with pos tags, i.e. without building submission 
+    results. The prediction of article already present in the text (which can not be 
+    detected from features) is counted as suggested correction.
+    Arguments:
+        labels_prob: the predicted probabilities [n_samples, n_classes]
+        labels: the ground truth labels [n_samples], where 0 means no correction
+        classes: the class labels of probabilities columns [optional], if None column index used
+        fp_rate: the false positive rate level
+    Return:
+        the tuple with target score and accuracy
+    """
+    labels_prob = np.asarray(labels_prob)
+    labels = np.asarray(labels)
+    max_lab_ind = np.argmax(labels_prob, axis = 1)
+    predicted = max_lab_ind if classes is None else np.asarray(classes)[max_lab_ind]
+    confidence = labels_prob[np.arange(len(labels_prob)), max_lab_ind]
+    
+    suggested = (predicted != 0) & (confidence > 0)
+    confidence = np.where(suggested, confidence, float('-inf'))
+    correct = suggested & (predicted == labels)
+    return targetScore(confidence, correct, labels != 0, fp_rate)
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='The prediction results evaluator')
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The test cases for vectorized target score evaluation
+
+@author: yaric
+"""
+import os
+import json
+import tempfile
+import unittest
+
+import numpy as np
+
+import evaluate
+
+def loopScore(data):
+    """
+    The reference target score calculation as it was done in evaluate.py
+    """
+    data = sorted(data)
+    fp2, fp, tp = 0, 0, 0
+    all_mistakes = sum(x[2] for x in data)
+    score, acc = 0, 0
+    for _, c, r in data:
+        fp2 += not c
+        fp += not r
+        tp += c
+        acc = max(acc, 1 - (0. + fp + all_mistakes - tp) / len(data))
+        if fp2 * 1. / len(data) <= 0.02:
+            score = tp * 1. / all_mistakes
+    return (score, acc)
+
+class TestEvaluateMethods(unittest.TestCase):
+
+    def test_target_score(self):
+        rnd = np.random.RandomState(123)
+        for _ in range(50):
+            n = rnd.randint(10, 400)
+            confidence = np.round(rnd.rand(n), 1)
+            confidence[rnd.rand(n) < 0.3] = float('-inf')
+            mistake = rnd.rand(n) < 0.4
+            mistake[0] = True
+            correct = mistake & (rnd.rand(n) < 0.8) & (confidence > float('-inf'))
+
+            data = [(-c, bool(t), bool(m)) for c, t, m in zip(confidence, correct, mistake)]
+            score, acc = evaluate.targetScore(confidence, correct, mistake)
+            test_score, test_acc = loopScore(data)
+            self.assertAlmostEqual(score, test_score, 10, "Wrong target score")
+            self.assertAlmostEqual(acc, test_acc, 10, "Wrong accuracy")
+
+    def test_target_score_from_labels(self):
+        labels_prob = np.array([[0.1, 0.8, 0.1, 0.0],
+                                [0.7, 0.1, 0.1, 0.1],
+                                [0.0, 0.1, 0.2, 0.7],
+                                [0.2, 0.1, 0.6, 0.1]])
+        labels = np.array([1, 0, 3, 1])
+        score, _ = evaluate.targetScoreFromLabels(labels_prob, labels)
+        # one wrong suggestion (0.6) out of four articles is above 2% false positive rate
+        self.assertAlmostEqual(score, 2. / 3, 10, "Wrong target score from labels")
+
+    def test_evaluate_without_articles(self):
+        with tempfile.TemporaryDirectory() as out_dir:
+            paths = [os.path.join(out_dir, name) for name in ["text.json", "correct.json", "submission.json"]]
+            for path, data in zip(paths, [[["No", "articles", "here"]], [[None, None, None]], [[None, None, None]]]):
+                with open(path, 'w') as f:
+                    json.dump(data, f)
+            score, acc = evaluate.evaluate(*paths)
+        self.assertEqual(score, 0., "Wrong target score without articles")
+        self.assertEqual(acc, 0., "Wrong accuracy without articles")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The compiled flat-array evaluator for trained RandomForestClassifier. The trees of
+the forest are packed into the set of parallel Numpy arrays (feature, threshold,
+left, right, leaf value) and all rows are moved through all trees level by level
+with vectorized operations, which avoids per-call overhead of sklearn for small
+batches.
+
+@author: yaric
+"""
+import time
+import argparse
+
+import numpy as np
+
+import config
+
+# The sklearn marker of leaf node in children arrays
+TREE_LEAF = -1
+
+class FlatForest(object):
+    """
+    The forest of decision trees packed into flat arrays. All nodes of all trees
+    are stored in the same arrays and children indices are global. The children
+    of leaf nodes point to the leaf itself, so the rows reached a leaf stay at it
+    while the rest of rows keep descending.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth, classes):
+        """
+        Creates new flat forest
+        Arguments:
+            feature: the feature index to test per node [n_nodes]
+            threshold: the threshold to compare feature value with per node [n_nodes]
+            left: the global index of left child per node [n_nodes]
+            right: the global index of right child per node [n_nodes]
+            value: the normalized class probabilities per node [n_nodes, n_classes]
+            roots: the global index of root node per tree [n_trees]
+            max_depth: the maximal depth among all trees
+            classes: the class labels in order of value columns
+        """
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.classes = classes
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    def nbytes(self):
+        """
+        Returns the size of packed arrays in bytes
+        """
+        return sum(a.nbytes for a in [self.feature, self.threshold, self.left,
+                                      self.right, self.value, self.roots])
+
+    def predict_proba(self, X, chunk_size = 1024):
+        """
+        Predicts class probabilities for provided features. The result is the same
+        as RandomForestClassifier.predict_proba within float tolerance.
+        Arguments:
+            X: the data features [n_samples, n_features] (scaled the same way as train data)
+            chunk_size: the number of rows to move through the trees at once
+        Return:
+            the array of shape = [n_samples, n_classes] with probabilities of each class
+        """
+        X = np.asarray(X, dtype = np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        proba = np.empty((X.shape[0], len(self.classes)), dtype = np.float64)
+        for start in range(0, X.shape[0], chunk_size):
+            X_chunk = X[start:start + chunk_size]
+            nodes = self.leaves(X_chunk)
+            proba[start:start + len(X_chunk)] = self.value[nodes].sum(axis = 1)
+
+        proba /= self.n_trees
+        return proba
+
+    def predict_proba_anytime(self, X, chunk_trees = 50, delta = None):
+        """
+        Predicts class probabilities evaluating trees in chunks and stopping for a row
+        as soon as the vote of its leading class can not be overturned by the trees
+        which remain. Each tree votes with probabilities summing to one, so after k of
+        n_trees trees the leading class is decided when its votes margin over the
+        runner-up exceeds n_trees - k. Such rows get exactly the same decision
+        (argmax) as full evaluation.
+        If delta is set, the row also stops once the mean votes margin of the leading class
+        over the runner-up per evaluated tree confirms it by the Hoeffding bound: the margin
+        of single tree lies in [-1, 1], so the row stops when margin / k > sqrt(2 * ln(1 / delta) / k)
+        The probabilities of the stopped rows are estimated as mean vote over evaluated
+        trees. The absolute difference from full evaluation is guaranteed to be not
+        greater than (n_trees - k) / n_trees
+        Arguments:
+            X: the data features [n_samples, n_features] (scaled the same way as train data)
+            chunk_trees: the number of trees to evaluate before checking the stop condition
+            delta: the allowed probability to get decision different from full evaluation [optional]
+        Return:
+            the tuple with array of shape = [n_samples, n_classes] with probabilities of each
+            class and array of shape = [n_samples] with number of trees evaluated per row
+        """
+        X = np.asarray(X, dtype = np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        votes = np.zeros((X.shape[0], len(self.classes)), dtype = np.float64)
+        n_evaluated = np.zeros((X.shape[0],), dtype = np.int32)
+        active = np.arange(X.shape[0])
+        for start in range(0, self.n_trees, chunk_trees):
+            trees = np.arange(start, min(start + chunk_trees, self.n_trees))
+            nodes = self.leaves(X[active], trees)
+            votes[active] += self.value[nodes].sum(axis = 1)
+            n_evaluated[active] = trees[-1] + 1
+            if len(self.classes) < 2:
+                break
+
+            # check if leading class can be overturned by remaining trees
+            active_votes = np.sort(votes[active], axis = 1)
+            margin = active_votes[:, -1] - active_votes[:, -2]
+            done = margin > self.n_trees - trees[-1] - 1
+            if delta != None:
+                k = trees[-1] + 1
+                done |= margin / k > np.sqrt(2. * np.log(1. / delta) / k)
+
+            active = active[~done]
+            if len(active) == 0:
+                break
+
+        proba = votes / n_evaluated[:, None]
+        return (proba, n_evaluated)
+
+    def leaves(self, X, trees = None):
+        """
+        Finds the leaf reached by each row in each tree
+        Arguments:
+            X: the data features [n_samples, n_features] as float32
+            trees: the indices of trees to evaluate [optional], all trees if None
+        Return:
+            the global indices of leaf nodes [n_samples, n_trees]
+        """
+        roots = self.roots if trees is None else self.roots[trees]
+        # (tree, row) pairs are kept in tree-major order for locality of node arrays
+        nodes = np.repeat(roots, X.shape[0])
+        # the flat offsets of rows in features array per pair
+        row_offsets = np.tile(np.arange(X.shape[0]) * X.shape[1], len(roots))
+        X_flat = X.ravel()
+        is_leaf = self.isLeaf()
+        # move only pairs which not reached a leaf yet
+        active = np.flatnonzero(~is_leaf[nodes])
+        while len(active) > 0:
+            current = nodes[active]
+            go_left = X_flat[row_offsets[active] + self.feature[current]] <= self.threshold[current]
+            current = np.where(go_left, self.left[current], self.right[current])
+            nodes[active] = current
+            active = active[~is_leaf[current]]
+        return nodes.reshape(len(roots), X.shape[0]).T
+
+    def isLeaf(self):
+        """
+        Returns the boolean mask of leaf nodes [n_nodes]
+        """
+        if getattr(self, "_is_leaf", None) is None:
+            self._is_leaf = self.left == np.arange(self.n_nodes)
+        return self._is_leaf
+
+    def nodeDepth(self):
+        """
+        Returns the depth of each node within its tree [n_nodes]
+        """
+        is_leaf = self.isLeaf()
+        depth = np.zeros((self.n_nodes,), dtype = np.int32)
+        frontier = self.roots[~is_leaf[self.roots]]
+        while len(frontier) > 0:
+            children = np.concatenate((self.left[frontier], self.right[frontier]))
+            depth[children] = np.tile(depth[frontier] + 1, 2)
+            frontier = children[~is_leaf[children]]
+        return depth
+
+    def compress(self, n_trees = None, max_depth = None):
+        """
+        Creates smaller forest by keeping only first trees and capping the depth of trees.
+        The nodes at the capped depth become leaves predicting class distribution of train
+        samples reached the node. As the trees of forest are built independently the
+        first trees are as good subset as any other.
+        Arguments:
+            n_trees: the number of first trees to keep [optional], all trees if None
+            max_depth: the maximal depth of trees [optional], not capped if None
+        Return:
+            the compressed FlatForest with unused nodes removed
+        """
+        n_trees = self.n_trees if n_trees == None else min(n_trees, self.n_trees)
+        depth = self.nodeDepth()
+        # the nodes of kept trees are stored in the same order as trees
+        last = self.roots[n_trees] if n_trees < self.n_trees else self.n_nodes
+        keep = np.arange(self.n_nodes) < last
+        new_leaf = self.isLeaf().copy()
+        if max_depth != None:
+            keep &= depth <= max_depth
+            new_leaf |= depth == max_depth
+
+        new_index = np.cumsum(keep, dtype = np.int64) - 1
+        kept = np.flatnonzero(keep)
+        own = new_index[kept].astype(np.int32)
+        is_leaf = new_leaf[kept]
+        left = np.where(is_leaf, own, new_index[self.left[kept]]).astype(np.int32)
+        right = np.where(is_leaf, own, new_index[self.right[kept]]).astype(np.int32)
+        feature = np.where(is_leaf, 0, self.feature[kept]).astype(np.int32)
+        new_depth = min(self.max_depth, max_depth) if max_depth != None else self.max_depth
+
+        return FlatForest(feature, self.threshold[kept], left, right, self.value[kept],
+                          new_index[self.roots[:n_trees]].astype(np.int32), new_depth, self.classes)
+
+    def save(self, path):
+        """
+        Saves packed arrays into the Numpy archive file
+        Arguments:
+            path: the file path to save
+        """
+        np.savez(path, feature = self.feature, threshold = self.threshold,
+                 left = self.left, right = self.right, value = self.value,
+                 roots = self.roots, max_depth = self.max_depth, classes = self.classes)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads flat forest from the Numpy archive file
+        Arguments:
+            path: the file path to load from
+        Return:
+            the loaded flat forest
+        """
+        with np.load(path) as data:
+            return cls(feature = data["feature"], threshold = data["threshold"],
+                       left = data["left"], right = data["right"], value = data["value"],
+                       roots = data["roots"], max_depth = int(data["max_depth"]),
+                       classes = data["classes"])
+
+def exportForest(model):
+    """
+    Exports trained forest into packed flat arrays
+    Arguments:
+        model: the trained sklearn.ensemble.RandomForestClassifier
+    Return:
+        the FlatForest with the same predictions as provided model
+    """
+    n_nodes = sum(est.tree_.node_count for est in model.estimators_)
+    n_classes = len(model.classes_)
+
+    feature = np.zeros((n_nodes,), dtype = np.int32)
+    threshold = np.zeros((n_nodes,), dtype = np.float64)
+    left = np.zeros((n_nodes,), dtype = np.int32)
+    right = np.zeros((n_nodes,), dtype = np.int32)
+    value = np.zeros((n_nodes, n_classes), dtype = np.float32)
+    roots = np.zeros((len(model.estimators_),), dtype = np.int32)
+
+    offset = 0
+    max_depth = 0
+    for i, est in enumerate(model.estimators_):
+        tree = est.tree_
+        count = tree.node_count
+        own = np.arange(offset, offset + count, dtype = np.int32)
+        is_leaf = tree.children_left == TREE_LEAF
+
+        # leaf nodes test feature 0 and point to itself
+        feature[offset:offset + count] = np.where(is_leaf, 0, tree.feature)
+        threshold[offset:offset + count] = tree.threshold
+        left[offset:offset + count] = np.where(is_leaf, own, tree.children_left + offset)
+        right[offset:offset + count] = np.where(is_leaf, own, tree.children_right + offset)
+
+        # normalize class counts (or weighted fractions) to probabilities
+        tree_value = tree.value[:, 0, :n_classes]
+        normalizer = tree_value.sum(axis = 1, keepdims = True)
+        normalizer[normalizer == 0] = 1
+        value[offset:offset + count] = tree_value / normalizer
+
+        roots[i] = offset
+        max_depth = max(max_depth, tree.max_depth)
+        offset += count
+
+    return FlatForest(feature, threshold, left, right, value, roots, max_depth, np.array(model.classes_))
+
+def __timeCall(fn, X, repeats):
+    """
+    Measures mean time of the call with provided features
+    Return:
+        the mean time of call in seconds
+    """
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn(X)
+    return (time.perf_counter() - start) / repeats
+
+def benchmark(model, flat, X, small_batch = 32, repeats = 20):
+    """
+    Benchmarks flat forest evaluator against sklearn predict_proba for single-row,
+    small-batch and full-corpus cases and prints results
+    Arguments:
+        model: the trained sklearn.ensemble.RandomForestClassifier
+        flat: the flat forest exported from the model
+        X: the data features [n_samples, n_features] (already scaled)
+        small_batch: the number of rows in small batch
+        repeats: the number of repeats for single-row and small-batch cases
+    Return:
+        the list of tuples (case name, sklearn time, flat time) in seconds
+    """
+    max_diff = np.abs(model.predict_proba(X) - flat.predict_proba(X)).max()
+    print("Flat forest: trees = %d, nodes = %d, max depth = %d, size = %.1f MB, max proba diff = %.2e"
+          % (flat.n_trees, flat.n_nodes, flat.max_depth, flat.nbytes() / 2**20, max_diff))
+
+    cases = [("single-row", X[:1], repeats),
+             ("small-batch", X[:small_batch], repeats),
+             ("full-corpus", X, 1)]
+    results = list()
+    for name, X_case, n in cases:
+        sk_time = __timeCall(model.predict_proba, X_case, n)
+        flat_time = __timeCall(flat.predict_proba, X_case, n)
+        results.append((name, sk_time, flat_time))
+        print("%-12s rows = %6d, sklearn = %9.3f ms, flat = %9.3f ms, speedup = %.2fx"
+              % (name, len(X_case), sk_time * 1000, flat_time * 1000, sk_time / flat_time))
+
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='The flat-array forest exporter and benchmark')
+    parser.add_argument('--model_file', default=config.models_dir + "/random_forest/model.pkl",
+                        help='the path to the trained random forest model file')
+    parser.add_argument('--scaler_file', default=config.models_dir + "/random_forest/scaler.pkl",
+                        help='the path to the features scaler file')
+    parser.add_argument('--out_file', default=config.models_dir + "/random_forest/flat_forest.npz",
+                        help='the path to the file to store packed forest arrays')
+    parser.add_argument('--benchmark_data', default=None,
+                        help='the path to the features file to run benchmark against sklearn [optional]')
+    args = parser.parse_args()
+
+    import joblib
+
+    model = joblib.load(args.model_file)
+    flat = exportForest(model)
+    flat.save(args.out_file)
+    print("Flat forest saved to: " + args.out_file)
+
+    if args.benchmark_data != None:
+        X_scaler = joblib.load(args.scaler_file)
+        X = X_scaler.transform(np.load(args.benchmark_data))
+        benchmark(model, flat, X)
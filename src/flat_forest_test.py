@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The test cases for flat-array forest evaluator
+
+@author: yaric
+"""
+import tempfile
+import unittest
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+import flat_forest as ff
+import evaluate
+
+class TestFlatForestMethods(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        rnd = np.random.RandomState(123)
+        # integer valued features similar to glove indices and POS tags
+        cls.X = rnd.randint(0, 40, size = (600, 16)).astype("f")
+        cls.labels = (cls.X[:, 0] + cls.X[:, 3] + rnd.randint(0, 20, size = 600)).astype("int") % 4
+        cls.model = RandomForestClassifier(n_estimators = 25, random_state = 123).fit(cls.X, cls.labels)
+        cls.flat = ff.exportForest(cls.model)
+
+    def test_export(self):
+        self.assertEqual(self.flat.n_trees, 25, "Wrong number of trees exported")
+        self.assertEqual(self.flat.n_nodes, sum(e.tree_.node_count for e in self.model.estimators_),
+                         "Wrong number of nodes exported")
+        self.assertTrue(np.all(self.flat.classes == self.model.classes_), "Wrong classes exported")
+
+    def test_predict_proba(self):
+        X_test = np.random.RandomState(7).randint(0, 40, size = (300, 16)).astype("f")
+        expected = self.model.predict_proba(X_test)
+        proba = self.flat.predict_proba(X_test, chunk_size = 64)
+        self.assertEqual(proba.shape, expected.shape, "Wrong probabilities shape")
+        self.assertTrue(np.allclose(proba, expected, atol = 1e-6), "Probabilities differ from sklearn")
+
+    def test_predict_proba_single_row(self):
+        proba = self.flat.predict_proba(self.X[5])
+        self.assertTrue(np.allclose(proba, self.model.predict_proba(self.X[5:6]), atol = 1e-6),
+                        "Single row probabilities differ from sklearn")
+
+    def test_predict_proba_anytime(self):
+        expected = self.flat.predict_proba(self.X)
+        proba, n_evaluated = self.flat.predict_proba_anytime(self.X, chunk_trees = 5)
+        self.assertTrue(np.all(np.argmax(proba, axis = 1) == np.argmax(expected, axis = 1)),
+                        "Early exit decisions differ from full evaluation")
+        self.assertTrue(np.all(n_evaluated <= self.flat.n_trees), "Too many trees evaluated")
+        self.assertLess(n_evaluated.mean(), self.flat.n_trees, "No early exit happened")
+
+        # the documented tolerance of probabilities
+        tolerance = (self.flat.n_trees - n_evaluated) / self.flat.n_trees
+        self.assertTrue(np.all(np.abs(proba - expected).max(axis = 1) <= tolerance + 1e-6),
+                        "Early exit probabilities out of tolerance")
+
+        # rows evaluated with all trees get exact probabilities
+        full = n_evaluated == self.flat.n_trees
+        self.assertTrue(np.allclose(proba[full], expected[full]), "Wrong probabilities of full evaluation")
+
+    def test_predict_proba_anytime_target_score(self):
+        expected = self.flat.predict_proba(self.X)
+        proba, n_evaluated = self.flat.predict_proba_anytime(self.X, chunk_trees = 5)
+
+        # the same decisions, only confidences of early stopped rows used for ranking may differ
+        confidence = proba.max(axis = 1)
+        tolerance = (self.flat.n_trees - n_evaluated) / self.flat.n_trees
+        self.assertTrue(np.all(np.abs(confidence - expected.max(axis = 1)) <= tolerance + 1e-6),
+                        "Early exit confidences out of tolerance")
+        score, acc = evaluate.targetScoreFromLabels(proba, self.labels, self.flat.classes)
+        full_score, full_acc = evaluate.targetScoreFromLabels(expected, self.labels, self.flat.classes)
+        self.assertTrue(0 <= score <= 1, "Target score out of range")
+        self.assertAlmostEqual(acc, full_acc, msg = "Accuracy depends only on decisions")
+
+        # without early exit the ranking and target score are the same as of full evaluation
+        proba, n_evaluated = self.flat.predict_proba_anytime(self.X, chunk_trees = self.flat.n_trees)
+        self.assertTrue(np.all(n_evaluated == self.flat.n_trees), "Early exit without chunks")
+        score, _ = evaluate.targetScoreFromLabels(proba, self.labels, self.flat.classes)
+        self.assertAlmostEqual(score, full_score, msg = "Target score differs from full evaluation")
+
+    def test_compress(self):
+        compressed = self.flat.compress(n_trees = 10, max_depth = 4)
+        self.assertEqual(compressed.n_trees, 10, "Wrong number of trees kept")
+        self.assertTrue(np.all(compressed.nodeDepth() <= 4), "Tree depth not capped")
+        self.assertTrue(np.all(compressed.left[compressed.isLeaf()] == np.flatnonzero(compressed.isLeaf())),
+                        "Leaves should point to itself")
+
+        # the first trees without depth cap predict as sklearn forest of the same trees
+        first = self.flat.compress(n_trees = 10)
+        expected = np.mean([e.predict_proba(self.X) for e in self.model.estimators_[:10]], axis = 0)
+        self.assertTrue(np.allclose(first.predict_proba(self.X), expected, atol = 1e-6),
+                        "Wrong probabilities of first trees")
+
+    def test_save_load(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = temp_dir + "/flat_forest_test.npz"
+            self.flat.save(path)
+            loaded = ff.FlatForest.load(path)
+        self.assertEqual(loaded.max_depth, self.flat.max_depth, "Wrong max depth loaded")
+        self.assertTrue(np.array_equal(loaded.predict_proba(self.X), self.flat.predict_proba(self.X)),
+                        "Loaded forest predicts differently")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The random forest compression tool. Selects the subset of trees and caps the depth
+of trees of trained RandomForest to meet the model size or per-row latency budget
+while keeping as much of the target score over validation corpora as possible.
+
+@author: yaric
+"""
+import os
+import copy
+import time
+import pickle
+import json
+import argparse
+
+import numpy as np
+
+from random_forest_model import RandomForest
+import flat_forest as ff
+import evaluate
+import config
+
+# The candidate numbers of first trees to keep
+TREES_CANDIDATES = [25, 50, 100, 200, 300, 500, 750, 1000, 1500]
+# The candidate depth caps, None means not capped
+DEPTH_CANDIDATES = [None, 40, 30, 20, 15, 10]
+
+def capTreeDepth(estimator, max_depth):
+    """
+    Creates copy of decision tree with depth capped to specified level
+    Arguments:
+        estimator: the trained sklearn.tree.DecisionTreeClassifier
+        max_depth: the maximal depth of tree
+    Return:
+        the new decision tree classifier where nodes at max_depth became leaves
+    """
+    from sklearn.tree._tree import Tree, TREE_LEAF, TREE_UNDEFINED
+
+    tree = estimator.tree_
+    state = tree.__getstate__()
+    nodes = state["nodes"]
+
+    depth = np.zeros((tree.node_count,), dtype = np.int64)
+    for i in range(tree.node_count):
+        # children always stored after parent
+        if nodes["left_child"][i] != TREE_LEAF:
+            depth[nodes["left_child"][i]] = depth[i] + 1
+            depth[nodes["right_child"][i]] = depth[i] + 1
+
+    keep = depth <= max_depth
+    new_index = np.cumsum(keep) - 1
+    new_nodes = nodes[keep].copy()
+    is_leaf = (new_nodes["left_child"] == TREE_LEAF) | (depth[keep] == max_depth)
+    new_nodes["left_child"] = np.where(is_leaf, TREE_LEAF, new_index[new_nodes["left_child"]])
+    new_nodes["right_child"] = np.where(is_leaf, TREE_LEAF, new_index[new_nodes["right_child"]])
+    new_nodes["feature"] = np.where(is_leaf, TREE_UNDEFINED, new_nodes["feature"])
+    new_nodes["threshold"] = np.where(is_leaf, TREE_UNDEFINED, new_nodes["threshold"])
+
+    new_tree = Tree(tree.n_features, np.array(tree.n_classes, dtype = np.intp), tree.n_outputs)
+    state = dict(state)
+    state["max_depth"] = int(min(tree.max_depth, max_depth))
+    state["node_count"] = int(keep.sum())
+    state["nodes"] = new_nodes
+    state["values"] = np.ascontiguousarray(state["values"][keep])
+    new_tree.__setstate__(state)
+
+    new_estimator = copy.copy(estimator)
+    new_estimator.tree_ = new_tree
+    return new_estimator
+
+def compressForest(model, n_trees = None, max_depth = None):
+    """
+    Creates compressed copy of trained forest
+    Arguments:
+        model: the trained sklearn.ensemble.RandomForestClassifier
+        n_trees: the number of first trees to keep [optional], all trees if None
+        max_depth: the maximal depth of trees [optional], not capped if None
+    Return:
+        the compressed RandomForestClassifier
+    """
+    estimators = model.estimators_[:n_trees]
+    if max_depth != None:
+        estimators = [capTreeDepth(est, max_depth) for est in estimators]
+
+    compressed = copy.copy(model)
+    compressed.estimators_ = estimators
+    compressed.n_estimators = len(estimators)
+    return compressed
+
+def modelSize(model):
+    """
+    Returns the size of serialized model in bytes
+    """
+    return len(pickle.dumps(model, protocol = pickle.HIGHEST_PROTOCOL))
+
+def rowLatency(model, X, repeats = 200):
+    """
+    Measures mean latency of single row prediction with predict_proba of the model
+    Arguments:
+        model: the model to score rows with, i.e. the saved sklearn forest
+        X: the data features to take rows from
+        repeats: the number of rows to predict
+    Return:
+        mean latency per row in seconds
+    """
+    rows = np.arange(repeats) % len(X)
+    start = time.perf_counter()
+    for i in rows:
+        model.predict_proba(X[i:i + 1])
+    return (time.perf_counter() - start) / repeats
+
+def __candidateScores(flat, X, labels, trees_candidates):
+    """
+    Calculates target score for each number of first trees in single pass over trees
+    Return:
+        the dictionary with target score per number of trees
+    """
+    X = np.asarray(X, dtype = np.float32)
+    votes = np.zeros((X.shape[0], len(flat.classes)), dtype = np.float64)
+    scores = dict()
+    start = 0
+    for n_trees in sorted(trees_candidates):
+        for chunk in range(start, n_trees, 50):
+            trees = np.arange(chunk, min(chunk + 50, n_trees))
+            votes += flat.value[flat.leaves(X, trees)].sum(axis = 1)
+        start = n_trees
+        score, _ = evaluate.targetScoreFromLabels(votes / n_trees, labels, flat.classes)
+        scores[n_trees] = score
+    return scores
+
+def selectCompression(model, X_validate, labels_validate, max_size = None, max_latency = None,
+                      trees_candidates = TREES_CANDIDATES, depth_candidates = DEPTH_CANDIDATES):
+    """
+    Selects the number of trees and depth cap with the best target score over validation
+    data among candidates meeting the budget. The scores are calculated with flat forest
+    evaluator in single pass over trees, while the latency is measured with predict_proba
+    of the compressed sklearn forest which is saved and used for scoring.
+    Arguments:
+        model: the trained sklearn.ensemble.RandomForestClassifier
+        X_validate: the validation data (scaled the same way as train data)
+        labels_validate: the validation GT labels
+        max_size: the model size budget in bytes [optional]
+        max_latency: the per-row latency budget in seconds [optional]
+        trees_candidates: the candidate numbers of first trees to keep
+        depth_candidates: the candidate depth caps
+    Return:
+        the dictionary with selected n_trees, max_depth, score, size and latency or None
+        if no candidate meets the budget
+    """
+    n_total = len(model.estimators_)
+    trees_candidates = sorted(set(min(n, n_total) for n in trees_candidates))
+    flat = ff.exportForest(model)
+    # the serialized size is proportional to number of nodes
+    bytes_per_node = modelSize(model) / flat.n_nodes
+
+    best = None
+    for max_depth in depth_candidates:
+        capped = flat.compress(max_depth = max_depth)
+        capped_model = compressForest(model, max_depth = max_depth)
+        scores = __candidateScores(capped, X_validate, labels_validate, trees_candidates)
+        for n_trees in trees_candidates:
+            candidate = capped.compress(n_trees = n_trees)
+            size = candidate.n_nodes * bytes_per_node
+            if max_size != None and size > max_size:
+                continue
+            latency = rowLatency(compressForest(capped_model, n_trees = n_trees), X_validate)
+            if max_latency != None and latency > max_latency:
+                continue
+
+            print("n_trees = %4d, max_depth = %4s: target score = %.4f, size = %8.1f MB, latency = %.3f ms"
+                  % (n_trees, max_depth, scores[n_trees], size / 2**20, latency * 1000))
+            if best == None or scores[n_trees] > best["score"] or \
+                (scores[n_trees] == best["score"] and size < best["size"]):
+                best = {"n_trees":n_trees, "max_depth":max_depth, "score":scores[n_trees],
+                        "size":size, "latency":latency}
+
+    return best
+
+def __report(name, model, X_validate, labels_validate):
+    """
+    Prints target score, model size and scoring latency of the model
+    """
+    score, _ = evaluate.targetScoreFromLabels(model.predict_proba(X_validate), labels_validate, model.classes_)
+    start = time.perf_counter()
+    model.predict_proba(X_validate)
+    batch_time = time.perf_counter() - start
+    print("%s: n_trees = %d, target score = %.4f, size = %.1f MB, row latency = %.3f ms, "
+          "validate corpus scoring (sklearn) = %.3f s"
+          % (name, len(model.estimators_), score, modelSize(model) / 2**20,
+             rowLatency(model, X_validate) * 1000, batch_time))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='The random forest compression to the size or latency budget')
+    parser.add_argument('--model_dir', default=config.models_dir + "/random_forest",
+                        help='the directory with trained random forest model')
+    parser.add_argument('--out_dir', default=config.models_dir + "/random_forest_compressed",
+                        help='the directory to save compressed model')
+    parser.add_argument('--max_size_mb', type=float, default=None,
+                        help='the model size budget in megabytes')
+    parser.add_argument('--max_latency_ms', type=float, default=None,
+                        help='the per-row scoring latency budget in milliseconds')
+    args = parser.parse_args()
+
+    if args.max_size_mb == None and args.max_latency_ms == None:
+        raise Exception("At least one of model size or latency budget should be set")
+
+    import joblib
+
+    predictor = RandomForest(model_path = args.model_dir + "/model.pkl",
+                             scaler_path = args.model_dir + "/scaler.pkl",
+                             manifest_path = args.model_dir + "/manifest.json")
+    model = joblib.load(predictor.model_path)
+    X_scaler = joblib.load(predictor.scaler_path)
+    X_validate = X_scaler.transform(np.load(config.validate_features_path))
+    labels_validate = np.load(config.validate_labels_path)
+
+    __report("Original", model, X_validate, labels_validate)
+    best = selectCompression(model, X_validate, labels_validate,
+                             max_size = args.max_size_mb * 2**20 if args.max_size_mb != None else None,
+                             max_latency = args.max_latency_ms / 1000 if args.max_latency_ms != None else None)
+    if best == None:
+        raise Exception("No compressed model meets the budget")
+
+    compressed = compressForest(model, n_trees = best["n_trees"], max_depth = best["max_depth"])
+    __report("Compressed", compressed, X_validate, labels_validate)
+
+    # save compressed model in the same layout as trained model
+    if os.path.exists(args.out_dir) == False:
+        os.makedirs(args.out_dir)
+    joblib.dump(compressed, args.out_dir + "/model.pkl")
+    joblib.dump(X_scaler, args.out_dir + "/scaler.pkl")
+    predictor.n_estimators = best["n_trees"]
+    manifest = predictor.manifest()
+    manifest.update({"max_depth":best["max_depth"], "compressed_from":args.model_dir})
+    with open(args.out_dir + "/manifest.json", mode = 'w') as f:
+        json.dump(manifest, f, indent = 2)
+    print("Compressed model with n_trees = %d, max_depth = %s saved to: %s"
+          % (best["n_trees"], best["max_depth"], args.out_dir))
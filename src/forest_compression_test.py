@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The test cases for random forest compression tool
+
+@author: yaric
+"""
+import unittest
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+import forest_compression as fc
+import flat_forest as ff
+
+class TestForestCompressionMethods(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        rnd = np.random.RandomState(123)
+        # integer valued features similar to glove indices and POS tags
+        cls.X = rnd.randint(0, 40, size = (600, 16)).astype("f")
+        cls.labels = (cls.X[:, 0] + cls.X[:, 3] + rnd.randint(0, 20, size = 600)).astype("int") % 4
+        cls.model = RandomForestClassifier(n_estimators = 20, random_state = 123).fit(cls.X, cls.labels)
+
+    def test_capTreeDepth(self):
+        for cap in [1, 3, 6]:
+            for estimator in self.model.estimators_[:5]:
+                capped = fc.capTreeDepth(estimator, cap)
+                self.assertLessEqual(capped.tree_.max_depth, cap, "Tree depth not capped")
+                self.assertLessEqual(capped.get_depth(), cap, "Tree nodes deeper than cap")
+                self.assertLess(capped.tree_.node_count, estimator.tree_.node_count, "No nodes removed")
+
+        # the cap above tree depth keeps the tree as is
+        estimator = self.model.estimators_[0]
+        capped = fc.capTreeDepth(estimator, estimator.tree_.max_depth)
+        self.assertEqual(capped.tree_.node_count, estimator.tree_.node_count, "Not capped tree changed")
+        self.assertTrue(np.allclose(capped.predict_proba(self.X), estimator.predict_proba(self.X)),
+                        "Not capped tree predictions changed")
+
+    def test_compressForest(self):
+        compressed = fc.compressForest(self.model, n_trees = 10, max_depth = 4)
+        self.assertEqual(len(compressed.estimators_), 10, "Wrong number of trees kept")
+        self.assertEqual(len(self.model.estimators_), 20, "Original forest changed")
+        self.assertTrue(all(e.tree_.max_depth <= 4 for e in compressed.estimators_), "Tree depth not capped")
+
+        proba = compressed.predict_proba(self.X)
+        self.assertEqual(proba.shape, (len(self.X), len(self.model.classes_)), "Wrong probabilities shape")
+        self.assertTrue(np.all(proba >= 0) and np.all(proba <= 1), "Probabilities out of range")
+        self.assertTrue(np.allclose(proba.sum(axis = 1), 1.), "Probabilities do not sum to one")
+
+        # the flat evaluator of compressed forest agrees with sklearn
+        flat = ff.exportForest(compressed)
+        self.assertTrue(np.allclose(flat.predict_proba(self.X), proba, atol = 1e-6),
+                        "Flat probabilities of compressed forest differ from sklearn")
+
+    def test_selectCompression_size(self):
+        max_size = fc.modelSize(self.model) / 3
+        best = fc.selectCompression(self.model, self.X, self.labels, max_size = max_size,
+                                    trees_candidates = [5, 10, 20], depth_candidates = [None, 8, 4])
+        self.assertIsNotNone(best, "No configuration meets the size budget")
+        self.assertLessEqual(best["size"], max_size, "Selected configuration exceeds the size budget")
+
+        compressed = fc.compressForest(self.model, n_trees = best["n_trees"], max_depth = best["max_depth"])
+        n_nodes = sum(e.tree_.node_count for e in compressed.estimators_)
+        self.assertLess(n_nodes, ff.exportForest(self.model).n_nodes / 2, "Compressed forest too large")
+
+    def test_rowLatency(self):
+        rows = list()
+        class Model(object):
+            def predict_proba(self, X):
+                rows.append(X.shape)
+        latency = fc.rowLatency(Model(), self.X, repeats = 10)
+        self.assertEqual(rows, [(1, self.X.shape[1])] * 10, "Not scored by single rows with predict_proba")
+        self.assertGreater(latency, 0, "Wrong latency")
+
+    def test_selectCompression_latency(self):
+        max_latency = 1.
+        best = fc.selectCompression(self.model, self.X, self.labels, max_latency = max_latency,
+                                    trees_candidates = [5, 20], depth_candidates = [None, 4])
+        self.assertIsNotNone(best, "No configuration meets the latency budget")
+        self.assertLessEqual(best["latency"], max_latency, "Selected configuration exceeds the latency budget")
+
+        # no candidate meets the impossible budget
+        self.assertIsNone(fc.selectCompression(self.model, self.X, self.labels, max_size = 1,
+                                               trees_candidates = [5], depth_candidates = [4]),
+                          "Configuration selected for impossible budget")
+
+if __name__ == '__main__':
+    unittest.main()
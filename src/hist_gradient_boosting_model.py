@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The predictor model based on HistGradientBoostingClassifier
+
+@author: yaric
+"""
+
+import config
+
+RANDOM_STATE = 123
+
+# The indices of POS tags features which are treated as categorical
+POS_FEATURES = [1, 4, 6, 8, 10, 12, 15]
+
+class HistGradientBoosting(object):
+    
+    def __init__(self, max_iter = 300, learning_rate = 0.1, 
+                 model_path = config.models_dir +  "/hist_gradient_boosting/model.pkl", 
+                 scaler_path = config.models_dir + "/hist_gradient_boosting/scaler.pkl",
+                 manifest_path = config.models_dir + "/hist_gradient_boosting/manifest.json"):
+        self.model_path = model_path
+        self.scaler_path = scaler_path
+        self.manifest_path = manifest_path
+        self.max_iter = max_iter
+        self.learning_rate = learning_rate
+    
+    def createScaler(self):
+        """
+        Creates the transformer of features to be fitted over train data before training.
+        The features passed as is, so the POS tags stay integer category codes.
+        """
+        from sklearn.preprocessing import FunctionTransformer
+        return FunctionTransformer()
+
+    def train(self, X_train, labels, sample_weight = None):
+        """
+        Train model with given data corpus
+        Arguments:
+            X_train: the train data [n_samples, n_features]
+            labels: the GT labels [n_samples, n_classes]
+            sample_weight: the weights of train samples [optional]
+        Return:
+            return trained model
+        """
+        from sklearn.ensemble import HistGradientBoostingClassifier
+        
+        clf = HistGradientBoostingClassifier(max_iter = self.max_iter, learning_rate = self.learning_rate,
+                                             categorical_features = POS_FEATURES, early_stopping = True,
+                                             random_state = RANDOM_STATE)
+        self.model = clf.fit(X_train, labels, sample_weight = sample_weight)
+        
+        train_score = self.model.score(X_train, labels)
+        print("HistGradientBoosting:\ntrain score = %.3f, iterations = %d" % (train_score, self.model.n_iter_))
+        
+        return self.model
+
+    def manifest(self):
+        """
+        Returns the dictionary with trained model description to be saved along with model
+        """
+        return {"predictor":"HistGradientBoosting", 
+                "max_iter":self.max_iter,
+                "n_iter":int(self.model.n_iter_),
+                "learning_rate":self.learning_rate}
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The test cases for predictor model based on HistGradientBoostingClassifier
+
+@author: yaric
+"""
+import pickle
+import unittest
+
+import numpy as np
+
+from hist_gradient_boosting_model import HistGradientBoosting, POS_FEATURES
+
+class TestHistGradientBoostingMethods(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        rnd = np.random.RandomState(123)
+        # integer valued features similar to glove indices and POS tags
+        cls.X = rnd.randint(0, 40, size = (600, 16)).astype("f")
+        cls.labels = (cls.X[:, 0] + cls.X[:, 4] + rnd.randint(0, 20, size = 600)).astype("int") % 4
+        cls.predictor = HistGradientBoosting(max_iter = 20)
+        cls.X_scaler = cls.predictor.createScaler()
+        cls.X_train = cls.X_scaler.fit_transform(cls.X)
+        cls.model = cls.predictor.train(cls.X_train, cls.labels)
+
+    def test_scaler(self):
+        # the POS tags features stay integer category codes
+        self.assertTrue(np.array_equal(self.X_train, self.X), "Features changed by transformer")
+        self.assertTrue(np.array_equal(self.X_scaler.transform(self.X[:10]), self.X[:10]),
+                        "Features changed by fitted transformer")
+
+    def test_categorical_features(self):
+        self.assertEqual(list(np.flatnonzero(self.model.is_categorical_)), POS_FEATURES,
+                         "Wrong categorical features")
+
+    def test_predict_proba(self):
+        proba = self.model.predict_proba(self.X_scaler.transform(self.X[:50]))
+        self.assertEqual(proba.shape, (50, 4), "Wrong probabilities shape")
+        self.assertTrue(np.allclose(proba.sum(axis = 1), 1.), "Probabilities do not sum to one")
+
+    def test_save_load(self):
+        model = pickle.loads(pickle.dumps(self.model))
+        X_scaler = pickle.loads(pickle.dumps(self.X_scaler))
+        self.assertTrue(np.allclose(model.predict_proba(X_scaler.transform(self.X)),
+                                    self.model.predict_proba(self.X_train)),
+                        "Loaded model predictions differ")
+        self.assertEqual(self.predictor.manifest()["n_iter"], self.model.n_iter_, "Wrong manifest")
+
+if __name__ == '__main__':
+    unittest.main()
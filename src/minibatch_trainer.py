@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The out-of-core minibatch training of predictors which support partial_fit. The
+features and labels are streamed in minibatches from memory-mapped Numpy files
+(one file or several shards), so the memory used is bounded by the minibatch size
+and model size rather than by the size of train corpora.
+
+@author: yaric
+"""
+import time
+
+import numpy as np
+
+import evaluate
+
+def iterateMinibatches(features_paths, labels_paths = None, batch_size = 10000, random_state = None):
+    """
+    Iterates over minibatches of memory-mapped features (and labels) shards
+    Arguments:
+        features_paths: the list of paths to the features shard files
+        labels_paths: the list of paths to the labels shard files [optional]
+        batch_size: the number of rows in minibatch
+        random_state: the random state to shuffle the order of shards and minibatches [optional],
+                      the data read in the stored order if None
+    Return:
+        the generator of tuples (features, labels) with minibatch arrays loaded in memory,
+        labels is None if labels paths not provided
+    """
+    shards = list(range(len(features_paths)))
+    if random_state != None:
+        random_state.shuffle(shards)
+    for shard in shards:
+        features = np.load(features_paths[shard], mmap_mode = 'r')
+        labels = np.load(labels_paths[shard], mmap_mode = 'r') if labels_paths != None else None
+        if labels is not None and len(labels) != len(features):
+            raise Exception("Features shard size: %d not equal to labels shard size: %d in: %s"
+                            % (len(features), len(labels), features_paths[shard]))
+        starts = np.arange(0, len(features), batch_size)
+        if random_state != None:
+            random_state.shuffle(starts)
+        for start in starts:
+            X = np.array(features[start:start + batch_size])
+            y = np.array(labels[start:start + batch_size]) if labels is not None else None
+            yield (X, y)
+
+def fitScalerStreaming(X_scaler, features_paths, labels_paths, batch_size = 10000):
+    """
+    Fits features transformer and collects the classes in one streaming pass over data.
+    The transformer either supports partial_fit or is one-hot encoder which categories
+    are collected per column.
+    Arguments:
+        X_scaler: the features transformer created by predictor
+        features_paths: the list of paths to the features shard files
+        labels_paths: the list of paths to the labels shard files
+        batch_size: the number of rows in minibatch
+    Return:
+        the tuple with fitted transformer and array of classes
+    """
+    classes = np.array([], dtype = np.int64)
+    categories = None
+    first_batch = None
+    for X, y in iterateMinibatches(features_paths, labels_paths, batch_size):
+        classes = np.union1d(classes, y)
+        if hasattr(X_scaler, "partial_fit"):
+            X_scaler.partial_fit(X)
+            continue
+        if first_batch is None:
+            first_batch = X
+            categories = [np.unique(X[:, col]) for col in range(X.shape[1])]
+        else:
+            categories = [np.union1d(cat, X[:, col]) for col, cat in enumerate(categories)]
+
+    if hasattr(X_scaler, "partial_fit") == False:
+        # one-hot encoder with categories collected over all data
+        X_scaler.set_params(categories = categories)
+        X_scaler.fit(first_batch)
+    return (X_scaler, classes)
+
+def trainMinibatches(predictor, features_paths, labels_paths, batch_size = 10000, n_epochs = 5,
+                     random_state = 123):
+    """
+    Trains predictor model with minibatches streamed from memory-mapped data files. The
+    throughput is reported for each epoch.
+    Arguments:
+        predictor: the predictor which classifier supports partial_fit
+        features_paths: the list of paths to the train features shard files
+        labels_paths: the list of paths to the train labels shard files
+        batch_size: the number of rows in minibatch
+        n_epochs: the number of passes over train data
+        random_state: the seed to shuffle the order of minibatches
+    Return:
+        the tuple with trained model and fitted features transformer
+    """
+    if hasattr(predictor, "createClassifier") == False:
+        raise Exception("Predictor does not support minibatch training: " + type(predictor).__name__)
+
+    start = time.time()
+    X_scaler, classes = fitScalerStreaming(predictor.createScaler(), features_paths, labels_paths, batch_size)
+    print("Features transformer fitted in %.2f s, classes: %s" % (time.time() - start, classes))
+
+    model = predictor.createClassifier()
+    rnd = np.random.RandomState(random_state)
+    for epoch in range(n_epochs):
+        start = time.time()
+        n_rows = 0
+        for X, y in iterateMinibatches(features_paths, labels_paths, batch_size, random_state = rnd):
+            model.partial_fit(X_scaler.transform(X), y, classes = classes)
+            n_rows += len(X)
+        elapsed = time.time() - start
+        print("Epoch %d: %d rows in %.2f s, throughput = %.0f rows/s"
+              % (epoch + 1, n_rows, elapsed, n_rows / max(elapsed, 1e-9)))
+
+    predictor.model = model
+    return (model, X_scaler)
+
+def predictProba(model, X_scaler, features_paths, batch_size = 10000):
+    """
+    Predicts class probabilities for features streamed from memory-mapped data files
+    Arguments:
+        model: the trained model
+        X_scaler: the fitted features transformer
+        features_paths: the list of paths to the features shard files
+        batch_size: the number of rows in minibatch
+    Return:
+        predicted labels as array of shape = [n_samples, n_classes] with probabilities
+        of each class
+    """
+    return np.concatenate([model.predict_proba(X_scaler.transform(X))
+                           for X, _ in iterateMinibatches(features_paths, None, batch_size)])
+
+def validate(model, X_scaler, features_paths, labels_paths, batch_size = 10000):
+    """
+    Runs trained model against validation data streamed from memory-mapped data files
+    Return:
+         the tuple with mean accuracy and target score (recall level at 2% false positive rate)
+    """
+    labels_prob = predictProba(model, X_scaler, features_paths, batch_size)
+    labels = np.concatenate([np.load(path, mmap_mode = 'r') for path in labels_paths])
+    accuracy = np.mean(model.classes_[np.argmax(labels_prob, axis = 1)] == labels)
+    t_score, _ = evaluate.targetScoreFromLabels(labels_prob, labels, model.classes_)
+    return (accuracy, t_score)
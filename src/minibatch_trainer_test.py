@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The test cases for out-of-core minibatch training from memory-mapped shards
+
+@author: yaric
+"""
+import tempfile
+import unittest
+
+import numpy as np
+
+import minibatch_trainer as mt
+from sparse_linear_model import SparseLinear
+
+class TestMinibatchTrainerMethods(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        rnd = np.random.RandomState(123)
+        # integer valued features similar to glove indices and POS tags
+        cls.X = rnd.randint(0, 10, size = (900, 8)).astype("f")
+        cls.labels = np.where(cls.X[:, 0] < 3, 0, np.where(cls.X[:, 1] < 5, 1, 2))
+
+        # two shards of different size saved as Numpy files
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        cls.shards_dir = cls.temp_dir.name
+        cls.features_paths, cls.labels_paths = list(), list()
+        for i, rows in enumerate([slice(0, 400), slice(400, None)]):
+            cls.features_paths.append("%s/features_%d.npy" % (cls.shards_dir, i))
+            cls.labels_paths.append("%s/labels_%d.npy" % (cls.shards_dir, i))
+            np.save(cls.features_paths[-1], cls.X[rows])
+            np.save(cls.labels_paths[-1], cls.labels[rows])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.temp_dir.cleanup()
+
+    def test_iterate_minibatches(self):
+        # the row index kept in the first column to track rows
+        X = np.hstack([np.arange(len(self.X))[:, None], self.X])
+        paths = ["%s/indexed_%d.npy" % (self.shards_dir, i) for i in range(2)]
+        np.save(paths[0], X[:400])
+        np.save(paths[1], X[400:])
+
+        rnd = np.random.RandomState(7)
+        for _ in range(3):
+            batches = list(mt.iterateMinibatches(paths, self.labels_paths, batch_size = 64, random_state = rnd))
+            self.assertTrue(all(len(X_batch) <= 64 for X_batch, _ in batches), "Minibatch too large")
+            rows = np.concatenate([X_batch[:, 0] for X_batch, _ in batches]).astype(np.int64)
+            self.assertTrue(np.array_equal(np.sort(rows), np.arange(len(self.X))), "Rows not seen once per epoch")
+            labels = np.concatenate([y for _, y in batches])
+            self.assertTrue(np.array_equal(labels, self.labels[rows]), "Labels not aligned with features")
+
+    def test_train_minibatches(self):
+        predictor = SparseLinear(alpha = 1e-3, n_epochs = 10)
+        model, X_scaler = mt.trainMinibatches(predictor, self.features_paths, self.labels_paths,
+                                              batch_size = 128, n_epochs = 10)
+        self.assertTrue(np.array_equal(model.classes_, [0, 1, 2]), "Wrong classes collected")
+
+        # the single fit over concatenated data
+        full_scaler = predictor.createScaler()
+        full_model = predictor.train(full_scaler.fit_transform(self.X), self.labels)
+        self.assertTrue(all(np.array_equal(a, b) for a, b in zip(X_scaler.categories_, full_scaler.categories_)),
+                        "Streaming categories differ from single fit")
+
+        proba = mt.predictProba(model, X_scaler, self.features_paths, batch_size = 128)
+        full_proba = full_model.predict_proba(full_scaler.transform(self.X))
+        self.assertEqual(proba.shape, full_proba.shape, "Wrong probabilities shape")
+        self.assertLess(np.abs(proba - full_proba).mean(), 0.05, "Minibatch probabilities differ from single fit")
+        agreement = np.mean(np.argmax(proba, axis = 1) == np.argmax(full_proba, axis = 1))
+        self.assertGreater(agreement, 0.95, "Minibatch predictions differ from single fit")
+
+        accuracy, _ = mt.validate(model, X_scaler, self.features_paths, self.labels_paths, batch_size = 128)
+        self.assertGreater(accuracy, 0.9, "Minibatch model not trained")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The negative downsampling of train data. In error-only mode most of features rows
+have label 0 (no correction) and are easy to classify, so only part of them can be
+kept for training, which corrected either with sample weights or with recalibration
+of predicted probabilities to keep them comparable with model trained over all data.
+
+@author: yaric
+"""
+import numpy as np
+
+RANDOM_STATE = 123
+
+# The label of rows without correction
+NEGATIVE_LABEL = 0
+
+def downsampleNegatives(X, labels, rate, random_state = RANDOM_STATE):
+    """
+    Keeps only part of rows with negative label
+    Arguments:
+        X: the train data [n_samples, n_features]
+        labels: the GT labels [n_samples]
+        rate: the fraction of negative rows to keep in range (0, 1]
+        random_state: the seed to select negative rows
+    Return:
+        the tuple with selected train data, labels and sample weights, where kept negative
+        rows weighted as 1 / rate to compensate dropped ones
+    """
+    if rate <= 0 or rate > 1:
+        raise Exception("Negative sampling rate should be in range (0, 1], got: %s" % rate)
+    negative = labels == NEGATIVE_LABEL
+    keep = ~negative | (np.random.RandomState(random_state).rand(len(labels)) < rate)
+    sample_weight = np.where(negative[keep], 1. / rate, 1.)
+    print("Negative sampling: kept %d of %d rows (%d of %d negative) with rate = %.3f"
+          % (keep.sum(), len(labels), (negative & keep).sum(), negative.sum(), rate))
+    return (X[keep], labels[keep], sample_weight)
+
+class PriorCorrectedModel(object):
+    """
+    The wrapper of model trained over downsampled negative rows without sample weights,
+    which recalibrates predicted probabilities to the original class prior. As negative rows
+    were kept with the rate r, the model overestimates the odds of positive classes in 1 / r 
+    times, so the probability of negative class is divided by r and probabilities normalized.
+    """
+
+    def __init__(self, model, rate):
+        """
+        Creates wrapper
+        Arguments:
+            model: the trained model
+            rate: the fraction of negative rows kept for training
+        """
+        self.model = model
+        self.rate = rate
+        self.classes_ = model.classes_
+
+    def predict_proba(self, X):
+        proba = self.model.predict_proba(X)
+        proba[:, self.classes_ == NEGATIVE_LABEL] /= self.rate
+        proba /= proba.sum(axis = 1, keepdims = True)
+        return proba
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis = 1)]
+
+    def score(self, X, labels):
+        return np.mean(self.predict(X) == labels)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The test cases for negative downsampling of train data
+
+@author: yaric
+"""
+import unittest
+
+import numpy as np
+
+import negative_sampling as ns
+
+class ConstantModel(object):
+    """
+    The dummy model predicting the same probabilities for all rows
+    """
+    classes_ = np.array([0, 1, 2])
+
+    def predict_proba(self, X):
+        return np.tile([0.5, 0.3, 0.2], (len(X), 1))
+
+class TestNegativeSamplingMethods(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        rnd = np.random.RandomState(7)
+        cls.labels = np.where(rnd.rand(10000) < 0.9, 0, rnd.randint(1, 4, size = 10000))
+        cls.X = np.arange(len(cls.labels) * 2, dtype = "f").reshape((-1, 2))
+
+    def test_downsample_negatives(self):
+        X, labels, sample_weight = ns.downsampleNegatives(self.X, self.labels, 0.25)
+        self.assertEqual(np.sum(labels != 0), np.sum(self.labels != 0), "All positive rows should be kept")
+        self.assertAlmostEqual(np.sum(labels == 0) / np.sum(self.labels == 0), 0.25, delta = 0.02,
+                               msg = "Wrong fraction of negative rows kept")
+        self.assertTrue(np.all(sample_weight[labels == 0] == 4) and np.all(sample_weight[labels != 0] == 1),
+                        "Wrong sample weights")
+        # the weighted number of negative rows approximates the original one
+        self.assertAlmostEqual(sample_weight[labels == 0].sum() / np.sum(self.labels == 0), 1, delta = 0.05)
+        self.assertTrue(np.all(X[:, 0] / 2 == np.floor(X[:, 0] / 2)), "Rows should be kept intact")
+
+    def test_wrong_rate(self):
+        with self.assertRaises(Exception):
+            ns.downsampleNegatives(self.X, self.labels, 0)
+
+    def test_prior_corrected_model(self):
+        model = ns.PriorCorrectedModel(ConstantModel(), 0.5)
+        proba = model.predict_proba(self.X[:3])
+        # the negative odds are doubled
+        self.assertTrue(np.allclose(proba[0], [1.0 / 1.5, 0.3 / 1.5, 0.2 / 1.5]), "Wrong recalibrated probabilities")
+        self.assertTrue(np.allclose(proba.sum(axis = 1), 1), "Probabilities should be normalized")
+        self.assertTrue(np.all(model.predict(self.X[:3]) == 0), "Wrong predicted labels")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The offline compiled decision table of the n-gram article predictor. Every context of
+the n-gram model (up to the number of left words used by ngram_res.py) which was ever
+followed by an article is compiled into the best article, its probability and the margin
+to the runner-up article. The contexts are keyed by 64-bit hash of their words in sorted
+array, so correction needs one binary search per article position instead of three
+frequency queries and argmax, and the table is a fraction of the full model size.
+
+@author: yaric
+"""
+import time
+import pickle
+import hashlib
+import argparse
+
+import numpy as np
+
+import ngram_store as ns
+import ngram_res as nr
+import config
+
+# The separator of context words to be hashed
+WORD_SEPARATOR = "\x1f"
+
+def contextHash(context):
+    """
+    Returns the 64-bit hash of context words
+    """
+    data = WORD_SEPARATOR.join(context).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(data, digest_size = 8).digest(), "little")
+
+def contextHashes(contexts):
+    """
+    Returns the array of 64-bit hashes of contexts
+    """
+    return np.array([contextHash(context) for context in contexts], dtype = np.uint64)
+
+def nodeContexts(store, level, nodes):
+    """
+    Restores the words of context trie nodes
+    Arguments:
+        store: the NgramStore
+        level: the level of nodes (the context length)
+        nodes: the node ids within level
+    Return:
+        the list of contexts (tuples of words)
+    """
+    return [tuple(store.words[i] for i in ids) for ids in ns.nodeIds(store, level, nodes)]
+
+class DecisionTable(object):
+    """
+    The table with best article, its probability and margin to the runner-up article
+    per hashed context
+    """
+
+    def __init__(self, hashes, articles, probs, margins, dropped = 0):
+        """
+        Creates table
+        Arguments:
+            hashes: the sorted 64-bit hashes of contexts
+            articles: the index of best article in ngram_res.dt_list per context
+            probs: the probability of best article per context
+            margins: the difference of probabilities of the best and runner-up articles
+            dropped: the number of contexts dropped at compile time due to colliding hashes
+        """
+        self.hashes = hashes
+        self.articles = articles
+        self.probs = probs
+        self.margins = margins
+        self.dropped = dropped
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def nbytes(self):
+        """
+        Returns the size of table arrays in bytes
+        """
+        return self.hashes.nbytes + self.articles.nbytes + self.probs.nbytes + self.margins.nbytes
+
+    def decide(self, contexts):
+        """
+        Looks up the best articles of contexts
+        Arguments:
+            contexts: the list of contexts (lists of preceding words)
+        Return:
+            the tuple with arrays of best article index in ngram_res.dt_list, its probability
+            and margin to the runner-up article per context, the probability is 0 for
+            contexts not found in table
+        """
+        hashes = contextHashes(contexts)
+        n = len(hashes)
+        if len(self.hashes) == 0:
+            return (np.zeros(n, dtype = np.int64), np.zeros(n), np.zeros(n))
+        pos = np.minimum(np.searchsorted(self.hashes, hashes), len(self.hashes) - 1)
+        found = self.hashes[pos] == hashes
+        return (np.where(found, self.articles[pos], 0).astype(np.int64),
+                np.where(found, self.probs[pos], 0.), np.where(found, self.margins[pos], 0.))
+
+    def save(self, path):
+        """
+        Saves table as Numpy file (.npz)
+        """
+        np.savez(path, hashes = self.hashes, articles = self.articles, probs = self.probs, margins = self.margins,
+                 dropped = self.dropped)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads table saved with save, the number of dropped contexts is 0 for tables saved without it
+        """
+        with np.load(path) as data:
+            dropped = int(data["dropped"]) if "dropped" in data else 0
+            return cls(data["hashes"], data["articles"], data["probs"], data["margins"], dropped)
+
+def compileTable(store, max_context = nr.n_gram_left):
+    """
+    Compiles decision table from all contexts followed by an article
+    Arguments:
+        store: the NgramStore (or nltk_ngram.NgramCounter)
+        max_context: the maximal length of context
+    Return:
+        the DecisionTable
+    """
+    if isinstance(store, ns.NgramStore) == False:
+        store = ns.fromCounter(store)
+
+    # the column of article per word id, -1 for other words
+    article_column = np.full(len(store.words), -1, dtype = np.int64)
+    for i, word_id in enumerate(store.wordIds(nr.dt_list)):
+        if word_id >= 0:
+            article_column[word_id] = i
+    hashes, articles, probs, margins = list(), list(), list(), list()
+    for n in range(2, min(store.order, max_context + 1) + 1):
+        keys = store.keys[n]
+        nodes = (keys >> np.uint64(ns.WORD_BITS)).astype(np.int64)
+        words = (keys & np.uint64(ns.WORD_MASK)).astype(np.int64)
+        # the counts of articles per context followed by an article
+        column = article_column[words]
+        is_article = column >= 0
+        context_nodes, inverse = np.unique(nodes[is_article], return_inverse = True)
+        counts = np.zeros((len(context_nodes), len(nr.dt_list)))
+        np.add.at(counts, (inverse.ravel(), column[is_article]), store.counts[n][is_article])
+        order_probs = counts / store.totals[n][context_nodes][:, None]
+
+        # the same tie break as argmax in ngram_res.buildPredictions
+        best = np.argmax(order_probs, axis = 1)
+        sorted_probs = np.sort(order_probs, axis = 1)
+        hashes.append(contextHashes(nodeContexts(store, n - 1, context_nodes)))
+        articles.append(best.astype(np.uint8))
+        probs.append(sorted_probs[:, -1].astype(np.float32))
+        margins.append((sorted_probs[:, -1] - sorted_probs[:, -2]).astype(np.float32))
+
+    if len(hashes) == 0:
+        return DecisionTable(np.zeros(0, dtype = np.uint64), np.zeros(0, dtype = np.uint8),
+                             np.zeros(0, dtype = np.float32), np.zeros(0, dtype = np.float32))
+    hashes = np.concatenate(hashes)
+    hashes, index = np.unique(hashes, return_index = True)
+    n_contexts = sum(len(a) for a in articles)
+    return DecisionTable(hashes, np.concatenate(articles)[index], np.concatenate(probs)[index],
+                         np.concatenate(margins)[index], dropped = n_contexts - len(hashes))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='The compiler of context to best article decision table')
+    parser.add_argument('--model_file', default=config.ngram_bundle_path,
+                        help='the path to the pickled n-gram counter (.pkl) or compact n-gram store (binary bundle or .npz)')
+    parser.add_argument('--out_file', default=config.ngram_decision_table_path,
+                        help='the path to save decision table')
+    args = parser.parse_args()
+
+    if args.model_file.endswith(".pkl"):
+        # the counter pickled by earlier nltk_ngram.py script refers classes as members of __main__ module
+        from nltk_ngram import NgramModelVocabulary, FrozenVocabulary, NgramCounter
+        with open(args.model_file, 'rb') as f:
+            store = ns.fromCounter(pickle.load(f))
+    else:
+        store = ns.openStore(args.model_file)
+
+    start = time.time()
+    table = compileTable(store)
+    print("Compiled %d contexts in %.2f s" % (len(table), time.time() - start))
+    if table.dropped > 0:
+        print("Dropped %d contexts with colliding hashes" % table.dropped)
+    table.save(args.out_file)
+    print("Table saved to: %s, table size: %.1f MB, model size: %.1f MB"
+          % (args.out_file, table.nbytes() / 2**20, store.nbytes() / 2**20))
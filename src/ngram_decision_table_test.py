@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The test cases for context to best article decision table
+
+@author: yaric
+"""
+import tempfile
+import unittest
+
+import numpy as np
+
+import ngram_decision_table as dt
+import ngram_scoring as sc
+import ngram_store as ns
+import ngram_res as nr
+import nltk_ngram as nn
+from ngram_test_corpora import randomCorpora
+
+class TestDecisionTableMethods(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.corpora = randomCorpora(30, 400, 12, article_repeat = 5)
+        counter = nn.count_ngrams(5, nn.build_vocabulary(1, [w for s in cls.corpora for w in s]), cls.corpora)
+        cls.store = ns.fromCounter(counter)
+        cls.table = dt.compileTable(cls.store)
+
+    def test_same_predictions(self):
+        text_data = self.corpora[:100] + [["no", "such", "context", "the"]]
+        expected = nr.buildPredictions(text_data, sc.MLEModel(self.store))
+        results = nr.buildPredictions(text_data, self.table)
+        for s, r, e in zip(text_data, results, expected):
+            for w, p, q in zip(s, r, e):
+                if q is None:
+                    self.assertIsNone(p, "Prediction should be none for word: " + w)
+                else:
+                    self.assertEqual(p[0], q[0], "Wrong article")
+                    self.assertAlmostEqual(p[1], q[1], 6, "Wrong confidence")
+
+    def test_decide(self):
+        context = ("a", "w1")
+        freq_dist = self.store.ngrams[3][context]
+        probs = sorted(freq_dist.freq(w) for w in nr.dt_list)
+        best, prob, margin = self.table.decide([context, ("no", "such")])
+        self.assertEqual(nr.dt_list[best[0]], max(nr.dt_list, key = freq_dist.freq), "Wrong best article")
+        self.assertAlmostEqual(prob[0], probs[-1], 6, "Wrong probability")
+        self.assertAlmostEqual(margin[0], probs[-1] - probs[-2], 6, "Wrong margin")
+        self.assertEqual(prob[1], 0, "Unknown context")
+
+    def test_compact(self):
+        self.assertLess(self.table.nbytes(), self.store.nbytes() / 2, "Table should be a fraction of model size")
+        # the contexts longer than used by ngram_res are not compiled
+        self.assertEqual(len(self.table), len(dt.compileTable(self.store, nr.n_gram_left)))
+        self.assertLess(len(dt.compileTable(self.store, 1)), len(self.table))
+        self.assertEqual(self.table.dropped, 0, "No hash collisions expected in small corpus")
+
+    def test_node_contexts(self):
+        nodes = np.arange(len(self.store.contexts[2]))
+        for context, node in zip(dt.nodeContexts(self.store, 2, nodes), nodes):
+            self.assertEqual(self.store.contextNode(self.store.wordIds(context)), node, "Wrong context restored: %s" % (context,))
+
+    def test_save_load(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = temp_dir + "/ngram_decision_table_test.npz"
+            self.table.save(path)
+            table = dt.DecisionTable.load(path)
+        self.assertTrue(np.array_equal(table.hashes, self.table.hashes), "Wrong hashes")
+        self.assertTrue(np.array_equal(table.probs, self.table.probs), "Wrong probabilities")
+        self.assertEqual(table.dropped, self.table.dropped, "Wrong number of dropped contexts")
+
+        # the table saved with collisions keeps the number of dropped contexts
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = temp_dir + "/ngram_decision_table_dropped.npz"
+            dt.DecisionTable(self.table.hashes, self.table.articles, self.table.probs, self.table.margins,
+                             dropped = 3).save(path)
+            self.assertEqual(dt.DecisionTable.load(path).dropped, 3, "Dropped contexts not saved")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The bulk perplexity and cross-entropy evaluation of n-gram model over large corpus.
+The corpus is split into shards evaluated by the process pool, where each worker
+encodes sentences as matrix of n-gram windows of word ids (with the same vocabulary
+checks and padding as `to_ngrams` of the model) and scores all windows at once with
+vectorized lookups per order. The sums of log probabilities and numbers of n-grams of
+shards are combined into the same value as `perplexity` method of the model computes
+one n-gram at a time.
+
+@author: yaric
+"""
+import time
+import json
+import pickle
+import argparse
+import itertools
+import multiprocessing
+
+import numpy as np
+
+import ngram_store as ns
+import ngram_scoring as sc
+import config
+
+# The number of sentences per shard
+SHARD_SIZE = 10000
+
+class LidstoneScorer(object):
+    """
+    The bulk scoring of nltk_ngram.MLENgramModel and nltk_ngram.LidstoneNgramModel (which
+    score only the highest order n-grams) over the compact store of their counter
+    """
+
+    def __init__(self, model):
+        """
+        Creates scorer
+        Arguments:
+            model: the nltk_ngram.MLENgramModel or nltk_ngram.LidstoneNgramModel
+        """
+        self.store = ns.fromCounter(model.ngram_counter)
+        self.order = self.store.order
+        self.gamma = getattr(model, "gamma", 0.)
+        self.gamma_norm = getattr(model, "gamma_norm", 0.)
+
+    def scoreIds(self, context_ids, word_ids):
+        """
+        Returns the scores of words following the full length contexts given by word ids
+        """
+        order = self.order
+        node = np.zeros(len(word_ids), dtype = np.int64)
+        for level in range(1, order):
+            node = ns.findKeys(self.store.contexts[level], node, context_ids[:, level - 1])
+        pos = ns.findKeys(self.store.keys[order], node, word_ids)
+        counts = np.where(pos >= 0, self.store.counts[order][np.maximum(pos, 0)], 0).astype(np.float64)
+        totals = np.where(node >= 0, self.store.totals[order][np.maximum(node, 0)], 0).astype(np.float64)
+        numerators = counts + self.gamma
+        denominators = totals + self.gamma_norm
+        # the frequency in unseen context is zero
+        return np.where(denominators > 0, numerators / np.maximum(denominators, 1e-300), 0.)
+
+def scoringModel(model):
+    """
+    Returns the model scoring word ids in bulk
+    Arguments:
+        model: the n-gram model of ngram_scoring.py or nltk_ngram.MLENgramModel,
+               nltk_ngram.LidstoneNgramModel (LaplaceNgramModel)
+    Return:
+        the model with store and scoreIds(context_ids, word_ids)
+    """
+    if isinstance(model, sc.BackoffModel):
+        return model
+    import nltk_ngram as nn
+    if type(model).score in (nn.MLENgramModel.score, nn.LidstoneNgramModel.score):
+        return LidstoneScorer(model)
+    raise Exception("The model can not be scored in bulk: " + type(model).__name__)
+
+def encodeWindows(store, sentences):
+    """
+    Encodes n-grams of sentences as word ids
+    Arguments:
+        store: the NgramStore of model
+        sentences: the list of sentences (lists of words)
+    Return:
+        the matrix of n-gram windows of word ids [n-grams x order], the words out of
+        model vocabulary are encoded as unknown label, the padding symbols not found
+        in store as len(store.words)
+    """
+    order = store.order
+    kwargs = store.ngrams_kwargs
+    missing = len(store.words)
+    pad_id = lambda symbol: store.wordId(symbol) if store.wordId(symbol) >= 0 else missing
+    left = [pad_id(kwargs.get("left_pad_symbol"))] * (order - 1) if kwargs.get("pad_left", False) else []
+    right = [pad_id(kwargs.get("right_pad_symbol"))] * (order - 1) if kwargs.get("pad_right", False) else []
+    unk_id = store.wordId(store.unk_label)
+    unk_id = unk_id if unk_id >= 0 else missing
+
+    # the ids of words checked against vocabulary
+    ids = dict()
+    def lookup(word):
+        word_id = ids.get(word)
+        if word_id is None:
+            word_id = store.wordId(word)
+            if word_id < 0 or store.in_vocabulary[word_id] == False:
+                word_id = unk_id
+            ids[word] = word_id
+        return word_id
+
+    tokens, starts = list(), list()
+    for sent in sentences:
+        padded = left + [lookup(w) for w in sent] + right
+        n_windows = len(padded) - order + 1
+        if n_windows > 0:
+            starts.extend(range(len(tokens), len(tokens) + n_windows))
+            tokens.extend(padded)
+    tokens = np.array(tokens, dtype = np.int64)
+    return tokens[np.array(starts, dtype = np.int64)[:, None] + np.arange(order)]
+
+def logProbs(model, sentences):
+    """
+    Returns the base 2 log probabilities of all n-grams of sentences
+    Arguments:
+        model: the model returned by scoringModel
+        sentences: the list of sentences (lists of words)
+    Return:
+        the array of log probabilities, -inf for zero probabilities
+    """
+    windows = encodeWindows(model.store, sentences)
+    if len(windows) == 0:
+        return np.zeros(0)
+    scores = model.scoreIds(windows[:, :-1], windows[:, -1])
+    with np.errstate(divide = 'ignore'):
+        return np.log2(scores)
+
+# The model of worker process
+__worker_model = None
+
+def __initWorker(model):
+    global __worker_model
+    __worker_model = model
+
+def __shardLogProb(sentences):
+    """
+    Returns the tuple with sum of log probabilities and number of n-grams of the shard
+    """
+    log_probs = logProbs(__worker_model, sentences)
+    return (float(log_probs.sum()), len(log_probs))
+
+def __shards(sentences, shard_size):
+    """
+    Splits sentences (list or iterable) into lists of shard size
+    """
+    sentences = iter(sentences)
+    shard = list(itertools.islice(sentences, shard_size))
+    while len(shard) > 0:
+        yield shard
+        shard = list(itertools.islice(sentences, shard_size))
+
+def corpusEntropy(model, sentences, processes = None, shard_size = SHARD_SIZE):
+    """
+    Calculates the cross-entropy of n-gram model over corpus: the negative average log
+    probability of all n-grams of sentences, which is the same as entropy of the model
+    for the single sentence
+    Arguments:
+        model: the n-gram model (see scoringModel)
+        sentences: the list or iterable of sentences (lists of words)
+        processes: the number of worker processes [optional], if None the CPU count used,
+                   if 1 the shards evaluated in this process
+        shard_size: the number of sentences per shard
+    Return:
+        the tuple with cross-entropy and number of n-grams
+    """
+    model = scoringModel(model)
+    if processes == None:
+        processes = multiprocessing.cpu_count()
+    if processes == 1:
+        __initWorker(model)
+        results = [__shardLogProb(shard) for shard in __shards(sentences, shard_size)]
+    else:
+        # the shards are mapped in order, so the sum does not depend on scheduling
+        with multiprocessing.Pool(processes, initializer = __initWorker, initargs = (model,)) as pool:
+            results = list(pool.imap(__shardLogProb, __shards(sentences, shard_size)))
+
+    H = sum(h for h, _ in results)
+    processed_ngrams = sum(n for _, n in results)
+    if processed_ngrams == 0:
+        raise Exception("No n-grams found in corpus")
+    return (- (H / processed_ngrams), processed_ngrams)
+
+def corpusPerplexity(model, sentences, processes = None, shard_size = SHARD_SIZE):
+    """
+    Calculates the perplexity of n-gram model over corpus (see corpusEntropy)
+    """
+    return pow(2.0, corpusEntropy(model, sentences, processes, shard_size)[0])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='The bulk perplexity evaluation of n-gram model over corpus')
+    parser.add_argument('--model_file', default=config.ngram_bundle_path,
+                        help='the path to the pickled n-gram counter (.pkl) or compact n-gram store (binary bundle or .npz)')
+    parser.add_argument('--sentences_file', default=config.sentence_validate_path,
+                        help="the text's corpora file to evaluate")
+    parser.add_argument('--scoring', default='kneser_ney', choices=sorted(sc.MODELS),
+                        help='the scoring model')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='the number of worker processes')
+    parser.add_argument('--shard_size', type=int, default=SHARD_SIZE,
+                        help='the number of sentences per shard')
+    parser.add_argument('--check', type=int, default=0,
+                        help='the number of sentences to compare with perplexity evaluated one n-gram at a time')
+    args = parser.parse_args()
+
+    if args.model_file.endswith(".pkl"):
+        # the counter pickled by earlier nltk_ngram.py script refers classes as members of __main__ module
+        from nltk_ngram import NgramModelVocabulary, FrozenVocabulary, NgramCounter
+        with open(args.model_file, 'rb') as f:
+            store = ns.fromCounter(pickle.load(f))
+    else:
+        store = ns.openStore(args.model_file)
+    model = sc.buildModel(args.scoring, store)
+
+    with open(args.sentences_file) as f:
+        sentences = json.load(f)
+
+    start = time.time()
+    entropy, n_ngrams = corpusEntropy(model, sentences, args.processes, args.shard_size)
+    elapsed = time.time() - start
+    print("Entropy: %.6f, perplexity: %.4f, n-grams: %d, time: %.2f s (%.0f n-grams/s)"
+          % (entropy, pow(2.0, entropy), n_ngrams, elapsed, n_ngrams / max(elapsed, 1e-9)))
+
+    if args.check > 0:
+        checked = sentences[:args.check]
+        start = time.time()
+        H = N = 0
+        for sentence in checked:
+            n = len(list(store.to_ngrams(sentence)))
+            if n > 0:
+                H += model.entropy(sentence) * n
+                N += n
+        elapsed = time.time() - start
+        bulk = corpusEntropy(model, checked, 1, args.shard_size)[0]
+        print("Checked %d sentences: entropy %.6f, bulk entropy %.6f, time: %.2f s (%.0f n-grams/s)"
+              % (len(checked), H / max(N, 1), bulk, elapsed, N / max(elapsed, 1e-9)))
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The test cases for bulk perplexity evaluation of n-gram model
+
+@author: yaric
+"""
+import unittest
+
+import ngram_perplexity as pp
+import ngram_scoring as sc
+import nltk_ngram as nn
+from ngram_test_corpora import randomCorpora
+
+class TestNgramPerplexityMethods(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        sentences = randomCorpora(30, 500, 12, article_repeat = 5)
+        cls.corpora, cls.held_out = sentences[:400], sentences[400:] + [["no", "such", "words"]]
+        cls.counter = nn.count_ngrams(4, nn.build_vocabulary(2, [w for s in cls.corpora for w in s]), cls.corpora)
+
+    def assertSameEntropy(self, model):
+        H, N = 0., 0
+        for sentence in self.held_out:
+            n = len(list(self.counter.to_ngrams(sentence)))
+            H += model.entropy(sentence) * n
+            N += n
+        entropy, n_ngrams = pp.corpusEntropy(model, self.held_out, processes = 1, shard_size = 30)
+        self.assertEqual(n_ngrams, N, "Wrong number of n-grams")
+        self.assertAlmostEqual(entropy, H / N, 9, "Wrong entropy of " + type(model).__name__)
+        self.assertAlmostEqual(pp.corpusPerplexity(model, self.held_out[:1], processes = 1),
+                               model.perplexity(self.held_out[0]), 9, "Wrong perplexity")
+
+    def test_scoring_models(self):
+        self.assertSameEntropy(sc.KneserNeyModel(self.counter))
+        self.assertSameEntropy(sc.MLEModel(self.counter))
+
+    def test_nltk_models(self):
+        self.assertSameEntropy(nn.LidstoneNgramModel(0.1, self.counter))
+        self.assertSameEntropy(nn.LaplaceNgramModel(self.counter))
+        with self.assertRaises(Exception):
+            pp.corpusEntropy(nn.BaseNgramModel(self.counter), self.held_out, processes = 1)
+
+    def test_parallel(self):
+        model = sc.KneserNeyModel(self.counter)
+        expected = pp.corpusEntropy(model, self.held_out, processes = 1)
+        # the sentences can be streamed
+        entropy = pp.corpusEntropy(model, iter(self.held_out), processes = 2, shard_size = 17)
+        self.assertEqual(entropy[1], expected[1], "Wrong number of n-grams")
+        self.assertAlmostEqual(entropy[0], expected[0], 12, "Wrong entropy")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The pruning of n-gram model by count threshold or by relative entropy (Stolcke, 1998).
+Each n-gram (of order 2 and higher) gets a pruning score: its count or the increase of
+relative entropy of the Kneser-Ney model if the n-gram is dropped and its probability
+is backed off to the shorter context. The n-grams with scores below the threshold are
+removed together with the context trie nodes which are left without n-grams, the suffix
+n-grams and contexts of kept n-grams are kept (as by SRILM pruning), so the kept n-grams
+still back off to the same shorter contexts, and the context totals are kept, so the
+frequencies of kept n-grams do not change. The threshold can be
+chosen to fit the target model size. The model size, load time, query throughput and
+target score of predictions are reported before and after pruning.
+
+@author: yaric
+"""
+import os
+import time
+import json
+import pickle
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+
+import ngram_store as ns
+import ngram_scoring as sc
+import ngram_res as nr
+import threshold_sweep as ts
+import evaluate
+import config
+
+def pruneStore(store, keep):
+    """
+    Removes n-grams from store. The suffix n-grams (without the first context word) of
+    kept n-grams and the suffixes and prefixes of kept contexts are kept as well, the
+    same way as SRILM pruning keeps the n-grams which the kept ones back off to.
+    Arguments:
+        store: the NgramStore
+        keep: the dictionary with flags whether to keep n-gram per key per order
+    Return:
+        the pruned NgramStore
+    """
+    order = store.order
+    key_nodes = {n:(store.keys[n] >> np.uint64(ns.WORD_BITS)).astype(np.int64) for n in store.keys}
+    links = sc.suffixLinks(store)
+    # the suffix n-grams of kept n-grams are kept as well, so the lower orders which the
+    # kept n-grams back off to stay in the store
+    keep = {n:np.array(keep[n], dtype = bool) for n in keep}
+    for n in range(order, 2, -1):
+        suffix_nodes = links[n - 1][key_nodes[n][keep[n]]]
+        words = (store.keys[n][keep[n]] & np.uint64(ns.WORD_MASK)).astype(np.int64)
+        pos = ns.findKeys(store.keys[n - 1], suffix_nodes, words)
+        keep[n - 1][pos[pos >= 0]] = True
+
+    # the nodes referred by kept n-grams with their ancestors and suffixes
+    needed = {level:np.zeros(len(store.contexts[level]), dtype = bool) for level in range(1, order)}
+    for n in range(2, order + 1):
+        needed[n - 1][key_nodes[n][keep[n]]] = True
+    for level in range(order - 1, 1, -1):
+        parents = (store.contexts[level][needed[level]] >> np.uint64(ns.WORD_BITS)).astype(np.int64)
+        needed[level - 1][parents] = True
+        suffixes = links[level][needed[level]]
+        needed[level - 1][suffixes[suffixes >= 0]] = True
+
+    # the mapping is monotone, so the remapped keys stay sorted
+    new_index = {0:np.zeros(1, dtype = np.int64)}
+    contexts = dict()
+    for level in range(1, order):
+        new_index[level] = np.cumsum(needed[level]) - 1
+        level_keys = store.contexts[level][needed[level]]
+        parents = (level_keys >> np.uint64(ns.WORD_BITS)).astype(np.int64)
+        contexts[level] = ns.packKeys(new_index[level - 1][parents], level_keys & np.uint64(ns.WORD_MASK))
+
+    keys, counts, totals = dict(), dict(), dict()
+    for n in range(2, order + 1):
+        kept = keep[n]
+        keys[n] = ns.packKeys(new_index[n - 1][key_nodes[n][kept]], store.keys[n][kept] & np.uint64(ns.WORD_MASK))
+        counts[n] = np.asarray(store.counts[n][kept])
+        totals[n] = np.asarray(store.totals[n][needed[n - 1]])
+
+    return ns.NgramStore(order, list(store.words), np.asarray(store.in_vocabulary), store.vocabulary_len,
+                         np.asarray(store.unigram_counts), contexts, keys, counts, totals, store.unk_label,
+                         dict(store.ngrams_kwargs))
+
+def countScores(store):
+    """
+    Returns the pruning scores equal to n-gram counts per order
+    """
+    return {n:store.counts[n].astype(np.float64) for n in store.keys}
+
+def entropyScores(store, discount = None):
+    """
+    Returns the relative entropy pruning scores per order. The score of n-gram (h, w) is
+    the weighted difference of log probabilities of the interpolated Kneser-Ney model and
+    of backed off probability: P(h) * P(w|h) * (log P(w|h) - log(gamma(h) * P(w|h'))),
+    where h' is the context h without first word. The effect of pruning on the backoff
+    weights of other words is neglected.
+    Arguments:
+        store: the NgramStore
+        discount: the absolute discount of Kneser-Ney model [optional]
+    Return:
+        the dictionary with scores per key per order
+    """
+    model = sc.KneserNeyModel(store, discount)
+    links = sc.suffixLinks(store)
+    probs, scores = dict(), dict()
+    for n in range(2, store.order + 1):
+        nodes = model.key_nodes[n]
+        words = (store.keys[n] & np.uint64(ns.WORD_MASK)).astype(np.int64)
+        if n == 2:
+            lower = model.unigram_probs[words]
+        else:
+            pos = ns.findKeys(store.keys[n - 1], links[n - 1][nodes], words)
+            lower = np.where(pos >= 0, probs[n - 1][np.maximum(pos, 0)], model.uniform)
+        backoff = model.gammas[n][nodes] * lower
+        probs[n] = model.alphas[n] + backoff
+        totals = store.totals[n].astype(np.float64)
+        context_probs = totals[nodes] / max(totals.sum(), 1)
+        scores[n] = context_probs * probs[n] * (np.log(probs[n]) - np.log(np.maximum(backoff, 1e-300)))
+    return scores
+
+def pruneByThreshold(store, scores, threshold):
+    """
+    Removes n-grams with score below threshold
+    """
+    return pruneStore(store, {n:scores[n] >= threshold for n in scores})
+
+def pruneToSize(store, scores, target_bytes):
+    """
+    Removes n-grams with the lowest scores until the store fits the target size
+    Arguments:
+        store: the NgramStore
+        scores: the dictionary with pruning scores per key per order
+        target_bytes: the target size of store arrays in bytes
+    Return:
+        the tuple with pruned NgramStore and score threshold
+    """
+    if store.nbytes() <= target_bytes:
+        return (store, float('-inf'))
+    # the store size is decreasing with threshold, the lowest fitting threshold is searched
+    thresholds = np.unique(np.concatenate([s for s in scores.values()] + [[np.inf]]))
+    lo, hi = 0, len(thresholds) - 1
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if pruneByThreshold(store, scores, thresholds[mid]).nbytes() <= target_bytes:
+            hi = mid
+        else:
+            lo = mid + 1
+    return (pruneByThreshold(store, scores, thresholds[lo]), float(thresholds[lo]))
+
+def saveStore(store, path):
+    """
+    Saves store as uncompressed Numpy archive if path ends with .npz or as binary bundle otherwise
+    """
+    if path.endswith(".npz"):
+        store.save(path)
+    else:
+        store.saveBundle(path)
+
+def modelReport(path, text, correct, scoring = "mle"):
+    """
+    Measures the model saved to file
+    Arguments:
+        path: the path to the saved store
+        text: the text corpora to predict articles
+        correct: the ground truth corrections of text corpora
+        scoring: the name of scoring model (see ngram_scoring.MODELS)
+    Return:
+        the dictionary with file size in MB, load time in seconds, number of n-grams,
+        the throughput in articles per second and target score
+    """
+    start = time.time()
+    store = ns.openStore(path)
+    model = sc.buildModel(scoring, store)
+    load_time = time.time() - start
+
+    start = time.time()
+    submission = nr.buildPredictions(text, model)
+    predict_time = time.time() - start
+    n_articles = sum(1 for sentence in text for w in sentence if w.lower() in nr.dt_list)
+
+    confidence, is_correct, is_mistake, _ = ts.submissionArrays(text, correct, submission)
+    score, accuracy = evaluate.targetScore(confidence, is_correct, is_mistake)
+    return {"size_mb":os.path.getsize(path) / 2**20, "load_time":load_time, "n_ngrams":store.n_ngrams(),
+            "articles_per_second":n_articles / max(predict_time, 1e-9), "target_score":score, "accuracy":accuracy}
+
+def printReport(before, after):
+    """
+    Prints models measurements before and after pruning
+    """
+    print("%-20s %15s %15s" % ("", "before", "after"))
+    for key, fmt in [("n_ngrams", "%15d"), ("size_mb", "%15.2f"), ("load_time", "%15.4f"),
+                     ("articles_per_second", "%15.0f"), ("target_score", "%15.4f"), ("accuracy", "%15.4f")]:
+        print(("%-20s " + fmt + " " + fmt) % (key, before[key], after[key]))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='The pruning of n-gram model by count or relative entropy')
+    parser.add_argument('--model_file', default=config.ngram_bundle_path,
+                        help='the path to the pickled n-gram counter (.pkl) or compact n-gram store (binary bundle or .npz)')
+    parser.add_argument('--out_file', default=config.ngram_pruned_path,
+                        help='the path to save pruned n-gram store')
+    parser.add_argument('--method', default='entropy', choices=['count', 'entropy'],
+                        help='the pruning scores: n-gram counts or relative entropy increase')
+    parser.add_argument('--min_count', type=int, default=None,
+                        help='the minimal count of n-gram to keep (only for count pruning)')
+    parser.add_argument('--target_mb', type=float, default=None,
+                        help='the target size of pruned store arrays in MB')
+    parser.add_argument('--scoring', default='mle', choices=sorted(sc.MODELS),
+                        help='the scoring of articles to evaluate predictions')
+    parser.add_argument('--sentences_file', default=config.sentence_validate_path,
+                        help="the text's corpora file to evaluate predictions")
+    parser.add_argument('--corrections_file', default=config.corrections_validate_path,
+                        help='the path to the file with ground truth corrections')
+    args = parser.parse_args()
+
+    if (args.min_count == None) == (args.target_mb == None):
+        raise Exception("Either minimal count or target size should be provided")
+    if args.min_count != None and args.method != 'count':
+        raise Exception("The minimal count can be used only with count pruning")
+
+    model_file = args.model_file
+    work_dir = None
+    if model_file.endswith(".pkl"):
+        # the counter pickled by earlier nltk_ngram.py script refers classes as members of __main__ module
+        from nltk_ngram import NgramModelVocabulary, FrozenVocabulary, NgramCounter
+        with open(model_file, 'rb') as f:
+            store = ns.fromCounter(pickle.load(f))
+        # the full store is saved to measure it the same way as pruned one and removed after report
+        work_dir = tempfile.mkdtemp()
+        model_file = os.path.join(work_dir, "full" + os.path.splitext(args.out_file)[1])
+        saveStore(store, model_file)
+    else:
+        store = ns.openStore(model_file)
+
+    start = time.time()
+    scores = countScores(store) if args.method == 'count' else entropyScores(store)
+    if args.min_count != None:
+        pruned, threshold = pruneByThreshold(store, scores, args.min_count), args.min_count
+    else:
+        pruned, threshold = pruneToSize(store, scores, args.target_mb * 2**20)
+    print("Pruned with %s threshold %g in %.2f s: %d -> %d n-grams" % (args.method, threshold, time.time() - start,
+                                                                      store.n_ngrams(), pruned.n_ngrams()))
+    saveStore(pruned, args.out_file)
+    print("Pruned store saved to: " + args.out_file)
+
+    with open(args.sentences_file) as f:
+        text = json.load(f)
+    with open(args.corrections_file) as f:
+        correct = json.load(f)
+    try:
+        printReport(modelReport(model_file, text, correct, args.scoring),
+                    modelReport(args.out_file, text, correct, args.scoring))
+    finally:
+        if work_dir != None:
+            shutil.rmtree(work_dir)
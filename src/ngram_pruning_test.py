@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The test cases for count and relative entropy pruning of n-gram model
+
+@author: yaric
+"""
+import unittest
+
+import numpy as np
+
+import ngram_pruning as pr
+import ngram_scoring as sc
+import ngram_store as ns
+import nltk_ngram as nn
+from ngram_test_corpora import randomCorpora
+
+class TestNgramPruningMethods(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.corpora = randomCorpora(30, 400, 12, article_repeat = 5)
+        cls.counter = nn.count_ngrams(4, nn.build_vocabulary(1, [w for s in cls.corpora for w in s]), cls.corpora)
+        cls.store = ns.fromCounter(cls.counter)
+
+    def test_count_pruning(self):
+        pruned = pr.pruneByThreshold(self.store, pr.countScores(self.store), 2)
+        self.assertLess(pruned.n_ngrams(), self.store.n_ngrams(), "Singletons should be pruned")
+        for order in range(2, 5):
+            for context, freq_dist in self.counter.ngrams[order].items():
+                counts = pruned.ngrams[order][context]
+                for w, c in freq_dist.items():
+                    self.assertEqual(counts[w], c if c >= 2 else 0, "Wrong count: %s %s" % (context, w))
+                if counts.B() > 0:
+                    self.assertEqual(counts.N(), freq_dist.N(), "Context total should be kept")
+        self.assertTrue(np.array_equal(pruned.unigram_counts, self.store.unigram_counts), "Unigrams should be kept")
+        self.assertLess(len(pruned.contexts[3]), len(self.store.contexts[3]), "Empty contexts should be removed")
+
+    def test_suffixes_kept(self):
+        scores = pr.entropyScores(self.store)
+        pruned = pr.pruneByThreshold(self.store, scores, np.quantile(np.concatenate(list(scores.values())), 0.7))
+        self.assertLess(pruned.n_ngrams(), self.store.n_ngrams(), "N-grams should be pruned")
+        links = sc.suffixLinks(pruned)
+        for level in range(2, 4):
+            self.assertTrue(np.all(links[level] >= 0), "Suffix contexts should be kept")
+        for n in range(3, 5):
+            nodes = (pruned.keys[n] >> np.uint64(ns.WORD_BITS)).astype(np.int64)
+            words = (pruned.keys[n] & np.uint64(ns.WORD_MASK)).astype(np.int64)
+            pos = ns.findKeys(pruned.keys[n - 1], links[n - 1][nodes], words)
+            self.assertTrue(np.all(pos >= 0), "Suffix n-grams should be kept")
+
+    def test_kneser_ney_kept_scores(self):
+        scores = pr.entropyScores(self.store)
+        pruned = pr.pruneByThreshold(self.store, scores, np.quantile(np.concatenate(list(scores.values())), 0.7))
+        model = sc.KneserNeyModel(pruned)
+        for n in range(3, 5):
+            nodes = (pruned.keys[n] >> np.uint64(ns.WORD_BITS)).astype(np.int64)
+            context_ids = ns.nodeIds(pruned, n - 1, nodes)
+            words = (pruned.keys[n] & np.uint64(ns.WORD_MASK)).astype(np.int64)
+            # all shorter contexts of kept n-gram are found, so it is interpolated with
+            # its stored suffix n-gram rather than backed off past it
+            context_nodes = model.contextNodes(context_ids)
+            self.assertTrue(all(np.all(node >= 0) for node in context_nodes), "Backoff contexts should be kept")
+            suffix = model.scoreIds(context_ids[:, 1:], words)
+            expected = model.alphas[n] + model.gammas[n][nodes] * suffix
+            self.assertTrue(np.allclose(model.scoreIds(context_ids, words), expected), "Wrong interpolation")
+            pos = ns.findKeys(pruned.keys[n - 1], context_nodes[n - 2] if n > 2 else nodes * 0, words)
+            self.assertTrue(np.all(pos >= 0), "Suffix n-grams should be stored")
+
+    def test_keep_all(self):
+        pruned = pr.pruneByThreshold(self.store, pr.countScores(self.store), 0)
+        for n in range(2, 5):
+            self.assertTrue(np.array_equal(pruned.keys[n], self.store.keys[n]), "Nothing should be pruned")
+            self.assertTrue(np.array_equal(pruned.contexts[n - 1], self.store.contexts[n - 1]))
+
+    def test_entropy_pruning_to_size(self):
+        scores = pr.entropyScores(self.store)
+        for n in range(2, 5):
+            self.assertEqual(len(scores[n]), len(self.store.keys[n]), "Score per n-gram expected")
+        target = self.store.nbytes() / 3
+        pruned, threshold = pr.pruneToSize(self.store, scores, target)
+        self.assertLessEqual(pruned.nbytes(), target, "Store should fit target size")
+        lower = max(v for n in scores for v in scores[n] if v < threshold)
+        self.assertGreater(pr.pruneByThreshold(self.store, scores, lower).nbytes(), target,
+                           "The lowest fitting threshold expected")
+
+        model = sc.KneserNeyModel(pruned)
+        self.assertAlmostEqual(sum(model.score(w, ("w1", "a", "w2")) for w in pruned.words), 1., 9,
+                               "Pruned model should be normalized")
+
+if __name__ == '__main__':
+    unittest.main()
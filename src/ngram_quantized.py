@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The export of n-gram scoring model into store of precomputed log probabilities and
+backoff weights quantized to 8 or 16 bits. The log probabilities of each order (and the
+backoff weights) are replaced by codes of the codebook of 2^bits values evenly spaced
+over the range of values, so the error of log probability is at most half of the step
+(range / (2^bits - 1) / 2), i.e. the relative error of probability is bounded as well.
+The counts and context
+totals are dropped and the trie levels and n-grams are stored as word ids grouped by
+parent node with offsets per node, so the word ids take 2 or 4 bytes instead of 8 bytes
+of packed keys. The scoring is a pure table lookup: the binary search of word within
+the parent node range and the codebook lookup of its log probability.
+
+The interpolated Kneser-Ney model is exported in backoff form: the stored probability
+of n-gram is the full interpolated probability and the probability of not stored n-gram
+is the backoff weight of context multiplied by the probability of shorter context. The
+MLE model is exported with probabilities of exact contexts only.
+
+@author: yaric
+"""
+import os
+import sys
+import json
+import time
+import pickle
+import bisect
+import argparse
+
+import numpy as np
+
+import ngram_store as ns
+import ngram_scoring as sc
+import ngram_res as nr
+import threshold_sweep as ts
+import evaluate
+import config
+
+# The supported sizes of codes in bits
+CODE_BITS = {8:np.uint8, 16:np.uint16}
+
+def quantizeValues(values, bits = 8):
+    """
+    Quantizes values with the codebook of evenly spaced values
+    Arguments:
+        values: the array of values, can include -inf
+        bits: the size of codes in bits (see CODE_BITS)
+    Return:
+        the tuple with codes and sorted codebook (float32)
+    """
+    if bits not in CODE_BITS:
+        raise Exception("Unsupported code size: %d bits" % bits)
+    levels = 1 << bits
+    values = np.asarray(values, dtype = np.float64)
+    unique = np.unique(values)
+    if len(unique) <= levels:
+        # the values are kept exactly up to float32 precision
+        codebook = unique
+    else:
+        # the infinite values get their own code
+        finite = values[np.isfinite(values)]
+        n_levels = levels - int(len(finite) < len(values))
+        codebook = np.linspace(finite.min(), finite.max(), n_levels)
+        if len(finite) < len(values):
+            codebook = np.concatenate(([-np.inf], codebook))
+    codebook = codebook.astype(np.float32)
+    # the nearest codebook entry of value
+    with np.errstate(invalid = 'ignore'):
+        bounds = (codebook[1:].astype(np.float64) + codebook[:-1]) / 2
+    codes = np.searchsorted(bounds, values)
+    return (codes.astype(CODE_BITS[bits]), codebook)
+
+def nodeOffsets(parents, n_parents):
+    """
+    Returns the offsets of children ranges per parent node of children sorted by parent
+    """
+    offsets = np.searchsorted(parents, np.arange(n_parents + 1))
+    return offsets.astype(np.uint32 if len(parents) <= np.iinfo(np.uint32).max else np.int64)
+
+def findChildren(offsets, words, nodes, word_ids):
+    """
+    Finds children by binary search within the ranges of parent nodes
+    Arguments:
+        offsets: the offsets of children ranges per parent node
+        words: the word ids of children sorted within parent ranges
+        nodes: the parent node ids, negative for not found parents
+        word_ids: the word ids to find, negative for unknown words
+    Return:
+        the positions of children, -1 if not found
+    """
+    nodes = np.asarray(nodes, dtype = np.int64)
+    word_ids = np.asarray(word_ids, dtype = np.int64)
+    valid = (nodes >= 0) & (word_ids >= 0)
+    if len(words) == 0:
+        return np.full(valid.shape, -1, dtype = np.int64)
+    parents = np.where(valid, nodes, 0)
+    lo = offsets[parents].astype(np.int64)
+    end = offsets[parents + 1].astype(np.int64)
+    hi = np.where(valid, end, lo)
+    # the vectorized lower bound search
+    active = lo < hi
+    while active.any():
+        mid = (lo + hi) // 2
+        right = active & (words[np.minimum(mid, len(words) - 1)] < word_ids)
+        lo = np.where(right, mid + 1, lo)
+        hi = np.where(active & (right == False), mid, hi)
+        active = lo < hi
+    found = valid & (lo < end) & (words[np.minimum(lo, len(words) - 1)] == word_ids)
+    return np.where(found, lo, -1)
+
+class QuantizedStore(object):
+    """
+    The store of quantized log probabilities and backoff weights of n-gram model
+    """
+
+    def __init__(self, order, words, in_vocabulary, vocabulary_len, unk_label, ngrams_kwargs, backoff,
+                 arrays, log_uniform):
+        """
+        Creates store
+        Arguments:
+            order: the highest order of n-grams
+            words: the sorted list of words, the word id is the index in this list
+            in_vocabulary: the flags whether word is in the model vocabulary per word id
+            vocabulary_len: the size of model vocabulary (accounting for unknown words)
+            unk_label: the label of unknown words
+            ngrams_kwargs: the padding options of model
+            backoff: the flag to indicate whether not stored n-grams back off to shorter
+                     contexts, otherwise only the exact context probabilities are scored
+            arrays: the dictionary with arrays: context_offsets_<level>, context_words_<level>,
+                    ngram_offsets_<order>, ngram_words_<order>, prob_codes_<order>,
+                    prob_book_<order> (order 1 for unigrams per word id), backoff_codes_<order>,
+                    backoff_book_<order> (per context node of order)
+            log_uniform: the log probability of unknown word
+        """
+        self.order = order
+        self.words = words
+        self.in_vocabulary = in_vocabulary
+        self.vocabulary_len = int(vocabulary_len)
+        self.unk_label = unk_label
+        self.ngrams_kwargs = ngrams_kwargs
+        self.backoff = backoff
+        self.arrays = arrays
+        self.log_uniform = log_uniform
+        self.vocabulary = ns.StoreVocabulary(self)
+
+    def wordId(self, word):
+        """
+        Returns the id of word or -1 if word not in store
+        """
+        pos = bisect.bisect_left(self.words, word)
+        if pos < len(self.words) and self.words[pos] == word:
+            return pos
+        return -1
+
+    def wordIds(self, words):
+        """
+        Returns the list of ids of words, -1 for unknown words
+        """
+        return [self.wordId(w) for w in words]
+
+    def check_against_vocab(self, word):
+        if word in self.vocabulary:
+            return word
+        return self.unk_label
+
+    def to_ngrams(self, sequence):
+        """
+        Generates n-grams with padding options of the model
+        """
+        from nltk.util import ngrams
+        return ngrams(sequence, self.order, **self.ngrams_kwargs)
+
+    def logProbs(self, order, positions):
+        """
+        Returns the log probabilities of n-grams at positions (unigrams per word id for order 1)
+        """
+        if len(self.arrays["prob_codes_%d" % order]) == 0:
+            return np.full(len(positions), -np.inf)
+        return self.arrays["prob_book_%d" % order][self.arrays["prob_codes_%d" % order][positions]]
+
+    def logBackoffs(self, order, nodes):
+        """
+        Returns the log backoff weights of context nodes of n-grams order
+        """
+        if len(self.arrays["backoff_codes_%d" % order]) == 0:
+            return np.zeros(len(nodes))
+        return self.arrays["backoff_book_%d" % order][self.arrays["backoff_codes_%d" % order][nodes]]
+
+    def nbytes(self):
+        """
+        Returns the size of store arrays in bytes
+        """
+        words = sys.getsizeof(self.words) + sum(sys.getsizeof(w) for w in self.words)
+        return sum(a.nbytes for a in self.arrays.values()) + self.in_vocabulary.nbytes + words
+
+    def save(self, path):
+        """
+        Saves store arrays into the Numpy file
+        """
+        meta = {"order":self.order, "vocabulary_len":self.vocabulary_len, "unk_label":self.unk_label,
+                "ngrams_kwargs":self.ngrams_kwargs, "backoff":self.backoff, "log_uniform":self.log_uniform}
+        np.savez(path, meta = np.array(json.dumps(meta)), words = np.array(list(self.words)),
+                 in_vocabulary = self.in_vocabulary, **self.arrays)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads store saved with save()
+        """
+        with np.load(path, allow_pickle = False) as data:
+            meta = json.loads(str(data["meta"]))
+            arrays = {name:data[name] for name in data.files if name not in ("meta", "words", "in_vocabulary")}
+            return cls(meta["order"], data["words"].tolist(), data["in_vocabulary"], meta["vocabulary_len"],
+                       meta["unk_label"], meta["ngrams_kwargs"], meta["backoff"], arrays, meta["log_uniform"])
+
+def quantizeModel(model, bits = 8):
+    """
+    Exports scoring model into quantized store
+    Arguments:
+        model: the ngram_scoring.KneserNeyModel or ngram_scoring.MLEModel
+        bits: the size of codes in bits (see CODE_BITS)
+    Return:
+        the QuantizedStore
+    """
+    if type(model) not in (sc.KneserNeyModel, sc.MLEModel):
+        raise Exception("The model can not be quantized: " + type(model).__name__)
+    store = model.store
+    backoff = isinstance(model, sc.KneserNeyModel)
+    word_type = np.min_scalar_type(max(len(store.words) - 1, 0))
+    arrays = dict()
+    with np.errstate(divide = 'ignore'):
+        for level in range(1, store.order):
+            keys = store.contexts[level]
+            parents = (keys >> np.uint64(ns.WORD_BITS)).astype(np.int64)
+            n_parents = len(store.contexts[level - 1]) if level > 1 else 1
+            arrays["context_offsets_%d" % level] = nodeOffsets(parents, n_parents)
+            arrays["context_words_%d" % level] = (keys & np.uint64(ns.WORD_MASK)).astype(word_type)
+
+        arrays["prob_codes_1"], arrays["prob_book_1"] = quantizeValues(np.log2(model.unigram_probs), bits)
+        for n in range(2, store.order + 1):
+            keys = store.keys[n]
+            nodes = (keys >> np.uint64(ns.WORD_BITS)).astype(np.int64)
+            word_ids = (keys & np.uint64(ns.WORD_MASK)).astype(np.int64)
+            arrays["ngram_offsets_%d" % n] = nodeOffsets(nodes, len(store.contexts[n - 1]))
+            arrays["ngram_words_%d" % n] = word_ids.astype(word_type)
+            if backoff:
+                # the full interpolated probability of stored n-gram
+                probs = model.scoreIds(ns.nodeIds(store, n - 1, nodes), word_ids)
+                gammas = model.gammas[n]
+            else:
+                probs = model.probs[n]
+                gammas = np.zeros(0)
+            arrays["prob_codes_%d" % n], arrays["prob_book_%d" % n] = quantizeValues(np.log2(probs), bits)
+            arrays["backoff_codes_%d" % n], arrays["backoff_book_%d" % n] = quantizeValues(np.log2(gammas), bits)
+        log_uniform = float(np.log2(model.uniform)) if backoff else float("-inf")
+
+    return QuantizedStore(store.order, list(store.words), np.asarray(store.in_vocabulary, dtype = bool),
+                          store.vocabulary_len, store.unk_label, dict(store.ngrams_kwargs), backoff, arrays,
+                          log_uniform)
+
+class QuantizedModel(sc.BackoffModel):
+    """
+    The scoring model over quantized store with the same interface as ngram_scoring models
+    """
+
+    def __init__(self, store):
+        """
+        Creates model
+        Arguments:
+            store: the QuantizedStore
+        """
+        self.store = store
+        self.order = store.order
+
+    def contextNodes(self, context_ids):
+        context_ids = np.asarray(context_ids, dtype = np.int64)
+        length = context_ids.shape[1]
+        arrays = self.store.arrays
+        nodes = [np.zeros(len(context_ids), dtype = np.int64)]
+        for k in range(1, min(length, self.order - 1) + 1):
+            node = nodes[0]
+            for level, j in enumerate(range(length - k, length), 1):
+                node = findChildren(arrays["context_offsets_%d" % level], arrays["context_words_%d" % level],
+                                    node, context_ids[:, j])
+            nodes.append(node)
+        return nodes
+
+    def scoreNodes(self, nodes, orders, word_ids):
+        store = self.store
+        arrays = store.arrays
+        known = (word_ids >= 0) & (word_ids < len(store.words))
+        unigrams = store.logProbs(1, np.where(known, word_ids, 0))
+        if store.backoff:
+            log_probs = np.where(known, unigrams, store.log_uniform)
+        else:
+            log_probs = np.where(known & (orders == 1), unigrams, -np.inf)
+        for n in range(2, len(nodes) + 1):
+            node = nodes[n - 1] if store.backoff else np.where(orders == n, nodes[n - 1], -1)
+            pos = findChildren(arrays["ngram_offsets_%d" % n], arrays["ngram_words_%d" % n], node, word_ids)
+            found = store.logProbs(n, np.maximum(pos, 0))
+            if store.backoff:
+                backoffs = store.logBackoffs(n, np.maximum(node, 0))
+                log_probs = np.where(node >= 0, log_probs + backoffs, log_probs)
+            log_probs = np.where(pos >= 0, found, log_probs)
+        return np.exp2(log_probs)
+
+def decisionChanges(model, quantized, text):
+    """
+    Compares the article decisions of model and quantized model
+    Arguments:
+        model: the scoring model
+        quantized: the QuantizedModel exported from model
+        text: the text corpora (lists of words)
+    Return:
+        the dictionary with number of scored articles, the share of changed best articles,
+        the maximal and mean absolute difference of best article scores and the share of
+        near ties (the best two articles scores within 1%), which are likely to be changed
+    """
+    contexts = [sentence[max(i - nr.n_gram_left, 0):i] for sentence in text
+                for i in range(len(sentence)) if sentence[i].lower() in nr.dt_list and i > 0]
+    if len(contexts) == 0:
+        return {"n_articles":0, "changed":0., "max_error":0., "mean_error":0., "near_ties":0.}
+    scores = nr.scoreContexts(model, contexts)
+    quantized_scores = nr.scoreContexts(quantized, contexts)
+    best = np.argmax(scores, axis = 1)
+    rows = np.arange(len(contexts))
+    errors = np.abs(scores[rows, best] - quantized_scores[rows, best])
+    sorted_scores = np.sort(scores, axis = 1)
+    near_ties = sorted_scores[:, -1] - sorted_scores[:, -2] <= 0.01 * sorted_scores[:, -1]
+    return {"n_articles":len(contexts), "changed":float(np.mean(best != np.argmax(quantized_scores, axis = 1))),
+            "max_error":float(errors.max()), "mean_error":float(errors.mean()), "near_ties":float(np.mean(near_ties))}
+
+def predictionsReport(model, text, correct):
+    """
+    Returns the target score, accuracy and throughput of article predictions of model
+    """
+    start = time.time()
+    submission = nr.buildPredictions(text, model)
+    elapsed = time.time() - start
+    n_articles = sum(1 for sentence in text for w in sentence if w.lower() in nr.dt_list)
+    confidence, is_correct, is_mistake, _ = ts.submissionArrays(text, correct, submission)
+    score, accuracy = evaluate.targetScore(confidence, is_correct, is_mistake)
+    return {"target_score":score, "accuracy":accuracy, "articles_per_second":n_articles / max(elapsed, 1e-9)}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='The export of n-gram model with quantized log probabilities')
+    parser.add_argument('--model_file', default=config.ngram_bundle_path,
+                        help='the path to the pickled n-gram counter (.pkl) or compact n-gram store (binary bundle or .npz)')
+    parser.add_argument('--out_file', default=config.ngram_quantized_path,
+                        help='the path to save quantized store (.npz)')
+    parser.add_argument('--scoring', default='kneser_ney', choices=['kneser_ney', 'mle'],
+                        help='the scoring model to export')
+    parser.add_argument('--bits', type=int, default=8, choices=sorted(CODE_BITS),
+                        help='the size of quantized codes in bits')
+    parser.add_argument('--sentences_file', default=config.sentence_validate_path,
+                        help="the text's corpora file to measure article decisions")
+    parser.add_argument('--corrections_file', default=config.corrections_validate_path,
+                        help='the path to the file with ground truth corrections')
+    args = parser.parse_args()
+
+    if args.model_file.endswith(".pkl"):
+        # the counter pickled by earlier nltk_ngram.py script refers classes as members of __main__ module
+        from nltk_ngram import NgramModelVocabulary, FrozenVocabulary, NgramCounter
+        with open(args.model_file, 'rb') as f:
+            store = ns.fromCounter(pickle.load(f))
+    else:
+        store = ns.openStore(args.model_file)
+    model = sc.buildModel(args.scoring, store)
+
+    start = time.time()
+    quantized_store = quantizeModel(model, args.bits)
+    print("Quantized to %d bits in %.2f s" % (args.bits, time.time() - start))
+    quantized_store.save(args.out_file)
+    print("Quantized store saved to: %s, size: %.2f MB (file %.2f MB), model size: %.2f MB"
+          % (args.out_file, quantized_store.nbytes() / 2**20, os.path.getsize(args.out_file) / 2**20,
+             store.nbytes() / 2**20))
+    quantized = QuantizedModel(QuantizedStore.load(args.out_file))
+
+    with open(args.sentences_file) as f:
+        text = json.load(f)
+    with open(args.corrections_file) as f:
+        correct = json.load(f)
+    changes = decisionChanges(model, quantized, text)
+    print("Articles: %d, changed decisions: %.4f%% (near ties: %.4f%%), best score error: max %.6f, mean %.6f"
+          % (changes["n_articles"], changes["changed"] * 100, changes["near_ties"] * 100, changes["max_error"],
+             changes["mean_error"]))
+    before = predictionsReport(model, text, correct)
+    after = predictionsReport(quantized, text, correct)
+    print("%-20s %15s %15s" % ("", "model", "quantized"))
+    for key, fmt in [("target_score", "%15.4f"), ("accuracy", "%15.4f"), ("articles_per_second", "%15.0f")]:
+        print(("%-20s " + fmt + " " + fmt) % (key, before[key], after[key]))
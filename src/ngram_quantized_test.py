@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The test cases for export of n-gram model with quantized log probabilities
+
+@author: yaric
+"""
+import tempfile
+import unittest
+
+import numpy as np
+
+import ngram_quantized as qn
+import ngram_pruning as pr
+import ngram_scoring as sc
+import ngram_store as ns
+import ngram_res as nr
+import nltk_ngram as nn
+from ngram_test_corpora import randomCorpora
+
+class TestNgramQuantizedMethods(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        sentences = randomCorpora(300, 2000, 12, article_repeat = 30)
+        cls.corpora, cls.held_out = sentences[:1500], sentences[1500:] + [["no", "such", "words", "the"]]
+        vocabulary = nn.build_vocabulary(2, [w for s in cls.corpora for w in s]).freeze()
+        cls.store = ns.countIds(cls.corpora, vocabulary, 4)
+        contexts = [s[:i] for s in cls.held_out for i in range(len(s))]
+        cls.words = [s[i] for s in cls.held_out for i in range(len(s))]
+        cls.contexts = contexts
+
+    def assertSameScores(self, model, quantized, places):
+        context_ids = model.contextIds(self.contexts)
+        word_ids = np.array(model.store.wordIds(self.words))
+        expected = model.scoreIds(context_ids, word_ids)
+        scores = quantized.scoreIds(quantized.contextIds(self.contexts), word_ids)
+        self.assertTrue(np.array_equal(expected == 0, scores == 0), "Wrong zero scores")
+        nonzero = expected > 0
+        self.assertLess(np.abs(np.log2(scores[nonzero]) - np.log2(expected[nonzero])).max(), 10 ** -places,
+                        "Wrong log probabilities")
+
+    def test_quantize_values(self):
+        values = np.array([-3., -1., -np.inf, -1., -2.])
+        codes, codebook = qn.quantizeValues(values, 8)
+        self.assertEqual(codes.dtype, np.uint8)
+        self.assertTrue(np.array_equal(codebook[codes], values), "Few values should be kept exactly")
+
+        values = np.concatenate((np.linspace(-20, 0, 10000), [-np.inf]))
+        codes, codebook = qn.quantizeValues(values, 8)
+        self.assertEqual(len(codebook), 256, "Wrong codebook size")
+        self.assertEqual(codebook[codes[-1]], -np.inf, "Infinite value should be kept")
+        self.assertLessEqual(np.abs(codebook[codes[:-1]] - values[:-1]).max(), 20 / 254 / 2 + 1e-6,
+                             "The error should be at most half of step")
+        with self.assertRaises(Exception):
+            qn.quantizeValues(values, 4)
+
+    def test_kneser_ney(self):
+        model = sc.KneserNeyModel(self.store)
+        quantized = qn.QuantizedModel(qn.quantizeModel(model, 16))
+        self.assertSameScores(model, quantized, 3)
+        articles = lambda results: [[p[0] if p != None else None for p in r] for r in results]
+        self.assertEqual(articles(nr.buildPredictions(self.held_out, quantized)),
+                         articles(nr.buildPredictions(self.held_out, model)), "The same predictions expected")
+        self.assertLess(quantized.store.nbytes(), self.store.nbytes() / 1.5, "Quantized store should be smaller")
+
+        # the pruned store backs off from not stored n-grams
+        pruned = sc.KneserNeyModel(pr.pruneByThreshold(self.store, pr.countScores(self.store), 2))
+        self.assertSameScores(pruned, qn.QuantizedModel(qn.quantizeModel(pruned, 16)), 3)
+
+    def test_mle(self):
+        model = sc.MLEModel(self.store)
+        quantized = qn.QuantizedModel(qn.quantizeModel(model, 8))
+        self.assertSameScores(model, quantized, 1)
+        changes = qn.decisionChanges(model, qn.QuantizedModel(qn.quantizeModel(model, 16)), self.held_out)
+        self.assertEqual(changes["changed"], 0, "16 bits should not change decisions")
+        with self.assertRaises(Exception):
+            qn.quantizeModel(sc.StupidBackoffModel(self.store))
+
+    def test_save_load(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        path = temp_dir.name + "/ngram_quantized_test.npz"
+        model = sc.KneserNeyModel(self.store)
+        store = qn.quantizeModel(model, 8)
+        store.save(path)
+        loaded = qn.QuantizedModel(qn.QuantizedStore.load(path))
+        self.assertEqual(loaded.store.words, store.words, "Wrong vocabulary")
+        self.assertEqual(loaded.perplexity(self.held_out[0]), qn.QuantizedModel(store).perplexity(self.held_out[0]))
+
+if __name__ == '__main__':
+    unittest.main()
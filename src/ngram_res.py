@@ -13,46 +13,120 @@ import json
 import numpy as np
 import config
 import utils
-
-from nltk_ngram import LidstoneNgramModel, NgramModelVocabulary, NgramCounter, MLENgramModel
+import ngram_scoring
 
 n_gram_left = 3
+n_gram_right = 3
 dt_list = ['a', 'an', 'the']
 confidence_threshold = 0#.1
 
-def buildPredictions(text_data, predictor):
-    res_list = list()
-    for sentence in text_data:
-        row_data = list()
+def scoreContexts(predictor, contexts, length = n_gram_left):
+    """
+    Scores articles for all contexts
+    Arguments:
+        predictor: the n-gram model with score_batch (see ngram_scoring.py) or the
+                   function (article, context) returning the score of article
+        contexts: the list of contexts (lists of preceding words)
+        length: the maximal length of contexts
+    Return:
+        the matrix of scores [contexts x articles]
+    """
+    if hasattr(predictor, "score_batch"):
+        # all contexts encoded as word ids and scored at once
+        return predictor.score_batch(predictor.contextIds(contexts, length), dt_list)
+    return np.array([[predictor(dt, context) for dt in dt_list] for context in contexts], dtype = np.float64)
+
+def bestArticles(predictor, contexts):
+    """
+    Finds the most confident article for all contexts
+    Arguments:
+        predictor: the decision table (see ngram_decision_table.py), the n-gram model
+                   with score_batch or the function (article, context) returning the score
+        contexts: the list of contexts (lists of preceding words)
+    Return:
+        the tuple with arrays of best article index in dt_list and its score per context
+    """
+    if hasattr(predictor, "decide"):
+        # the best articles are precompiled per context
+        best, scores, _ = predictor.decide(contexts)
+        return (best, scores)
+    predictions = scoreContexts(predictor, contexts)
+    best = np.argmax(predictions, axis = 1)
+    return (best, predictions[np.arange(len(predictions)), best])
+
+def rightContext(sentence, i):
+    """
+    Returns the words following the article at position i in the order of reversed
+    n-gram model: the nearest word is the last one
+    """
+    return tuple(reversed(sentence[i + 1:i + 1 + n_gram_right]))
+
+def scoreBidirectional(left_predictor, right_predictor, left_contexts, right_contexts, right_weight = 0.5):
+    """
+    Scores articles by linear interpolation of the left (forward) and right (reversed) models
+    Arguments:
+        left_predictor: the forward n-gram model with score_batch or the function
+                        (article, context) returning the score of article
+        right_predictor: the reversed n-gram model (see ngram_store.fromCounter) or function
+        left_contexts: the list of contexts (lists of preceding words)
+        right_contexts: the list of right contexts (see rightContext)
+        right_weight: the weight of right model score, the weights are renormalized per
+                      context if one of contexts is empty
+    Return:
+        the matrix of scores [contexts x articles]
+    """
+    weights = np.array([[1 - right_weight if len(l) > 0 else 0, right_weight if len(r) > 0 else 0]
+                        for l, r in zip(left_contexts, right_contexts)], dtype = np.float64)
+    weights /= np.maximum(weights.sum(axis = 1, keepdims = True), 1e-12)
+    left = scoreContexts(left_predictor, left_contexts, n_gram_left)
+    right = scoreContexts(right_predictor, right_contexts, n_gram_right)
+    return weights[:, :1] * left + weights[:, 1:] * right
+
+def buildPredictions(text_data, predictor, right_predictor = None, right_weight = 0.5):
+    """
+    Predicts articles corrections of text
+    Arguments:
+        text_data: the list of sentences (lists of words)
+        predictor: the decision table (see ngram_decision_table.py), the n-gram model
+                   with score_batch or the function (article, context) returning the score
+        right_predictor: the reversed n-gram model scoring article by following words,
+                         only the left context is used if not provided
+        right_weight: the weight of right model score (see scoreBidirectional)
+    Return:
+        the list of predictions per word per sentence: None or [article, confidence]
+    """
+    if right_predictor != None and hasattr(predictor, "decide"):
+        raise Exception("The decision table can not be combined with right context model")
+    res_list = [[None] * len(sentence) for sentence in text_data]
+    # collect previous (and next) words of all articles
+    positions, contexts, right_contexts = list(), list(), list()
+    for s_i, sentence in enumerate(text_data):
         for i in range(len(sentence)):
             w = sentence[i].lower()
             if w in dt_list:
-                # collect previous words
-                if i >= n_gram_left:
-                    context = sentence[i - n_gram_left:i]
-                else:
-                    context = sentence[:i]
-                if len(context) > 0:
-                    # do predictions
-                    predictions = [predictor(dt, context) for dt in dt_list]
-                    max_lab_ind = np.argmax(predictions) # the most confident prediction
-                    max_dt = dt_list[max_lab_ind]
-                    if max_dt != w and predictions[max_lab_ind] > confidence_threshold:
-                       row_data.append([max_dt, predictions[max_lab_ind]]) 
-                    else:
-                      # predicted already present DT or too low confidence
-                      row_data.append(None) 
-                else:
-                    # what happens when DT at the beginning of sentence?
-                    predictions = None
-                    row_data.append(None) 
-            else:
-                # ordinary word
-                row_data.append(None)
-                
-        # store results
-        res_list.append(row_data)
-        
+                context = sentence[max(i - n_gram_left, 0):i]
+                right_context = rightContext(sentence, i) if right_predictor != None else ()
+                # what happens when DT at the beginning of sentence?
+                if len(context) > 0 or len(right_context) > 0:
+                    positions.append((s_i, i, w))
+                    contexts.append(context)
+                    right_contexts.append(right_context)
+    if len(contexts) == 0:
+        return res_list
+
+    # do predictions
+    if right_predictor != None:
+        predictions = scoreBidirectional(predictor, right_predictor, contexts, right_contexts, right_weight)
+        max_lab_ind = np.argmax(predictions, axis = 1)
+        max_scores = predictions[np.arange(len(predictions)), max_lab_ind]
+    else:
+        max_lab_ind, max_scores = bestArticles(predictor, contexts) # the most confident prediction
+    for (s_i, i, w), lab_ind, score in zip(positions, max_lab_ind, max_scores):
+        max_dt = dt_list[lab_ind]
+        if max_dt != w and score > confidence_threshold:
+            res_list[s_i][i] = [max_dt, float(score)]
+        # otherwise predicted already present DT or too low confidence
+
     return res_list
 
 
@@ -63,20 +137,82 @@ if __name__ == '__main__':
     parser.add_argument('--test_sentences_file', default=config.sentence_test_path, 
                         help="the text's corpora file for test data")
     parser.add_argument('--model_file', default=config.ngram_model_path, 
-                        help='the path to the file with predictions label Numpy array')
+                        help='the path to the pickled n-gram counter (.pkl) or compact n-gram store (binary bundle or .npz)')
+    parser.add_argument('--decision_table', default=None,
+                        help='the path to the compiled decision table to be used instead of the n-gram model')
+    parser.add_argument('--quantized_model', default=None,
+                        help='the path to the n-gram model with quantized log probabilities to be used instead of the n-gram model')
+    parser.add_argument('--scoring', default='mle', choices=sorted(ngram_scoring.MODELS),
+                        help='the scoring of articles: frequency in exact context (mle) or smoothed model with backoff to shorter contexts')
+    parser.add_argument('--bidirectional', action='store_true',
+                        help='to combine scores of the left context with the reversed model scores of the right context')
+    parser.add_argument('--right_model_file', default=None,
+                        help='the path to the reversed n-gram store (see ngram_store.py --reverse), required unless '
+                             'bidirectional pickled counter is used as model')
+    parser.add_argument('--right_weight', type=float, default=0.5,
+                        help='the weight of the right context score')
     
     args = parser.parse_args()
+    if args.bidirectional and (args.decision_table != None or args.quantized_model != None):
+        raise Exception("Bidirectional scoring supported only with the n-gram model (--model_file)")
     
-    print("Generating test results, model: [%s], text: [%s]" % (args.model_file, args.test_sentences_file))
+    print("Generating test results, model: [%s], text: [%s]" % (args.decision_table or args.quantized_model or args.model_file,
+                                                                args.test_sentences_file))
     
-    with open(args.model_file, 'rb') as f:
-        counter = pickle.load(f)
+    if args.quantized_model != None:
+        from ngram_quantized import QuantizedStore, QuantizedModel
+        counter = QuantizedModel(QuantizedStore.load(args.quantized_model))
+    elif args.decision_table != None:
+        from ngram_decision_table import DecisionTable
+        counter = DecisionTable.load(args.decision_table)
+    elif args.model_file.endswith(".pkl") == False:
+        # the compact n-gram counts store with the same counts interface
+        from ngram_store import openStore
+        counter = openStore(args.model_file)
+    else:
+        # the counter pickled by earlier nltk_ngram.py script refers classes as members of __main__ module
+        from nltk_ngram import LidstoneNgramModel, NgramModelVocabulary, FrozenVocabulary, NgramCounter, MLENgramModel
         
-    # The predictor
-    predictor = lambda x, context: counter.ngrams[len(context) + 1][tuple(context)].freq(x)
+        with open(args.model_file, 'rb') as f:
+            counter = pickle.load(f)
+        
+    # The predictor scoring all articles at once
+    predictor = counter if args.decision_table != None or args.quantized_model != None else ngram_scoring.buildModel(args.scoring, counter)
     
     text_data = utils.read_json(args.test_sentences_file)
-    result_list = buildPredictions(text_data, predictor)
+    right_predictor = None
+    if args.bidirectional:
+        import time
+        import ngram_store
+        if args.right_model_file != None:
+            right_store = ngram_store.openStore(args.right_model_file)
+        elif getattr(counter, "reverse_ngrams", None) != None:
+            # the reversed index counted together with the forward one
+            right_store = ngram_store.fromCounter(counter, reverse = True)
+        else:
+            raise Exception("The reversed n-gram store (--right_model_file) required, the model has no reversed n-grams")
+        right_predictor = ngram_scoring.buildModel(args.scoring, right_store)
+        if isinstance(counter, ngram_store.NgramStore):
+            left_store = counter
+        elif hasattr(counter, "ngrams") and hasattr(counter, "reverse_ngrams"):
+            left_store = ngram_store.fromCounter(counter)
+        else:
+            # the memory of other pickled models is not measured
+            left_store = None
+        print("Model memory: left %s, right %.1f MB" % ("%.1f MB" % (left_store.nbytes() / 2**20) if left_store != None else "n/a",
+                                                         right_store.nbytes() / 2**20))
+        
+        n_articles = max(sum(1 for sentence in text_data for w in sentence if w.lower() in dt_list), 1)
+        start = time.time()
+        buildPredictions(text_data, predictor)
+        left_time = time.time() - start
+        start = time.time()
+        result_list = buildPredictions(text_data, predictor, right_predictor, args.right_weight)
+        both_time = time.time() - start
+        print("Latency per article: left %.2f us, left + right %.2f us"
+              % (left_time / n_articles * 1e6, both_time / n_articles * 1e6))
+    else:
+        result_list = buildPredictions(text_data, predictor)
     
     if len(result_list) != len(text_data):
         raise Exception("Text list size not equal to results list size, %d != %d" % (len(text_data), len(result_list)))
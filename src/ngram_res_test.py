@@ -9,6 +9,8 @@ Created on Thu Mar 16 13:21:58 2017
 import unittest
 
 import ngram_res as nr
+import ngram_scoring
+import nltk_ngram as nn
 
 class TestNgramResultsMethods(unittest.TestCase):
     
@@ -32,7 +34,37 @@ class TestNgramResultsMethods(unittest.TestCase):
                         self.assertEqual(p[1], 0.7, "Wrong confidence: " + str(p))
                 else:
                     self.assertIsNone(p, "Prediction should be none for word: " + w)
-        
-        
+
+    def test_buildPredictions_batch(self):
+        text_data = [["the", "dog", "saw", "a", "cat"], ["the", "dog", "saw", "a", "bird"],
+                     ["the", "dog", "saw", "the", "cat", "and", "an", "bird"], ["the"]]
+        counter = nn.count_ngrams(4, nn.build_vocabulary(1, [w for s in text_data for w in s]), text_data)
+        predictor = lambda x, context: counter.ngrams[len(context) + 1][tuple(context)].freq(x)
+
+        results = nr.buildPredictions(text_data, ngram_scoring.MLEModel(counter))
+        self.assertEqual(results, nr.buildPredictions(text_data, predictor), "Batch scoring should be the same")
+        self.assertEqual(results[2][3][0], "a", "Wrong prediction")
+        self.assertAlmostEqual(results[2][3][1], 2 / 3, 12, "Wrong confidence")
+        self.assertIsNone(results[0][3], "The present article should not be corrected")
+
+    def test_buildPredictions_bidirectional(self):
+        text_data = [["the", "dog", "saw", "a", "cat"], ["the", "apple", "fell"], ["the", "dog", "saw", "the", "apple"]]
+        left = lambda x, context: 0.6 if x == 'the' else 0.2
+        right = lambda x, context: 1.0 if x == 'an' and context[-1] == 'apple' else 0.
+
+        self.assertEqual(nr.rightContext(text_data[0], 0), ("a", "saw", "dog"), "Nearest word should be the last")
+        results = nr.buildPredictions(text_data, left, right)
+        self.assertEqual(results[1][0], ["an", 1.0], "Only right context should be used at sentence start")
+        self.assertIsNone(results[0][0], "Wrong prediction without left context")
+        self.assertEqual(results[2][3], ["an", 0.6], "Wrong combined prediction")
+        self.assertAlmostEqual(results[0][3][1], 0.3, 12, "Wrong combined confidence")
+        self.assertIsNone(nr.buildPredictions(text_data, left)[1][0], "No prediction without left context")
+
+        counter = nn.count_ngrams(3, nn.build_vocabulary(1, [w for s in text_data for w in s]), text_data)
+        model = ngram_scoring.MLEModel(counter)
+        self.assertEqual(nr.buildPredictions(text_data, model, None), nr.buildPredictions(text_data, model),
+                         "Left only predictions should be the same")
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The n-gram scoring engine with stupid backoff and interpolated Kneser-Ney smoothing
+over the compact n-gram store. The probabilities (or discounted probabilities), backoff
+weights and context totals are precomputed at build time as arrays parallel to the
+store keys, so each score is a fixed number of binary searches and array lookups per
+n-gram order. Unlike exact context frequencies, the unseen contexts back off to the
+lower orders, so the articles are scored for every context. The models provide the
+same `score`/`logscore` interface as nltk_ngram.BaseNgramModel.
+
+@author: yaric
+"""
+from math import log
+
+import numpy as np
+
+import ngram_store as ns
+
+NEG_INF = float("-inf")
+
+def suffixLinks(store):
+    """
+    Finds the node of context suffix (context without its first word) per trie node
+    Arguments:
+        store: the NgramStore
+    Return:
+        the dictionary with suffix node ids per trie level, where suffixes of the first
+        level are the root node (0)
+    """
+    links = {1:np.zeros(len(store.contexts.get(1, [])), dtype = np.int64)}
+    for level in range(2, store.order):
+        level_keys = store.contexts[level]
+        parents = (level_keys >> np.uint64(ns.WORD_BITS)).astype(np.int64)
+        words = (level_keys & np.uint64(ns.WORD_MASK)).astype(np.int64)
+        links[level] = ns.findKeys(store.contexts[level - 1], links[level - 1][parents], words)
+    return links
+
+class BackoffModel(object):
+    """
+    The base class of n-gram models over the compact store
+    """
+
+    def __init__(self, store):
+        """
+        Creates model
+        Arguments:
+            store: the NgramStore or nltk_ngram.NgramCounter to be converted into store
+        """
+        if isinstance(store, ns.NgramStore) == False:
+            store = ns.fromCounter(store)
+        self.store = store
+        self.order = store.order
+        # the node ids per n-gram key
+        self.key_nodes = {n:(store.keys[n] >> np.uint64(ns.WORD_BITS)).astype(np.int64) for n in store.keys}
+
+    def check_context(self, context):
+        """Makes sure context not longer than model's ngram order and is a tuple."""
+        if len(context) >= self.order:
+            raise ValueError("Context is too long for this ngram order: {0}".format(context))
+        return tuple(context)
+
+    def contextNodes(self, context_ids):
+        """
+        Finds trie nodes of all context suffixes
+        Arguments:
+            context_ids: the matrix of context word ids [contexts x length], the shorter
+                         contexts are padded from the left with negative ids
+        Return:
+            the list where item k is the array of nodes of context suffixes of length k
+            (-1 if suffix not found or padded), the item 0 is the root node
+        """
+        context_ids = np.asarray(context_ids, dtype = np.int64)
+        length = context_ids.shape[1]
+        nodes = [np.zeros(len(context_ids), dtype = np.int64)]
+        for k in range(1, min(length, self.order - 1) + 1):
+            node = nodes[0]
+            for level, j in enumerate(range(length - k, length), 1):
+                node = ns.findKeys(self.store.contexts[level], node, context_ids[:, j])
+            nodes.append(node)
+        return nodes
+
+    def score(self, word, context):
+        """
+        Returns the score of word following the context
+        Arguments:
+            word: the word to get score of
+            context: the context words
+        """
+        context = self.check_context(context)
+        word_ids = np.array([self.store.wordId(word)], dtype = np.int64)
+        return float(self.scoreIds(self.contextIds([context], len(context)), word_ids)[0])
+
+    def contextIds(self, contexts, length = None):
+        """
+        Encodes contexts as matrix of word ids
+        Arguments:
+            contexts: the list of contexts (sequences of words)
+            length: the length of encoded contexts [optional], if None the highest
+                    context length of model used. The longer contexts are truncated from
+                    the left and shorter ones padded from the left with -1
+        Return:
+            the matrix of context word ids [contexts x length]
+        """
+        if length is None:
+            length = self.order - 1
+        context_ids = np.full((len(contexts), length), -1, dtype = np.int64)
+        # the words not in store are never found, but still count to the context length
+        oov = len(self.store.words)
+        for i, context in enumerate(contexts):
+            context = context[len(context) - length:] if len(context) > length else context
+            if len(context) > 0:
+                context_ids[i, length - len(context):] = [w if w >= 0 else oov for w in self.store.wordIds(context)]
+        return context_ids
+
+    def scoreIds(self, context_ids, word_ids):
+        """
+        Returns the scores of words following the contexts given by word ids
+        Arguments:
+            context_ids: the matrix of context word ids [contexts x length], the shorter
+                         contexts are padded from the left with negative ids
+            word_ids: the word ids to score per context
+        Return:
+            the array of scores
+        """
+        context_ids = np.asarray(context_ids, dtype = np.int64)
+        return self.scoreNodes(self.contextNodes(context_ids), self.queryOrders(context_ids),
+                               np.asarray(word_ids, dtype = np.int64))
+
+    def score_batch(self, contexts, candidates):
+        """
+        Scores all candidate words for all contexts at once, the context nodes are
+        searched once and shared by candidates
+        Arguments:
+            contexts: the matrix of context word ids [contexts x length] (see contextIds)
+            candidates: the list of candidate words or word ids
+        Return:
+            the matrix of scores [contexts x candidates]
+        """
+        context_ids = np.asarray(contexts, dtype = np.int64).reshape(len(contexts), -1)
+        nodes = self.contextNodes(context_ids)
+        orders = self.queryOrders(context_ids)
+        scores = np.zeros((len(context_ids), len(candidates)))
+        for j, candidate in enumerate(candidates):
+            word_id = self.store.wordId(candidate) if isinstance(candidate, str) else candidate
+            scores[:, j] = self.scoreNodes(nodes, orders, np.full(len(context_ids), word_id, dtype = np.int64))
+        return scores
+
+    def queryOrders(self, context_ids):
+        """
+        Returns the order of query n-gram per context (the number of not padded words plus one)
+        """
+        return np.minimum((context_ids >= 0).sum(axis = 1), self.order - 1) + 1
+
+    def scoreNodes(self, nodes, orders, word_ids):
+        """
+        Returns the scores of words following the contexts
+        Arguments:
+            nodes: the context suffix nodes returned by contextNodes
+            orders: the order of query n-gram per context
+            word_ids: the word ids to score per context
+        Return:
+            the array of scores
+        """
+        raise NotImplementedError()
+
+    def logscore(self, word, context):
+        """
+        Evaluate the log probability of this word in this context.
+        """
+        score = self.score(word, context)
+        if score == 0.0:
+            return NEG_INF
+        return log(score, 2)
+
+    def entropy(self, text):
+        """
+        Calculate the approximate cross-entropy of the n-gram model for a
+        given evaluation text.
+        """
+        normed_text = (self.store.check_against_vocab(word) for word in text)
+        H = 0.0
+        processed_ngrams = 0
+        for ngram in self.store.to_ngrams(normed_text):
+            context, word = tuple(ngram[:-1]), ngram[-1]
+            H += self.logscore(word, context)
+            processed_ngrams += 1
+        return - (H / processed_ngrams)
+
+    def perplexity(self, text):
+        """
+        Calculates the perplexity of the given text.
+        """
+        return pow(2.0, self.entropy(text))
+
+class MLEModel(BackoffModel):
+    """
+    The relative frequency of word in the exact context, the same as
+    `counter.ngrams[len(context) + 1][context].freq(word)` for not empty context
+    """
+
+    def __init__(self, store):
+        """
+        Creates model
+        Arguments:
+            store: the NgramStore or nltk_ngram.NgramCounter
+        """
+        super(MLEModel, self).__init__(store)
+        # the relative frequencies per n-gram key with context totals resolved
+        self.probs = dict()
+        for n in self.store.keys:
+            totals = self.store.totals[n][self.key_nodes[n]].astype(np.float64)
+            self.probs[n] = self.store.counts[n] / np.maximum(totals, 1)
+        unigrams = self.store.unigram_counts.astype(np.float64)
+        self.unigram_probs = unigrams / max(unigrams.sum(), 1)
+
+    def scoreNodes(self, nodes, orders, word_ids):
+        scores = np.where((word_ids >= 0) & (orders == 1), self.unigram_probs[np.maximum(word_ids, 0)], 0.)
+        for n in range(2, len(nodes) + 1):
+            pos = ns.findKeys(self.store.keys[n], np.where(orders == n, nodes[n - 1], -1), word_ids)
+            scores = np.where(pos >= 0, self.probs[n][np.maximum(pos, 0)], scores)
+        return scores
+
+class StupidBackoffModel(MLEModel):
+    """
+    The stupid backoff scores (Brants et al., 2007): the relative frequency of n-gram
+    if it was seen, otherwise the score of lower order multiplied by alpha. The scores
+    are not normalized probabilities.
+    """
+
+    def __init__(self, store, alpha = 0.4):
+        """
+        Creates model
+        Arguments:
+            store: the NgramStore or nltk_ngram.NgramCounter
+            alpha: the backoff multiplier
+        """
+        super(StupidBackoffModel, self).__init__(store)
+        self.alpha = alpha
+
+    def scoreNodes(self, nodes, orders, word_ids):
+        scores = np.where(word_ids >= 0, self.unigram_probs[np.maximum(word_ids, 0)], 0.)
+        found_order = np.where(scores > 0, 1, 0)
+        for n in range(2, len(nodes) + 1):
+            pos = ns.findKeys(self.store.keys[n], nodes[n - 1], word_ids)
+            found = (pos >= 0) & (n <= orders)
+            scores = np.where(found, self.probs[n][np.maximum(pos, 0)], scores)
+            found_order = np.where(found, n, found_order)
+        return scores * np.power(self.alpha, np.where(found_order > 0, orders - found_order, 0))
+
+class KneserNeyModel(BackoffModel):
+    """
+    The interpolated Kneser-Ney probabilities with absolute discount per order. The highest
+    order uses n-gram counts and lower orders use continuation counts (the number of
+    distinct words preceding n-gram), the unigrams are interpolated with uniform distribution.
+    """
+
+    def __init__(self, store, discount = None):
+        """
+        Creates model
+        Arguments:
+            store: the NgramStore or nltk_ngram.NgramCounter
+            discount: the absolute discount [optional], if None it is estimated per
+                      order as n1 / (n1 + 2 * n2) from counts of counts
+        """
+        super(KneserNeyModel, self).__init__(store)
+        store = self.store
+        links = suffixLinks(store)
+
+        # the counts per n-gram key, continuation counts for lower orders
+        counts = {self.order:store.counts[self.order].astype(np.float64)} if self.order > 1 else dict()
+        for n in range(self.order - 1, 1, -1):
+            suffix_nodes = links[n][self.key_nodes[n + 1]]
+            words = (store.keys[n + 1] & np.uint64(ns.WORD_MASK)).astype(np.int64)
+            pos = ns.findKeys(store.keys[n], suffix_nodes, words)
+            counts[n] = np.bincount(pos[pos >= 0], minlength = len(store.keys[n])).astype(np.float64)
+        if self.order > 1:
+            words = (store.keys[2] & np.uint64(ns.WORD_MASK)).astype(np.int64)
+            unigrams = np.bincount(words, minlength = len(store.words)).astype(np.float64)
+        else:
+            unigrams = store.unigram_counts.astype(np.float64)
+
+        self.discounts = dict()
+        # the discounted probabilities per n-gram key and backoff weights per context node
+        self.alphas, self.gammas = dict(), dict()
+        for n in range(2, self.order + 1):
+            d = self.discounts[n] = self.__discount(counts[n], discount)
+            n_nodes = len(store.contexts[n - 1])
+            totals = np.bincount(self.key_nodes[n], weights = counts[n], minlength = n_nodes)
+            followers = np.bincount(self.key_nodes[n], weights = counts[n] > 0, minlength = n_nodes)
+            # the mass of n-grams not stored (pruned or not counted) is backed off as well
+            missing = np.zeros(n_nodes)
+            if n == self.order:
+                missing = np.maximum(store.totals[n].astype(np.float64) - totals, 0)
+                totals = totals + missing
+            denominators = np.maximum(totals, 1e-300)
+            self.alphas[n] = np.maximum(counts[n] - d, 0) / denominators[self.key_nodes[n]]
+            # the contexts without followers of this order pass the lower order as is
+            self.gammas[n] = np.where(totals > 0, (d * followers + missing) / denominators, 1.)
+
+        d = self.discounts[1] = self.__discount(unigrams, discount)
+        total = max(unigrams.sum(), 1e-300)
+        self.uniform = d * np.count_nonzero(unigrams) / total / len(store.words)
+        if unigrams.sum() == 0:
+            self.uniform = 1. / len(store.words)
+        self.unigram_probs = np.maximum(unigrams - d, 0) / total + self.uniform
+
+    @staticmethod
+    def __discount(counts, discount):
+        """
+        Returns the discount of order, estimated from counts of counts if not provided
+        """
+        if discount is not None:
+            return discount
+        n1 = np.count_nonzero(counts == 1)
+        n2 = np.count_nonzero(counts == 2)
+        if n1 == 0 or n2 == 0:
+            return 0.75
+        return n1 / (n1 + 2. * n2)
+
+    def scoreNodes(self, nodes, orders, word_ids):
+        scores = np.where(word_ids >= 0, self.unigram_probs[np.maximum(word_ids, 0)], self.uniform)
+        for n in range(2, len(nodes) + 1):
+            node = nodes[n - 1]
+            pos = ns.findKeys(self.store.keys[n], node, word_ids)
+            alpha = np.where(pos >= 0, self.alphas[n][np.maximum(pos, 0)], 0.)
+            gamma = self.gammas[n][np.maximum(node, 0)] if len(self.gammas[n]) > 0 else np.ones(len(node))
+            scores = np.where(node >= 0, alpha + gamma * scores, scores)
+        return scores
+
+MODELS = {"mle":MLEModel, "stupid_backoff":StupidBackoffModel, "kneser_ney":KneserNeyModel}
+
+def buildModel(name, store, **kwargs):
+    """
+    Builds the scoring model by name
+    Arguments:
+        name: the name of model, one of MODELS
+        store: the NgramStore or nltk_ngram.NgramCounter
+    Return:
+        the scoring model
+    """
+    if name not in MODELS:
+        raise Exception("Unknown scoring model: %s, expected one of %s" % (name, sorted(MODELS)))
+    return MODELS[name](store, **kwargs)
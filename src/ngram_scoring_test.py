@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The test cases for stupid backoff and Kneser-Ney n-gram scoring
+
+@author: yaric
+"""
+import unittest
+
+import numpy as np
+
+import ngram_scoring as sc
+import ngram_store as ns
+import nltk_ngram as nn
+from ngram_test_corpora import randomCorpora
+
+class TestNgramScoringMethods(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.corpora = randomCorpora(30, 300, 8)
+        cls.counter = nn.count_ngrams(4, nn.build_vocabulary(2, [w for s in cls.corpora for w in s]), cls.corpora)
+        cls.store = ns.fromCounter(cls.counter)
+        cls.contexts = list(cls.counter.ngrams[4].keys())[:30] + [("no", "such", "w1"), ("w5", "w7"), ("the",), ()]
+
+    def stupidBackoff(self, word, context, alpha):
+        """
+        The reference stupid backoff over counter
+        """
+        multiplier = 1.
+        while len(context) > 0:
+            freq_dist = self.counter.ngrams[len(context) + 1][context]
+            if freq_dist[word] > 0:
+                return multiplier * freq_dist.freq(word)
+            multiplier *= alpha
+            context = context[1:]
+        return multiplier * self.counter.unigrams.freq(word)
+
+    def test_stupid_backoff(self):
+        model = sc.StupidBackoffModel(self.store, alpha = 0.4)
+        for context in self.contexts:
+            for w in ["a", "an", "the", "w3", "no such word"]:
+                self.assertAlmostEqual(model.score(w, context), self.stupidBackoff(w, tuple(context), 0.4), 12,
+                                       "Wrong score: %s %s" % (context, w))
+
+    def test_kneser_ney_normalized(self):
+        model = sc.KneserNeyModel(self.counter)
+        for context in self.contexts:
+            total = sum(model.score(w, context) for w in self.store.words)
+            self.assertAlmostEqual(total, 1., 9, "Probabilities should sum to one: %s" % (context,))
+            self.assertGreater(model.score("the", context), 0, "Unseen contexts should back off")
+
+    def test_kneser_ney_continuation(self):
+        model = sc.KneserNeyModel(self.store, discount = 0.5)
+        self.assertEqual(model.discounts[2], 0.5)
+        # the highest order alone equals to discounted frequency for seen context
+        context = self.contexts[0]
+        freq_dist = self.counter.ngrams[4][context]
+        w = freq_dist.max()
+        self.assertGreater(model.score(w, context), (freq_dist[w] - 0.5) / freq_dist.N())
+
+    def test_logscore_and_perplexity(self):
+        model = sc.KneserNeyModel(self.store)
+        self.assertAlmostEqual(model.logscore("the", ("a",)), np.log2(model.score("the", ("a",))), 12)
+        self.assertLess(model.perplexity(self.corpora[0]), nn.LaplaceNgramModel(self.counter).perplexity(self.corpora[0]))
+        with self.assertRaises(ValueError):
+            model.score("the", ("a", "b", "c", "d"))
+
+    def test_score_batch(self):
+        candidates = ["a", "an", "the", "no such word"]
+        for model in [sc.MLEModel(self.store), sc.StupidBackoffModel(self.store), sc.KneserNeyModel(self.store)]:
+            scores = model.score_batch(model.contextIds(self.contexts), candidates)
+            self.assertEqual(scores.shape, (len(self.contexts), len(candidates)), "Wrong scores shape")
+            for context, row in zip(self.contexts, scores):
+                for w, score in zip(candidates, row):
+                    self.assertAlmostEqual(score, model.score(w, context), 12, "Wrong score: %s %s" % (context, w))
+
+    def test_mle(self):
+        model = sc.MLEModel(self.store)
+        for context in self.contexts[:-1]:
+            for w in ["a", "an", "the"]:
+                self.assertAlmostEqual(model.score(w, context),
+                                       self.counter.ngrams[len(context) + 1][tuple(context)].freq(w), 12)
+
+    def test_build_model(self):
+        self.assertIsInstance(sc.buildModel("kneser_ney", self.store), sc.KneserNeyModel)
+        with self.assertRaises(Exception):
+            sc.buildModel("no such model", self.store)
+
+if __name__ == '__main__':
+    unittest.main()
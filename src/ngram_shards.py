@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The parallel map-reduce n-gram counting. The corpus is split into shards which are
+counted by the process pool, where each worker writes sorted partial counts file
+(compact n-gram store with its own vocabulary). The partial stores are combined with
+k-way merge of sorted keys after remapping of local word and context ids into merged
+ones. As vocabularies and context tries are sorted, the remapping is monotone and keeps
+keys of each partial store sorted. The same merge adds counts of new text batch to
+the existing model without recounting the history.
+
+@author: yaric
+"""
+import os
+import json
+import time
+import shutil
+import argparse
+import multiprocessing
+
+import numpy as np
+
+import ngram_store as ns
+import config
+
+# The maximal value of uint32 counts
+MAX_COUNT = np.iinfo(np.uint32).max
+
+def countShard(task):
+    """
+    Counts n-grams of the corpus shard and saves them as partial counts file
+    Arguments:
+        task: the tuple with shard index, list of sentences, n-grams order, vocabulary and
+              the directory to save partial counts file
+    Return:
+        the path to the partial counts file
+    """
+    shard, sentences, order, vocabulary, work_dir = task
+    path = "%s/shard_%d.npz" % (work_dir, shard)
+    ns.countIds(sentences, vocabulary, order).save(path)
+    return path
+
+def __mergeSortedRuns(keys_list, counts_list):
+    """
+    Merges sorted runs of keys and sums the counts of equal keys
+    Return:
+        the tuple with sorted unique keys and their counts
+    """
+    keys = np.concatenate(keys_list)
+    counts = np.concatenate([c.astype(np.uint64) for c in counts_list])
+    # the stable sort detects presorted runs, so it works as k-way merge
+    order = np.argsort(keys, kind = 'stable')
+    keys = keys[order]
+    counts = counts[order]
+    if len(keys) == 0:
+        return (keys, counts.astype(np.uint32))
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    counts = np.add.reduceat(counts, starts)
+    if len(counts) > 0 and counts.max() <= MAX_COUNT:
+        counts = counts.astype(np.uint32)
+    return (keys[starts], counts)
+
+def __remapKeys(keys, node_map, word_map):
+    """
+    Remaps packed keys of partial store into merged node and word ids
+    """
+    nodes = (keys >> np.uint64(ns.WORD_BITS)).astype(np.int64)
+    words = (keys & np.uint64(ns.WORD_MASK)).astype(np.int64)
+    return ns.packKeys(node_map[nodes], word_map[words])
+
+def mergeStores(stores):
+    """
+    Merges counts of several n-gram stores with the same order and vocabulary
+    Arguments:
+        stores: the list of NgramStore
+    Return:
+        the merged NgramStore
+    """
+    order = stores[0].order
+    if any(s.order != order for s in stores):
+        raise Exception("Only stores of the same n-grams order can be merged")
+
+    local_words = [np.array(list(s.words)) for s in stores]
+    words = np.unique(np.concatenate(local_words))
+    # the local vocabularies are sorted, so ids are remapped monotonically
+    word_maps = [np.searchsorted(words, w) for w in local_words]
+    in_vocabulary = np.zeros(len(words), dtype = bool)
+    unigrams = np.zeros(len(words), dtype = np.uint64)
+    for s, word_map in zip(stores, word_maps):
+        in_vocabulary[word_map] |= s.in_vocabulary
+        unigrams[word_map] += s.unigram_counts
+
+    contexts = dict()
+    node_maps = {0:[np.zeros(1, dtype = np.int64) for _ in stores]}
+    for level in range(1, order):
+        remapped = [__remapKeys(s.contexts[level], node_maps[level - 1][i], word_maps[i])
+                    for i, s in enumerate(stores)]
+        contexts[level] = np.unique(np.concatenate(remapped))
+        node_maps[level] = [np.searchsorted(contexts[level], r) for r in remapped]
+
+    keys, counts, totals = dict(), dict(), dict()
+    for n in range(2, order + 1):
+        remapped = [__remapKeys(s.keys[n], node_maps[n - 1][i], word_maps[i]) for i, s in enumerate(stores)]
+        keys[n], counts[n] = __mergeSortedRuns(remapped, [s.counts[n] for s in stores])
+        totals[n] = np.bincount((keys[n] >> np.uint64(ns.WORD_BITS)).astype(np.int64),
+                                weights = counts[n], minlength = len(contexts[n - 1])).astype(np.uint64)
+
+    if unigrams.max(initial = 0) <= MAX_COUNT:
+        unigrams = unigrams.astype(np.uint32)
+    return ns.NgramStore(order, words.tolist(), in_vocabulary, max(s.vocabulary_len for s in stores),
+                         unigrams, contexts, keys, counts, totals, stores[0].unk_label, stores[0].ngrams_kwargs)
+
+def countParallel(corpora, order, vocabulary, processes = None, n_shards = None,
+                  work_dir = config.intermediate_dir + "/ngram_shards"):
+    """
+    Counts n-grams of corpus with the process pool
+    Arguments:
+        corpora: the list of sentences (lists of words)
+        order: the highest order of n-grams
+        vocabulary: the nltk_ngram.NgramModelVocabulary (or FrozenVocabulary) built over whole corpus
+        processes: the number of worker processes [optional], if None the CPU count used
+        n_shards: the number of corpus shards [optional], if None equal to number of processes
+        work_dir: the directory to store partial counts files
+    Return:
+        the NgramStore with counts of whole corpus
+    """
+    if processes == None:
+        processes = multiprocessing.cpu_count()
+    if n_shards == None:
+        n_shards = processes
+    if os.path.exists(work_dir) == False:
+        os.makedirs(work_dir)
+
+    if hasattr(vocabulary, "freeze"):
+        vocabulary = vocabulary.freeze()
+    bounds = np.linspace(0, len(corpora), n_shards + 1).astype(int)
+    tasks = [(i, corpora[bounds[i]:bounds[i + 1]], order, vocabulary, work_dir) for i in range(n_shards)]
+    start = time.time()
+    with multiprocessing.Pool(processes) as pool:
+        paths = pool.map(countShard, tasks)
+    print("Counted %d shards with %d processes in %.2f s" % (n_shards, processes, time.time() - start))
+
+    start = time.time()
+    store = mergeStores([ns.NgramStore.load(path) for path in paths])
+    print("Merged %d shards in %.2f s" % (n_shards, time.time() - start))
+    shutil.rmtree(work_dir)
+    return store
+
+def vocabularyOf(store):
+    """
+    Creates nltk_ngram.NgramModelVocabulary with the same membership as store vocabulary
+    """
+    import nltk_ngram as nn
+
+    return nn.NgramModelVocabulary(1, {store.words[i]:1 for i in np.flatnonzero(store.in_vocabulary)})
+
+def addCounts(store, sentences):
+    """
+    Adds counts of new text batch to the existing model. The vocabulary of model is kept,
+    so new words are counted as unknown.
+    Arguments:
+        store: the NgramStore with existing counts
+        sentences: the list of new sentences (lists of words)
+    Return:
+        the NgramStore with merged counts
+    """
+    import nltk_ngram as nn
+
+    counter = nn.NgramCounter(store.order, vocabularyOf(store), unk_label = store.unk_label, **store.ngrams_kwargs)
+    counter.train_counts(sentences)
+    return mergeStores([store, ns.fromCounter(counter)])
+
+def readNgramsCorpora(path):
+    """
+    Reads the corpus of n-grams texts the same way as nltk_ngram.py script
+    """
+    with open(path) as f:
+        ngrams_txt = json.load(f)
+    return [key.split() for key in ngrams_txt.keys()]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='The parallel n-gram counting with mergeable count shards')
+    parser.add_argument('--ngrams_file', default=config.data_dir + "/ngrams.txt",
+                        help='the path to the n-grams texts corpus')
+    parser.add_argument('--order', type=int, default=5,
+                        help='the highest order of n-grams')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='the number of worker processes')
+    parser.add_argument('--add_to', default=None,
+                        help='the path to the existing n-gram store to add counts of the corpus to')
+    parser.add_argument('--out_file', default=config.ngram_bundle_path,
+                        help='the path to save n-gram store as binary bundle')
+    args = parser.parse_args()
+
+    corpora = readNgramsCorpora(args.ngrams_file)
+    print("Collected %d ngrams texts" % len(corpora))
+    if args.add_to != None:
+        start = time.time()
+        store = addCounts(ns.openStore(args.add_to), corpora)
+        print("Counts added in %.2f s" % (time.time() - start))
+    else:
+        import nltk_ngram as nn
+        vocabulary = nn.build_vocabulary(1, [w for s in corpora for w in s])
+        store = countParallel(corpora, args.order, vocabulary, processes = args.processes)
+    store.saveBundle(args.out_file)
+    print("Store with %d n-grams saved to: %s" % (store.n_ngrams(), args.out_file))
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The test cases for parallel n-gram counting with mergeable count shards
+
+@author: yaric
+"""
+import tempfile
+import unittest
+
+import numpy as np
+
+import ngram_shards as sh
+import ngram_store as ns
+import nltk_ngram as nn
+from ngram_test_corpora import randomCorpora
+
+class TestNgramShardsMethods(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.corpora = randomCorpora(40, 400, 8)
+        cls.vocabulary = nn.build_vocabulary(2, [w for s in cls.corpora for w in s])
+        cls.expected = ns.fromCounter(nn.count_ngrams(4, cls.vocabulary, cls.corpora))
+
+    def assertSameStore(self, store):
+        self.assertEqual(list(store.words), list(self.expected.words), "Wrong vocabulary")
+        self.assertTrue(np.array_equal(store.in_vocabulary, self.expected.in_vocabulary), "Wrong vocabulary flags")
+        self.assertEqual(len(store.vocabulary), len(self.expected.vocabulary), "Wrong vocabulary size")
+        self.assertTrue(np.array_equal(store.unigram_counts, self.expected.unigram_counts), "Wrong unigrams")
+        for level in range(1, 4):
+            self.assertTrue(np.array_equal(store.contexts[level], self.expected.contexts[level]),
+                            "Wrong contexts of level: %d" % level)
+        for order in range(2, 5):
+            self.assertTrue(np.array_equal(store.keys[order], self.expected.keys[order]), "Wrong keys")
+            self.assertTrue(np.array_equal(store.counts[order], self.expected.counts[order]), "Wrong counts")
+            self.assertTrue(np.array_equal(store.totals[order], self.expected.totals[order]), "Wrong totals")
+
+    def test_count_parallel(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = sh.countParallel(self.corpora, 4, self.vocabulary, processes = 2, n_shards = 3,
+                                     work_dir = temp_dir + "/ngram_shards")
+        self.assertSameStore(store)
+
+    def test_merge_stores(self):
+        parts = [ns.fromCounter(nn.count_ngrams(4, self.vocabulary, self.corpora[i:i + 100]))
+                 for i in range(0, len(self.corpora), 100)]
+        self.assertSameStore(sh.mergeStores(parts))
+
+    def test_add_counts(self):
+        history = ns.fromCounter(nn.count_ngrams(4, self.vocabulary, self.corpora[:250]))
+        self.assertSameStore(sh.addCounts(history, self.corpora[250:]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,552 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The approximate n-gram counting with count-min sketch (Cormode and Muthukrishnan, 2005)
+with conservative update (Estan and Varghese, 2002). Each order has its own sketch - the
+table of [depth x width] uint32 counters, where both the n-grams and the totals of their
+contexts are counted. The n-grams are encoded as word ids of frozen vocabulary and hashed
+with vectorized 64-bit mixing, the depth cells of key are found by double hashing
+(Kirsch and Mitzenmacher, 2006). The memory does not depend on the number of distinct
+n-grams, so the counts of corpus of any size fit the configured memory ceiling.
+
+The error bounds: the estimated count is never less than the true count, and with
+probability at least 1 - exp(-depth) it exceeds the true count by at most e / width * N,
+where N is the sum of all counts added to the sketch of the order (the n-gram counts and
+the context totals). The conservative update only increases the cells up to the new
+estimate of key, so its estimates are never greater than of plain count-min sketch and
+the same bounds hold, while the overestimation of rare n-grams is much lower in practice.
+The frequency of word in context is the ratio of two estimates, so it is biased to the
+frequencies of colliding n-grams of rare contexts.
+
+The counter keeps `ngrams[order][context].freq(word)` interface of nltk_ngram.NgramCounter
+and SketchModel provides the batch scoring interface of ngram_scoring models.
+
+@author: yaric
+"""
+import sys
+import json
+import time
+import argparse
+import itertools
+
+import numpy as np
+
+import ngram_store as ns
+import ngram_scoring as sc
+import ngram_res as nr
+import threshold_sweep as ts
+import evaluate
+import config
+
+# The default width and depth of sketch per order
+DEFAULT_WIDTH = 1 << 22
+DEFAULT_DEPTH = 4
+# The number of sentences counted at once
+CHUNK_TEXTS = 200000
+# The maximal value of counters
+MAX_COUNT = np.iinfo(np.uint32).max
+
+# The constants of 64-bit mixing (splitmix64 finalizer)
+__MIX_1 = np.uint64(0xbf58476d1ce4e5b9)
+__MIX_2 = np.uint64(0x94d049bb133111eb)
+__GOLDEN = np.uint64(0x9e3779b97f4a7c15)
+# The marker hashed instead of word for context totals, never equal to word id
+__TOTAL_MARKER = np.uint64(1 << 40)
+
+def mix64(h):
+    """
+    Returns the mixed 64-bit hashes
+    """
+    h = h ^ (h >> np.uint64(30))
+    h = h * __MIX_1
+    h = h ^ (h >> np.uint64(27))
+    h = h * __MIX_2
+    return h ^ (h >> np.uint64(31))
+
+def hashIds(ids, seed = 0):
+    """
+    Returns the 64-bit hashes of rows of word ids matrix [rows x columns]
+    """
+    ids = np.asarray(ids, dtype = np.int64)
+    h = mix64(np.full(len(ids), seed, dtype = np.uint64) + __GOLDEN)
+    for column in ids.T:
+        h = mix64((h * __GOLDEN) ^ column.astype(np.uint64))
+    return h
+
+def ngramHashes(context_hashes, word_ids):
+    """
+    Returns the hashes of n-grams from hashes of their contexts and word ids
+    """
+    return mix64((context_hashes * __GOLDEN) ^ np.asarray(word_ids, dtype = np.int64).astype(np.uint64))
+
+def totalHashes(context_hashes):
+    """
+    Returns the hashes of context totals from hashes of contexts
+    """
+    return mix64((context_hashes * __GOLDEN) ^ __TOTAL_MARKER)
+
+class CountMinSketch(object):
+    """
+    The count-min sketch with conservative update over 64-bit key hashes
+    """
+
+    def __init__(self, width, depth, table = None, total = 0):
+        """
+        Creates sketch
+        Arguments:
+            width: the number of counters per row
+            depth: the number of rows
+            table: the counters [depth x width] [optional]
+            total: the sum of all added counts
+        """
+        self.width = int(width)
+        self.depth = int(depth)
+        self.table = table if table is not None else np.zeros((self.depth, self.width), dtype = np.uint32)
+        self.total = total
+
+    def nbytes(self):
+        return self.table.nbytes
+
+    def cells(self, hashes):
+        """
+        Returns the column of key per row [depth x keys] by double hashing
+        """
+        h1 = hashes & np.uint64(0xffffffff)
+        h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+        rows = np.arange(self.depth, dtype = np.uint64)[:, None]
+        return ((h1 + rows * h2) % np.uint64(self.width)).astype(np.int64)
+
+    def add(self, hashes, weights):
+        """
+        Adds counts of keys with conservative update: each cell of key is raised to at
+        most the new estimate of key
+        Arguments:
+            hashes: the 64-bit hashes of keys
+            weights: the counts to add per key
+        """
+        # the counts of the same key are summed, so batch needs one update per key
+        hashes, inverse = np.unique(hashes, return_inverse = True)
+        weights = np.bincount(inverse.ravel(), weights = weights, minlength = len(hashes))
+        cells = self.cells(hashes)
+        rows = np.arange(self.depth)[:, None]
+        targets = np.minimum(self.table[rows, cells].min(axis = 0) + weights, MAX_COUNT).astype(np.uint32)
+        for row in range(self.depth):
+            np.maximum.at(self.table[row], cells[row], targets)
+        self.total += int(weights.sum())
+
+    def estimate(self, hashes):
+        """
+        Returns the estimated counts of keys
+        """
+        if len(hashes) == 0:
+            return np.zeros(0, dtype = np.uint32)
+        return self.table[np.arange(self.depth)[:, None], self.cells(hashes)].min(axis = 0)
+
+    def epsilon(self):
+        """
+        Returns the relative error of estimates: e / width
+        """
+        return np.e / self.width
+
+    def confidence(self):
+        """
+        Returns the probability that estimate is within error bound: 1 - exp(-depth)
+        """
+        return 1. - np.exp(-self.depth)
+
+    def errorBound(self):
+        """
+        Returns the maximal overestimation of count with probability of confidence()
+        """
+        return self.epsilon() * self.total
+
+def sketchWidth(order, depth, width = None, max_bytes = None):
+    """
+    Returns the width of sketches of all orders to fit the memory ceiling
+    Arguments:
+        order: the highest order of n-grams
+        depth: the depth of sketches
+        width: the requested width [optional]
+        max_bytes: the memory ceiling of all sketches [optional]
+    """
+    n_sketches = max(order - 1, 1)
+    if max_bytes is None:
+        return width if width is not None else DEFAULT_WIDTH
+    fit = int(max_bytes // (n_sketches * depth * np.dtype(np.uint32).itemsize))
+    if width is None:
+        width = fit
+    if width > fit or width < 1:
+        raise Exception("The sketches of width %d and depth %d do not fit memory ceiling %d bytes"
+                        % (width, depth, max_bytes))
+    return width
+
+class SketchCounts(object):
+    """
+    The estimated counts of words following specific context. Provides the same read only
+    interface as ngram_store.NgramCounts, except the words enumeration.
+    """
+
+    def __init__(self, counter, order, context_ids):
+        self.counter = counter
+        self.order = order
+        self.context_ids = np.array([context_ids], dtype = np.int64).reshape(1, -1)
+        self.total = int(counter.contextTotals(order, self.context_ids)[0])
+
+    def __getitem__(self, word):
+        word_ids = np.array([self.counter.wordId(word)], dtype = np.int64)
+        return int(self.counter.ngramCounts(self.order, self.context_ids, word_ids)[0])
+
+    def __contains__(self, word):
+        return self[word] > 0
+
+    def N(self):
+        """
+        Returns the estimated total count of words following the context
+        """
+        return self.total
+
+    def freq(self, word):
+        """
+        Returns the estimated frequency of word following the context, 0 for unknown context
+        """
+        if self.total == 0:
+            return 0
+        return min(self[word] / self.total, 1.)
+
+class SketchOrder(object):
+    """
+    The estimated counts of n-grams of specific order indexed by context
+    """
+
+    def __init__(self, counter, order):
+        self.counter = counter
+        self.order = order
+
+    def __getitem__(self, context):
+        if len(context) != self.order - 1:
+            return SketchCounts(self.counter, self.order, [-1] * len(context))
+        return SketchCounts(self.counter, self.order, self.counter.wordIds(context))
+
+class SketchOrders(object):
+    """
+    The estimated n-gram counts per order
+    """
+
+    def __init__(self, counter):
+        self.counter = counter
+
+    def __getitem__(self, order):
+        return SketchOrder(self.counter, order)
+
+    def __contains__(self, order):
+        return order in self.counter.sketches
+
+    def keys(self):
+        return sorted(self.counter.sketches.keys())
+
+class SketchCounter(object):
+    """
+    The approximate n-gram counter with count-min sketch per order
+    """
+
+    def __init__(self, order, vocabulary, width = None, depth = DEFAULT_DEPTH, max_bytes = None,
+                 unk_label = "<UNK>", **ngrams_kwargs):
+        """
+        Creates counter
+        Arguments:
+            order: the highest order of n-grams
+            vocabulary: the nltk_ngram.FrozenVocabulary (or NgramModelVocabulary to be frozen)
+            width: the number of counters per row of sketch [optional], if None fitted to
+                   memory ceiling or DEFAULT_WIDTH
+            depth: the number of rows of sketch
+            max_bytes: the memory ceiling of all sketches [optional]
+            unk_label: the label of unknown words
+            ngrams_kwargs: the padding options the same as of nltk_ngram.NgramCounter
+        """
+        import nltk_ngram as nn
+
+        if isinstance(vocabulary, nn.FrozenVocabulary) == False:
+            vocabulary = vocabulary.freeze(unk_label)
+        # the counter resolves padding options and adds padding symbols to vocabulary
+        counter = nn.NgramCounter(order, vocabulary, unk_label = unk_label, **ngrams_kwargs)
+        self.order = order
+        self.unk_label = unk_label
+        self.vocabulary = counter.vocabulary
+        self.ngrams_kwargs = counter.ngrams_kwargs
+        self.words = self.vocabulary.words
+        self.in_vocabulary = np.array(self.vocabulary.in_vocabulary(), dtype = bool)
+        self.unigram_counts = np.zeros(len(self.words), dtype = np.uint64)
+        width = sketchWidth(order, depth, width, max_bytes)
+        self.sketches = {n:CountMinSketch(width, depth) for n in range(2, order + 1)}
+        self.ngrams = SketchOrders(self)
+
+    @property
+    def unigrams(self):
+        nonzero = np.flatnonzero(self.unigram_counts)
+        return ns.NgramCounts(self, nonzero, self.unigram_counts[nonzero], self.unigram_counts.sum())
+
+    def wordId(self, word):
+        """
+        Returns the id of word or -1 if word not in vocabulary words
+        """
+        return self.vocabulary.word2id.get(word, -1)
+
+    def wordIds(self, words):
+        """
+        Returns the list of ids of words, -1 for unknown words
+        """
+        return [self.wordId(w) for w in words]
+
+    def check_against_vocab(self, word):
+        if word in self.vocabulary:
+            return word
+        return self.unk_label
+
+    def to_ngrams(self, sequence):
+        """
+        Generates n-grams with padding options of the counter
+        """
+        from nltk.util import ngrams
+        return ngrams(sequence, self.order, **self.ngrams_kwargs)
+
+    def nbytes(self):
+        """
+        Returns the size of counter arrays and vocabulary in bytes
+        """
+        words = sys.getsizeof(self.words) + sum(sys.getsizeof(w) for w in self.words)
+        return sum(s.nbytes() for s in self.sketches.values()) + self.unigram_counts.nbytes + \
+               self.in_vocabulary.nbytes + words
+
+    def train_counts(self, training_text, weights = None, chunk_texts = CHUNK_TEXTS):
+        """
+        Counts n-grams of sentences in training text
+        Arguments:
+            training_text: the iterable of sentences (lists of words)
+            weights: the integer weight (frequency) of each sentence [optional]
+            chunk_texts: the number of sentences counted at once
+        """
+        texts = iter(training_text)
+        weights = iter(weights) if weights is not None else itertools.repeat(1)
+        while True:
+            chunk = list(itertools.islice(zip(texts, weights), chunk_texts))
+            if len(chunk) == 0:
+                break
+            _, _, order, _, tokens, token_weights, windows, window_weights = \
+                ns.idWindows([s for s, _ in chunk], self.vocabulary, self.order, [w for _, w in chunk],
+                             self.unk_label, self.ngrams_kwargs)
+            self.unigram_counts += np.bincount(tokens, weights = token_weights,
+                                               minlength = len(self.words)).astype(np.uint64)
+            self.addWindows(windows, window_weights)
+
+    def addWindows(self, windows, weights):
+        """
+        Adds counts of n-gram windows of the highest order, the lower order n-grams are
+        the suffixes of windows (the same as nltk_ngram.NgramCounter counts)
+        Arguments:
+            windows: the matrix of word ids [n-grams x order]
+            weights: the count per window
+        """
+        for n, sketch in self.sketches.items():
+            context_hashes = hashIds(windows[:, self.order - n:self.order - 1], n)
+            sketch.add(np.concatenate((ngramHashes(context_hashes, windows[:, -1]), totalHashes(context_hashes))),
+                       np.concatenate((weights, weights)))
+
+    def __validRows(self, ids):
+        """
+        Returns the flags whether all word ids of rows are known
+        """
+        return np.all((ids >= 0) & (ids < len(self.words)), axis = 1)
+
+    def ngramCounts(self, order, context_ids, word_ids):
+        """
+        Returns the estimated counts of words following the contexts
+        Arguments:
+            order: the order of n-grams
+            context_ids: the matrix of context word ids [contexts x (order - 1)]
+            word_ids: the word id per context
+        Return:
+            the array of counts, 0 for unknown words
+        """
+        context_ids = np.asarray(context_ids, dtype = np.int64).reshape(len(word_ids), order - 1)
+        word_ids = np.asarray(word_ids, dtype = np.int64)
+        valid = self.__validRows(np.column_stack((context_ids, word_ids)))
+        hashes = ngramHashes(hashIds(context_ids, order), word_ids)
+        return np.where(valid, self.sketches[order].estimate(hashes), 0)
+
+    def contextTotals(self, order, context_ids):
+        """
+        Returns the estimated totals of contexts
+        Arguments:
+            order: the order of n-grams
+            context_ids: the matrix of context word ids [contexts x (order - 1)]
+        Return:
+            the array of totals, 0 for unknown words
+        """
+        context_ids = np.asarray(context_ids, dtype = np.int64)
+        context_ids = context_ids.reshape(len(context_ids), -1)
+        if order not in self.sketches or context_ids.shape[1] != order - 1:
+            return np.zeros(len(context_ids), dtype = np.uint32)
+        valid = self.__validRows(context_ids)
+        return np.where(valid, self.sketches[order].estimate(totalHashes(hashIds(context_ids, order))), 0)
+
+    def save(self, path):
+        """
+        Saves counter arrays into the Numpy file
+        """
+        arrays = {"words":np.array(list(self.words)), "in_vocabulary":self.in_vocabulary,
+                  "unigrams":self.unigram_counts}
+        for n, sketch in self.sketches.items():
+            arrays["table_%d" % n] = sketch.table
+        meta = {"order":self.order, "cutoff":self.vocabulary.cutoff, "unk_label":self.unk_label,
+                "ngrams_kwargs":self.ngrams_kwargs, "totals":{n:s.total for n, s in self.sketches.items()}}
+        np.savez(path, meta = np.array(json.dumps(meta)), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads counter saved with save()
+        """
+        import nltk_ngram as nn
+
+        with np.load(path, allow_pickle = False) as data:
+            meta = json.loads(str(data["meta"]))
+            members = [w for w, m in zip(data["words"].tolist(), data["in_vocabulary"]) if m]
+            vocabulary = nn.FrozenVocabulary(members, meta["cutoff"], meta["unk_label"])
+            table = data["table_%d" % meta["order"]]
+            counter = cls(meta["order"], vocabulary, table.shape[1], table.shape[0],
+                          unk_label = meta["unk_label"], **meta["ngrams_kwargs"])
+            counter.unigram_counts = data["unigrams"]
+            for n, sketch in counter.sketches.items():
+                sketch.table = data["table_%d" % n]
+                sketch.total = meta["totals"][str(n)]
+        return counter
+
+class SketchModel(sc.BackoffModel):
+    """
+    The relative frequency of word in the exact context estimated by SketchCounter, the
+    approximation of ngram_scoring.MLEModel with the same scoring interface
+    """
+
+    def __init__(self, counter):
+        """
+        Creates model
+        Arguments:
+            counter: the SketchCounter
+        """
+        self.store = counter
+        self.order = counter.order
+        unigrams = counter.unigram_counts.astype(np.float64)
+        self.unigram_probs = unigrams / max(unigrams.sum(), 1)
+
+    def scoreIds(self, context_ids, word_ids):
+        context_ids = np.asarray(context_ids, dtype = np.int64)
+        word_ids = np.asarray(word_ids, dtype = np.int64)
+        orders = self.queryOrders(context_ids)
+        valid_words = (word_ids >= 0) & (word_ids < len(self.unigram_probs))
+        scores = np.where(valid_words & (orders == 1), self.unigram_probs[np.where(valid_words, word_ids, 0)], 0.)
+        for n in range(2, self.order + 1):
+            rows = np.flatnonzero(orders == n)
+            if len(rows) == 0:
+                continue
+            contexts = context_ids[rows][:, context_ids.shape[1] - n + 1:]
+            totals = self.store.contextTotals(n, contexts).astype(np.float64)
+            counts = self.store.ngramCounts(n, contexts, word_ids[rows]).astype(np.float64)
+            # the estimated count can exceed the estimated total of colliding context
+            scores[rows] = np.where(totals > 0, np.minimum(counts / np.maximum(totals, 1), 1.), 0.)
+        return scores
+
+    def score_batch(self, contexts, candidates):
+        context_ids = np.asarray(contexts, dtype = np.int64).reshape(len(contexts), -1)
+        scores = np.zeros((len(context_ids), len(candidates)))
+        for j, candidate in enumerate(candidates):
+            word_id = self.store.wordId(candidate) if isinstance(candidate, str) else candidate
+            scores[:, j] = self.scoreIds(context_ids, np.full(len(context_ids), word_id, dtype = np.int64))
+        return scores
+
+def countErrors(counter, store):
+    """
+    Compares estimated counts with exact counts of the same corpus and vocabulary
+    Arguments:
+        counter: the SketchCounter
+        store: the NgramStore with exact counts (see ngram_store.countIds)
+    Return:
+        the dictionary per order with mean overestimation of n-gram counts, the share of
+        exactly estimated n-grams, the share of n-grams within error bound and error bound
+    """
+    errors = dict()
+    for n in range(2, store.order + 1):
+        nodes = (store.keys[n] >> np.uint64(ns.WORD_BITS)).astype(np.int64)
+        word_ids = (store.keys[n] & np.uint64(ns.WORD_MASK)).astype(np.int64)
+        estimates = counter.ngramCounts(n, ns.nodeIds(store, n - 1, nodes), word_ids).astype(np.float64)
+        over = estimates - store.counts[n]
+        bound = counter.sketches[n].errorBound()
+        errors[n] = {"mean_error":float(over.mean()) if len(over) > 0 else 0., "exact":float(np.mean(over == 0)),
+                     "within_bound":float(np.mean(over <= bound)), "bound":bound}
+    return errors
+
+def predictionsReport(model, text, correct):
+    """
+    Returns the target score and accuracy of predictions of model
+    """
+    submission = nr.buildPredictions(text, model)
+    confidence, is_correct, is_mistake, _ = ts.submissionArrays(text, correct, submission)
+    return evaluate.targetScore(confidence, is_correct, is_mistake)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='The benchmark of approximate n-gram counting with count-min sketch')
+    parser.add_argument('--ngrams_file', default=config.data_dir + "/ngrams.txt",
+                        help='the path to the n-grams texts corpus')
+    parser.add_argument('--order', type=int, default=5,
+                        help='the highest order of n-grams')
+    parser.add_argument('--cutoff', type=int, default=1,
+                        help='the minimal count of word to be in vocabulary')
+    parser.add_argument('--width', type=int, default=None,
+                        help='the number of counters per row of sketch')
+    parser.add_argument('--depth', type=int, default=DEFAULT_DEPTH,
+                        help='the number of rows of sketch')
+    parser.add_argument('--max_mb', type=float, default=None,
+                        help='the memory ceiling of sketches in MB')
+    parser.add_argument('--sentences_file', default=config.sentence_validate_path,
+                        help="the text's corpora file to evaluate predictions")
+    parser.add_argument('--corrections_file', default=config.corrections_validate_path,
+                        help='the path to the file with ground truth corrections')
+    parser.add_argument('--out_file', default=None,
+                        help='the path to save sketch counter (.npz)')
+    args = parser.parse_args()
+
+    import ngram_stream
+
+    vocabulary = ngram_stream.buildVocabularyStreaming(args.ngrams_file, args.cutoff).freeze()
+    texts, weights = list(), list()
+    for words, weight in ngram_stream.iterateNgramsFile(args.ngrams_file):
+        texts.append(words)
+        weights.append(weight)
+    print("Collected %d ngrams texts" % len(texts))
+
+    start = time.time()
+    store = ns.countIds(texts, vocabulary, args.order, weights = weights)
+    print("Exact counting: %.2f s" % (time.time() - start))
+    start = time.time()
+    max_bytes = args.max_mb * 2**20 if args.max_mb != None else None
+    counter = SketchCounter(args.order, vocabulary, args.width, args.depth, max_bytes)
+    counter.train_counts(texts, weights)
+    print("Sketch counting: %.2f s, width: %d, depth: %d" % (time.time() - start, counter.sketches[2].width,
+                                                             counter.sketches[2].depth))
+    if args.out_file != None:
+        counter.save(args.out_file)
+        print("Sketch counter saved to: " + args.out_file)
+
+    for n, e in sorted(countErrors(counter, store).items()):
+        print("Order %d: mean overestimation %.3f, exact %.4f, within bound %.1f: %.4f (confidence %.4f)"
+              % (n, e["mean_error"], e["exact"], e["bound"], e["within_bound"], counter.sketches[n].confidence()))
+
+    with open(args.sentences_file) as f:
+        text = json.load(f)
+    with open(args.corrections_file) as f:
+        correct = json.load(f)
+    print("%-20s %15s %15s" % ("", "exact", "sketch"))
+    print("%-20s %15.2f %15.2f" % ("memory_mb", store.nbytes() / 2**20, counter.nbytes() / 2**20))
+    exact_score, exact_accuracy = predictionsReport(sc.MLEModel(store), text, correct)
+    sketch_score, sketch_accuracy = predictionsReport(SketchModel(counter), text, correct)
+    print("%-20s %15.4f %15.4f" % ("target_score", exact_score, sketch_score))
+    print("%-20s %15.4f %15.4f" % ("accuracy", exact_accuracy, sketch_accuracy))
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The test cases for approximate n-gram counting with count-min sketch
+
+@author: yaric
+"""
+import tempfile
+import unittest
+
+import numpy as np
+
+import ngram_sketch as sk
+import ngram_scoring as sc
+import ngram_store as ns
+import ngram_res as nr
+import nltk_ngram as nn
+from ngram_test_corpora import randomCorpora
+
+class TestNgramSketchMethods(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.corpora = randomCorpora(30, 400, 12, article_repeat = 5)
+        cls.weights = list(np.random.RandomState(123).randint(1, 4, size = len(cls.corpora)))
+        cls.vocabulary = nn.build_vocabulary(2, [w for s in cls.corpora for w in s]).freeze()
+        cls.store = ns.countIds(cls.corpora, cls.vocabulary, 4, weights = cls.weights)
+
+    def test_wide_sketch(self):
+        counter = sk.SketchCounter(4, self.vocabulary, width = 1 << 16, depth = 4)
+        counter.train_counts(self.corpora, self.weights, chunk_texts = 150)
+        self.assertTrue(np.array_equal(counter.unigram_counts, self.store.unigram_counts), "Wrong unigrams")
+        for n, errors in sk.countErrors(counter, self.store).items():
+            self.assertEqual(errors["exact"], 1., "Wide sketch should be exact for order %d" % n)
+
+        expected = nr.buildPredictions(self.corpora, sc.MLEModel(self.store))
+        self.assertEqual(nr.buildPredictions(self.corpora, sk.SketchModel(counter)), expected, "Wrong predictions")
+        context = ("w1", "a")
+        self.assertEqual(counter.ngrams[3][context].N(), self.store.ngrams[3][context].N(), "Wrong context total")
+        self.assertEqual(counter.ngrams[3][("no", "such")].freq("the"), 0, "Unknown context")
+        self.assertEqual(counter.ngrams[3][context]["no such word"], 0, "Unknown word")
+
+    def test_error_bound(self):
+        counter = sk.SketchCounter(4, self.vocabulary, width = 256, depth = 3)
+        counter.train_counts(self.corpora, self.weights)
+        for n, errors in sk.countErrors(counter, self.store).items():
+            self.assertGreater(errors["mean_error"], 0, "Narrow sketch should overestimate")
+            self.assertGreaterEqual(errors["within_bound"], counter.sketches[n].confidence(), "Wrong error bound")
+
+        # the conservative update never overestimates more than plain count-min sketch
+        keys = sk.hashIds(np.arange(1000)[:, None] % 97)
+        conservative = sk.CountMinSketch(64, 3)
+        conservative.add(keys, np.ones(len(keys)))
+        plain = np.zeros((3, 64))
+        cells = conservative.cells(np.unique(keys))
+        for row in range(3):
+            np.add.at(plain[row], cells[row], np.bincount(np.unique(keys, return_inverse = True)[1].ravel()))
+        estimates = conservative.estimate(np.unique(keys))
+        self.assertTrue(np.all(estimates >= 1000 // 97), "Count should not be underestimated")
+        self.assertTrue(np.all(estimates <= plain[np.arange(3)[:, None], cells].min(axis = 0)))
+
+    def test_memory_ceiling(self):
+        counter = sk.SketchCounter(4, self.vocabulary, depth = 4, max_bytes = 2**16)
+        self.assertLessEqual(sum(s.nbytes() for s in counter.sketches.values()), 2**16, "Sketches should fit ceiling")
+        with self.assertRaises(Exception):
+            sk.SketchCounter(4, self.vocabulary, width = 2**16, depth = 4, max_bytes = 2**16)
+
+    def test_save_load(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        path = temp_dir.name + "/ngram_sketch_test.npz"
+        counter = sk.SketchCounter(4, self.vocabulary, width = 512, depth = 2)
+        counter.train_counts(self.corpora, self.weights)
+        counter.save(path)
+        loaded = sk.SketchCounter.load(path)
+        self.assertEqual(loaded.words, counter.words, "Wrong vocabulary")
+        for n in range(2, 5):
+            self.assertTrue(np.array_equal(loaded.sketches[n].table, counter.sketches[n].table), "Wrong sketch")
+            self.assertEqual(loaded.sketches[n].errorBound(), counter.sketches[n].errorBound(), "Wrong error bound")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,816 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The compact integer encoded n-gram counts store. The words are mapped to integer ids
+(the rank of word in sorted vocabulary) and the n-grams of each order are packed into
+sorted uint64 keys (context node id << 32 | word id) with parallel uint32 counts. The
+contexts are stored as trie levels of sorted uint64 keys (parent node id << 32 | word id),
+where the node id is the index of key in its level. All lookups are binary searches.
+The store keeps `ngrams[order][context].freq(word)` semantics of nltk_ngram.NgramCounter.
+
+The store can be saved as binary bundle which is opened through mmap, so only the pages
+of queried contexts are read from disk. The bundle layout:
+    - the magic bytes and the uint32 length of JSON header
+    - the JSON header with model options and descriptors (dtype, shape, offset) of arrays
+    - the arrays aligned to 64 bytes, including the sorted vocabulary as UTF-8 blob with
+      word offsets, so words are looked up by binary search over the blob
+
+@author: yaric
+"""
+import os
+import sys
+import json
+import mmap
+import time
+import pickle
+import bisect
+import struct
+import argparse
+from itertools import repeat
+
+import numpy as np
+
+import config
+
+# The number of bits for word id in the packed keys
+WORD_BITS = 32
+WORD_MASK = (1 << WORD_BITS) - 1
+
+# The magic bytes of binary bundle file
+BUNDLE_MAGIC = b"NGRMSTR1"
+# The alignment of arrays in binary bundle file
+BUNDLE_ALIGN = 64
+
+def packKeys(nodes, word_ids):
+    """
+    Packs parent node ids and word ids into uint64 keys
+    """
+    return (np.asarray(nodes, dtype = np.uint64) << np.uint64(WORD_BITS)) | np.asarray(word_ids, dtype = np.uint64)
+
+def findKeys(keys, nodes, word_ids):
+    """
+    Finds packed keys of (node, word id) pairs
+    Arguments:
+        keys: the sorted packed keys
+        nodes: the parent node ids, negative for not found parents
+        word_ids: the word ids, negative for unknown words
+    Return:
+        the positions of keys, -1 if key not found
+    """
+    nodes = np.asarray(nodes, dtype = np.int64)
+    word_ids = np.asarray(word_ids, dtype = np.int64)
+    valid = (nodes >= 0) & (word_ids >= 0)
+    if len(keys) == 0:
+        return np.full(valid.shape, -1, dtype = np.int64)
+    key = packKeys(np.where(valid, nodes, 0), np.where(valid, word_ids, 0))
+    pos = np.minimum(np.searchsorted(keys, key), len(keys) - 1)
+    return np.where(valid & (keys[pos] == key), pos, -1)
+
+class WordBlob(object):
+    """
+    The sorted vocabulary stored as UTF-8 blob with word offsets. The UTF-8 bytes order
+    is the same as the order of unicode strings, so words are found by binary search
+    over the blob without decoding whole vocabulary.
+    """
+
+    def __init__(self, blob, offsets):
+        """
+        Creates vocabulary over blob
+        Arguments:
+            blob: the uint8 array with concatenated UTF-8 encoded words
+            offsets: the offsets of words in blob [n_words + 1]
+        """
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def fromWords(cls, words):
+        encoded = [w.encode("utf-8") for w in words]
+        offsets = np.zeros(len(encoded) + 1, dtype = np.uint64)
+        offsets[1:] = np.cumsum([len(e) for e in encoded])
+        return cls(np.frombuffer(b"".join(encoded), dtype = np.uint8), offsets)
+
+    def wordBytes(self, i):
+        return self.blob[int(self.offsets[i]):int(self.offsets[i + 1])].tobytes()
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.wordBytes(i).decode("utf-8")
+
+    def find(self, word):
+        """
+        Returns the index of word or -1 if word not found
+        """
+        key = word.encode("utf-8")
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.wordBytes(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self) and self.wordBytes(lo) == key:
+            return lo
+        return -1
+
+    def nbytes(self):
+        return self.blob.nbytes + self.offsets.nbytes
+
+class NgramCounts(object):
+    """
+    The counts of words following specific context. Provides the same read only interface
+    as nltk.probability.FreqDist used by n-gram models.
+    """
+
+    def __init__(self, store, word_ids, counts, total):
+        """
+        Creates counts view
+        Arguments:
+            store: the NgramStore to resolve words
+            word_ids: the sorted ids of words following the context
+            counts: the counts per word id
+            total: the total count of words following the context
+        """
+        self.store = store
+        self.word_ids = word_ids
+        self.counts = counts
+        self.total = int(total)
+
+    def count(self, word_id):
+        """
+        Returns the count of word with specified id
+        """
+        pos = np.searchsorted(self.word_ids, word_id)
+        if pos < len(self.word_ids) and self.word_ids[pos] == word_id:
+            return int(self.counts[pos])
+        return 0
+
+    def __getitem__(self, word):
+        word_id = self.store.wordId(word)
+        if word_id < 0:
+            return 0
+        return self.count(word_id)
+
+    def __contains__(self, word):
+        return self[word] > 0
+
+    def __len__(self):
+        return len(self.word_ids)
+
+    def __iter__(self):
+        return (self.store.words[i] for i in self.word_ids)
+
+    def keys(self):
+        return list(self)
+
+    def items(self):
+        return [(self.store.words[i], int(c)) for i, c in zip(self.word_ids, self.counts)]
+
+    def N(self):
+        """
+        Returns the total count of words following the context
+        """
+        return self.total
+
+    def B(self):
+        """
+        Returns the number of distinct words following the context
+        """
+        return len(self.word_ids)
+
+    def freq(self, word):
+        """
+        Returns the frequency of word following the context, 0 for unknown context
+        """
+        if self.total == 0:
+            return 0
+        return self[word] / self.total
+
+    def max(self):
+        """
+        Returns the most frequent word following the context
+        """
+        if len(self.counts) == 0:
+            raise ValueError("A FreqDist must have at least one sample before max is defined.")
+        return self.store.words[self.word_ids[np.argmax(self.counts)]]
+
+class NgramOrder(object):
+    """
+    The counts of n-grams of specific order indexed by context
+    """
+
+    def __init__(self, store, order):
+        self.store = store
+        self.order = order
+
+    def __getitem__(self, context):
+        return self.store.contextCounts(self.order, context)
+
+    def __contains__(self, context):
+        return self.store.contextNode(self.store.wordIds(context)) >= 0 and self[context].N() > 0
+
+class NgramOrders(object):
+    """
+    The n-gram counts per order
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def __getitem__(self, order):
+        return NgramOrder(self.store, order)
+
+    def __contains__(self, order):
+        return order in self.store.keys
+
+    def keys(self):
+        return sorted(self.store.keys.keys())
+
+class StoreVocabulary(object):
+    """
+    The vocabulary of store with the same membership and size semantics as
+    nltk_ngram.NgramModelVocabulary
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def __contains__(self, word):
+        word_id = self.store.wordId(word)
+        return word_id >= 0 and bool(self.store.in_vocabulary[word_id])
+
+    def __len__(self):
+        return self.store.vocabulary_len
+
+class NgramStore(object):
+    """
+    The compact n-gram counts store
+    """
+
+    def __init__(self, order, words, in_vocabulary, vocabulary_len, unigrams, contexts, keys, counts,
+                 totals, unk_label = "<UNK>", ngrams_kwargs = None):
+        """
+        Creates new store
+        Arguments:
+            order: the highest order of n-grams
+            words: the sorted list (or WordBlob) of words, the word id is the index in this list
+            in_vocabulary: the flags whether word is in the model vocabulary per word id
+            vocabulary_len: the size of model vocabulary (accounting for unknown words)
+            unigrams: the unigram counts per word id
+            contexts: the dictionary with sorted keys of context trie nodes per context length
+            keys: the dictionary with sorted n-gram keys per order
+            counts: the dictionary with counts parallel to n-gram keys per order
+            totals: the dictionary with total count per context node per order
+            unk_label: the label of unknown words
+            ngrams_kwargs: the padding options to generate n-grams from text
+        """
+        self.order = order
+        self.words = words
+        self.in_vocabulary = in_vocabulary
+        self.vocabulary_len = int(vocabulary_len)
+        self.unigram_counts = unigrams
+        self.contexts = contexts
+        self.keys = keys
+        self.counts = counts
+        self.totals = totals
+        self.unk_label = unk_label
+        self.ngrams_kwargs = ngrams_kwargs if ngrams_kwargs != None else dict()
+        self.ngrams = NgramOrders(self)
+        self.vocabulary = StoreVocabulary(self)
+        # the memory map of opened bundle file
+        self.bundle = None
+
+    @property
+    def unigrams(self):
+        nonzero = np.flatnonzero(self.unigram_counts)
+        return NgramCounts(self, nonzero, self.unigram_counts[nonzero], self.unigram_counts.sum())
+
+    def wordId(self, word):
+        """
+        Returns the id of word or -1 if word not in store
+        """
+        if isinstance(self.words, WordBlob):
+            return self.words.find(word)
+        pos = bisect.bisect_left(self.words, word)
+        if pos < len(self.words) and self.words[pos] == word:
+            return pos
+        return -1
+
+    def wordIds(self, words):
+        """
+        Returns the list of ids of words, -1 for unknown words
+        """
+        return [self.wordId(w) for w in words]
+
+    def contextNode(self, context_ids):
+        """
+        Finds the trie node of context
+        Arguments:
+            context_ids: the word ids of context
+        Return:
+            the index of context node within its level or -1 if context not found
+        """
+        node = 0
+        for level, word_id in enumerate(context_ids, 1):
+            if word_id < 0 or level not in self.contexts:
+                return -1
+            level_keys = self.contexts[level]
+            key = packKeys(node, word_id)
+            pos = np.searchsorted(level_keys, key)
+            if pos == len(level_keys) or level_keys[pos] != key:
+                return -1
+            node = pos
+        return node
+
+    def nodeRange(self, order, node):
+        """
+        Returns the range of n-grams of specified order following the context node
+        """
+        keys = self.keys[order]
+        lo = np.searchsorted(keys, packKeys(node, 0))
+        hi = np.searchsorted(keys, packKeys(node + 1, 0))
+        return (lo, hi)
+
+    def contextCounts(self, order, context):
+        """
+        Returns the counts of words following the context
+        Arguments:
+            order: the order of n-grams
+            context: the tuple of context words
+        Return:
+            the NgramCounts, empty if context not found
+        """
+        if len(context) != order - 1:
+            return self.idCounts(order, [-1] * len(context))
+        return self.idCounts(order, self.wordIds(context))
+
+    def idCounts(self, order, context_ids):
+        """
+        Returns the counts of words following the context given by word ids
+        Arguments:
+            order: the order of n-grams
+            context_ids: the word ids of context words
+        Return:
+            the NgramCounts, empty if context not found
+        """
+        node = -1
+        if order in self.keys and len(context_ids) == order - 1:
+            node = self.contextNode(context_ids)
+        if node < 0:
+            return NgramCounts(self, np.zeros(0, dtype = np.uint32), np.zeros(0, dtype = np.uint32), 0)
+        lo, hi = self.nodeRange(order, node)
+        word_ids = (self.keys[order][lo:hi] & np.uint64(WORD_MASK)).astype(np.uint32)
+        return NgramCounts(self, word_ids, self.counts[order][lo:hi], self.totals[order][node])
+
+    def check_against_vocab(self, word):
+        if word in self.vocabulary:
+            return word
+        return self.unk_label
+
+    def to_ngrams(self, sequence):
+        """
+        Generates n-grams with padding options of the counter the store built from
+        """
+        from nltk.util import ngrams
+        return ngrams(sequence, self.order, **self.ngrams_kwargs)
+
+    def n_ngrams(self):
+        """
+        Returns the number of stored n-grams of all orders above unigrams
+        """
+        return sum(len(k) for k in self.keys.values())
+
+    def nbytes(self):
+        """
+        Returns the approximate size of store in memory in bytes
+        """
+        arrays = [self.in_vocabulary, self.unigram_counts] + list(self.contexts.values()) + \
+                 list(self.keys.values()) + list(self.counts.values()) + list(self.totals.values())
+        if isinstance(self.words, WordBlob):
+            words = self.words.nbytes()
+        else:
+            words = sys.getsizeof(self.words) + sum(sys.getsizeof(w) for w in self.words)
+        return sum(a.nbytes for a in arrays) + words
+
+    def save(self, path):
+        """
+        Saves store arrays into the uncompressed Numpy archive (.npz)
+        """
+        arrays = {"words":np.array(list(self.words)), "in_vocabulary":self.in_vocabulary,
+                  "unigrams":self.unigram_counts}
+        for level, keys in self.contexts.items():
+            arrays["contexts_%d" % level] = keys
+        for order in self.keys:
+            arrays["keys_%d" % order] = self.keys[order]
+            arrays["counts_%d" % order] = self.counts[order]
+            arrays["totals_%d" % order] = self.totals[order]
+        meta = {"order":self.order, "vocabulary_len":self.vocabulary_len, "unk_label":self.unk_label,
+                "ngrams_kwargs":self.ngrams_kwargs}
+        np.savez(path, meta = np.array(json.dumps(meta)), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads store saved with save()
+        """
+        with np.load(path, allow_pickle = False) as data:
+            meta = json.loads(str(data["meta"]))
+            order = meta["order"]
+            contexts = {l:data["contexts_%d" % l] for l in range(1, order)}
+            keys = {o:data["keys_%d" % o] for o in range(2, order + 1)}
+            counts = {o:data["counts_%d" % o] for o in range(2, order + 1)}
+            totals = {o:data["totals_%d" % o] for o in range(2, order + 1)}
+            return cls(order, data["words"].tolist(), data["in_vocabulary"], meta["vocabulary_len"],
+                       data["unigrams"], contexts, keys, counts, totals,
+                       meta["unk_label"], meta["ngrams_kwargs"])
+
+    def arrays(self):
+        """
+        Returns the dictionary with all store arrays by name
+        """
+        words = self.words if isinstance(self.words, WordBlob) else WordBlob.fromWords(self.words)
+        arrays = {"words_blob":words.blob, "words_offsets":words.offsets,
+                  "in_vocabulary":self.in_vocabulary.astype(np.uint8), "unigrams":self.unigram_counts}
+        for level, keys in self.contexts.items():
+            arrays["contexts_%d" % level] = keys
+        for order in self.keys:
+            arrays["keys_%d" % order] = self.keys[order]
+            arrays["counts_%d" % order] = self.counts[order]
+            arrays["totals_%d" % order] = self.totals[order]
+        return arrays
+
+    def saveBundle(self, path):
+        """
+        Saves store as binary bundle to be opened through mmap
+        """
+        arrays = self.arrays()
+        descriptors = dict()
+        offset = 0
+        for name, a in arrays.items():
+            offset = (offset + BUNDLE_ALIGN - 1) // BUNDLE_ALIGN * BUNDLE_ALIGN
+            descriptors[name] = {"dtype":a.dtype.str, "shape":list(a.shape), "offset":offset}
+            offset += a.nbytes
+        header = json.dumps({"order":self.order, "vocabulary_len":self.vocabulary_len, 
+                             "unk_label":self.unk_label, "ngrams_kwargs":self.ngrams_kwargs,
+                             "arrays":descriptors}).encode("utf-8")
+        # the arrays offsets are relative to the aligned end of header
+        data_start = (len(BUNDLE_MAGIC) + 4 + len(header) + BUNDLE_ALIGN - 1) // BUNDLE_ALIGN * BUNDLE_ALIGN
+        with open(path, "wb") as f:
+            f.write(BUNDLE_MAGIC)
+            f.write(struct.pack("<I", len(header)))
+            f.write(header)
+            for name, a in arrays.items():
+                f.write(b"\0" * (data_start + descriptors[name]["offset"] - f.tell()))
+                f.write(np.ascontiguousarray(a).tobytes())
+
+    @classmethod
+    def openBundle(cls, path):
+        """
+        Opens binary bundle through mmap, the arrays are read from disk only when accessed
+        """
+        with open(path, "rb") as f:
+            bundle = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        if bundle[:len(BUNDLE_MAGIC)] != BUNDLE_MAGIC:
+            raise Exception("Not a n-gram store bundle file: " + path)
+        header_len = struct.unpack("<I", bundle[len(BUNDLE_MAGIC):len(BUNDLE_MAGIC) + 4])[0]
+        header_end = len(BUNDLE_MAGIC) + 4 + header_len
+        header = json.loads(bundle[len(BUNDLE_MAGIC) + 4:header_end].decode("utf-8"))
+        data_start = (header_end + BUNDLE_ALIGN - 1) // BUNDLE_ALIGN * BUNDLE_ALIGN
+        arrays = dict()
+        for name, d in header["arrays"].items():
+            count = int(np.prod(d["shape"]))
+            arrays[name] = np.frombuffer(bundle, dtype = np.dtype(d["dtype"]), count = count,
+                                         offset = data_start + d["offset"]).reshape(d["shape"])
+        order = header["order"]
+        store = cls(order, WordBlob(arrays["words_blob"], arrays["words_offsets"]),
+                    arrays["in_vocabulary"].view(bool), header["vocabulary_len"], arrays["unigrams"],
+                    {l:arrays["contexts_%d" % l] for l in range(1, order)},
+                    {o:arrays["keys_%d" % o] for o in range(2, order + 1)},
+                    {o:arrays["counts_%d" % o] for o in range(2, order + 1)},
+                    {o:arrays["totals_%d" % o] for o in range(2, order + 1)},
+                    header["unk_label"], header["ngrams_kwargs"])
+        store.bundle = bundle
+        return store
+
+def openStore(path):
+    """
+    Opens n-gram store from the binary bundle or from the uncompressed Numpy archive (.npz)
+    """
+    if path.endswith(".npz"):
+        return NgramStore.load(path)
+    return NgramStore.openBundle(path)
+
+def fromCounter(counter, reverse = False):
+    """
+    Builds compact store from nltk_ngram.NgramCounter
+    Arguments:
+        counter: the trained NgramCounter
+        reverse: the flag to indicate whether to build store of reversed n-grams (the right
+                 context index) of counter trained as bidirectional
+    Return:
+        the NgramStore with the same counts
+    """
+    orders = range(2, counter.order + 1)
+    ngrams, ngrams_kwargs = counter.ngrams, dict(counter.ngrams_kwargs)
+    if reverse:
+        if counter.reverse_ngrams is None:
+            raise Exception("The counter was trained without reversed n-grams")
+        ngrams, ngrams_kwargs = counter.reverse_ngrams, reversedKwargs(ngrams_kwargs)
+    words = set(w for w in counter.vocabulary if w in counter.vocabulary)
+    words.update(counter.unigrams.keys())
+    words.add(counter.unk_label)
+    for order in orders:
+        for context, freq_dist in ngrams[order].items():
+            words.update(context)
+            words.update(freq_dist.keys())
+    words = sorted(words)
+    ids = {w:i for i, w in enumerate(words)}
+    in_vocabulary = np.array([w in counter.vocabulary for w in words], dtype = bool)
+    unigrams = np.zeros(len(words), dtype = np.uint32)
+    for w, c in counter.unigrams.items():
+        unigrams[ids[w]] = c
+
+    # collect all contexts with their prefixes per context length
+    prefixes = {level:set() for level in range(1, counter.order)}
+    for order in orders:
+        for context in ngrams[order].keys():
+            context_ids = tuple(ids[w] for w in context)
+            for level in range(1, len(context_ids) + 1):
+                prefixes[level].add(context_ids[:level])
+
+    # build trie levels, the node id is the rank of its key within level
+    contexts = dict()
+    nodes = {(): 0}
+    for level in range(1, counter.order):
+        items = list(prefixes[level])
+        level_keys = packKeys([nodes[t[:-1]] for t in items], [t[-1] for t in items])
+        order_index = np.argsort(level_keys)
+        contexts[level] = level_keys[order_index]
+        for rank, i in enumerate(order_index):
+            nodes[items[i]] = rank
+
+    keys, counts, totals = dict(), dict(), dict()
+    for order in orders:
+        n_nodes = len(contexts[order - 1])
+        node_list, word_list, count_list = list(), list(), list()
+        totals[order] = np.zeros(n_nodes, dtype = np.uint64)
+        for context, freq_dist in ngrams[order].items():
+            node = nodes[tuple(ids[w] for w in context)]
+            # the total can include words not counted by the targeted counter
+            totals[order][node] = freq_dist.N()
+            for w, c in freq_dist.items():
+                node_list.append(node)
+                word_list.append(ids[w])
+                count_list.append(c)
+        order_keys = packKeys(node_list, word_list)
+        order_index = np.argsort(order_keys)
+        keys[order] = order_keys[order_index]
+        counts[order] = np.array(count_list, dtype = np.uint32)[order_index]
+
+    return NgramStore(counter.order, words, in_vocabulary, len(counter.vocabulary), unigrams,
+                      contexts, keys, counts, totals, counter.unk_label, ngrams_kwargs)
+
+def nodeIds(store, level, nodes):
+    """
+    Restores the word ids of context trie nodes as matrix [nodes x level]
+    """
+    columns = list()
+    for l in range(level, 0, -1):
+        keys = store.contexts[l][nodes]
+        columns.append((keys & np.uint64(WORD_MASK)).astype(np.int64))
+        nodes = (keys >> np.uint64(WORD_BITS)).astype(np.int64)
+    return np.column_stack(columns[::-1]) if len(columns) > 0 else np.zeros((len(nodes), 0), dtype = np.int64)
+
+def __narrowCounts(counts):
+    """
+    Converts float counts into uint32 if they fit, uint64 otherwise
+    """
+    counts = counts.astype(np.uint64)
+    if counts.max(initial = 0) <= np.iinfo(np.uint32).max:
+        counts = counts.astype(np.uint32)
+    return counts
+
+def countIds(sentences, vocabulary, order, weights = None, targets = None, unk_label = "<UNK>", **ngrams_kwargs):
+    """
+    Counts n-grams of sentences over word ids of frozen vocabulary into compact store.
+    The words are mapped to ids with single dictionary lookup, so there is no per token
+    cutoff check, and n-grams of all orders are counted as slices of one windows matrix.
+    The counts are the same as of nltk_ngram.NgramCounter trained on the same sentences.
+    If target words provided, only n-grams ending with them are kept along with the totals
+    of their contexts, the same as nltk_ngram.ArticleNgramCounter counts.
+    Arguments:
+        sentences: the iterable of sentences (lists of words)
+        vocabulary: the nltk_ngram.FrozenVocabulary
+        order: the highest order of n-grams
+        weights: the integer weight (frequency) of each sentence [optional]
+        targets: the list of words to keep n-grams ending with [optional], if None all
+                 n-grams are kept
+        unk_label: the label of unknown words
+        ngrams_kwargs: the padding options of n-grams, the same as of NgramCounter
+    Return:
+        the NgramStore with counts
+    """
+    windows = idWindows(sentences, vocabulary, order, weights, unk_label, ngrams_kwargs)
+    return __storeFromWindows(windows, targets)
+
+def countBidirectional(sentences, vocabulary, order, weights = None, targets = None, unk_label = "<UNK>",
+                       **ngrams_kwargs):
+    """
+    Counts n-grams of sentences and the reversed n-grams in the same pass, where the reversed
+    store is the right context index: the words are counted following their right context
+    words ordered from the farthest to the nearest one, as if the sentences were reversed.
+    Arguments:
+        the same as of countIds
+    Return:
+        the tuple with NgramStore of n-grams and NgramStore of reversed n-grams
+    """
+    windows = idWindows(sentences, vocabulary, order, weights, unk_label, ngrams_kwargs)
+    return (__storeFromWindows(windows, targets), __storeFromWindows(windows, targets, reverse = True))
+
+def reversedKwargs(ngrams_kwargs):
+    """
+    Returns the padding options of n-grams of reversed sentences
+    """
+    swap = {"pad_left":"pad_right", "pad_right":"pad_left",
+            "left_pad_symbol":"right_pad_symbol", "right_pad_symbol":"left_pad_symbol"}
+    return {swap.get(k, k):v for k, v in ngrams_kwargs.items()}
+
+def idWindows(sentences, vocabulary, order, weights, unk_label, ngrams_kwargs):
+    """
+    Maps sentences to word ids and collects n-gram windows
+    Arguments:
+        the same as of countIds, where ngrams_kwargs is the dictionary of padding options
+    Return:
+        the tuple with vocabulary with padding symbols, padding options, order, unknown label,
+        the padded tokens with their weights and the n-gram windows matrix with their weights
+    """
+    import nltk_ngram as nn
+
+    # the counter resolves padding options and adds padding symbols to vocabulary
+    counter = nn.NgramCounter(order, vocabulary, unk_label = unk_label, **ngrams_kwargs)
+    vocabulary, ngrams_kwargs = counter.vocabulary, counter.ngrams_kwargs
+    if len(vocabulary) <= 1:
+        raise nn.EmptyVocabularyError("Cannot start counting ngrams until "
+                                      "vocabulary contains more than one item.")
+    left = [vocabulary.lookup(ngrams_kwargs["left_pad_symbol"])] * (order - 1) if ngrams_kwargs["pad_left"] else []
+    right = [vocabulary.lookup(ngrams_kwargs["right_pad_symbol"])] * (order - 1) if ngrams_kwargs["pad_right"] else []
+    if weights is None:
+        weights = repeat(1)
+
+    lookup = vocabulary.word2id.get
+    unk_id = vocabulary.unk_id
+    tokens, starts, token_weights, window_weights = list(), list(), list(), list()
+    for sent, weight in zip(sentences, weights):
+        padded = left + [lookup(w, unk_id) for w in sent] + right
+        n_windows = len(padded) - order + 1
+        if n_windows <= 0:
+            continue
+        starts.extend(range(len(tokens), len(tokens) + n_windows))
+        tokens.extend(padded)
+        token_weights.append((weight, len(padded)))
+        window_weights.append((weight, n_windows))
+
+    tokens = np.array(tokens, dtype = np.int64)
+    windows = tokens[np.array(starts, dtype = np.int64)[:, None] + np.arange(order)]
+    token_weights = np.repeat(np.array([w for w, _ in token_weights], dtype = np.float64),
+                              np.array([n for _, n in token_weights], dtype = np.int64))
+    window_weights = np.repeat(np.array([w for w, _ in window_weights], dtype = np.float64),
+                               np.array([n for _, n in window_weights], dtype = np.int64))
+    return (vocabulary, ngrams_kwargs, order, unk_label, tokens, token_weights, windows, window_weights)
+
+def __storeFromWindows(windows, targets = None, reverse = False):
+    """
+    Builds store from n-gram windows collected by idWindows
+    Arguments:
+        windows: the tuple returned by idWindows
+        targets: the list of words to keep n-grams ending with [optional]
+        reverse: the flag to indicate whether to count reversed n-grams
+    Return:
+        the NgramStore
+    """
+    vocabulary, ngrams_kwargs, order, unk_label, tokens, token_weights, windows, window_weights = windows
+    words = vocabulary.words
+    if reverse:
+        windows = windows[:, ::-1]
+        ngrams_kwargs = reversedKwargs(ngrams_kwargs)
+    unigrams = __narrowCounts(np.bincount(tokens, weights = token_weights, minlength = len(words)))
+    all_windows, all_weights = windows, window_weights
+    if targets is not None:
+        target_ids = [vocabulary.lookup(w) for w in targets if w in vocabulary]
+        is_target = np.isin(windows[:, -1], target_ids)
+        windows, window_weights = windows[is_target], window_weights[is_target]
+
+    # build trie levels, nodes[s] are the node ids of contexts started at column s
+    contexts = dict()
+    nodes = [np.zeros(len(windows), dtype = np.int64) for _ in range(order)]
+    for level in range(1, order):
+        level_keys = [packKeys(nodes[s], windows[:, s + level - 1]) for s in range(order - level)]
+        contexts[level] = np.unique(np.concatenate(level_keys)) if len(level_keys) > 0 else np.zeros(0, dtype = np.uint64)
+        for s, k in enumerate(level_keys):
+            nodes[s] = np.searchsorted(contexts[level], k)
+
+    keys, counts, totals = dict(), dict(), dict()
+    for n in range(2, order + 1):
+        context_nodes = nodes[order - n]
+        keys[n], inverse = np.unique(packKeys(context_nodes, windows[:, -1]), return_inverse = True)
+        counts[n] = __narrowCounts(np.bincount(inverse.ravel(), weights = window_weights, minlength = len(keys[n])))
+        if targets is not None:
+            # the totals of kept contexts are counted over all n-grams
+            context_nodes = np.zeros(len(all_windows), dtype = np.int64)
+            for level, column in enumerate(range(order - n, order - 1), 1):
+                context_nodes = findKeys(contexts[level], context_nodes, all_windows[:, column])
+            found = context_nodes >= 0
+            totals[n] = np.bincount(context_nodes[found], weights = all_weights[found],
+                                    minlength = len(contexts[n - 1])).astype(np.uint64)
+            # the nodes which are only prefixes of longer contexts have no kept n-grams of this order
+            has_targets = np.bincount(nodes[order - n], minlength = len(contexts[n - 1])) > 0
+            totals[n][has_targets == False] = 0
+            continue
+        totals[n] = np.bincount(context_nodes, weights = window_weights,
+                                minlength = len(contexts[n - 1])).astype(np.uint64)
+
+    return NgramStore(order, list(words), np.array(vocabulary.in_vocabulary(), dtype = bool), len(vocabulary),
+                      unigrams, contexts, keys, counts, totals, unk_label, dict(ngrams_kwargs))
+
+def deepSizeOf(obj):
+    """
+    Calculates the size in bytes of object with all objects referenced by it
+    """
+    seen = set()
+    size = 0
+    stack = [obj]
+    while len(stack) > 0:
+        o = stack.pop()
+        if id(o) in seen:
+            continue
+        seen.add(id(o))
+        size += sys.getsizeof(o)
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            stack.extend(o)
+        if hasattr(o, "__dict__"):
+            stack.append(o.__dict__)
+    return size
+
+def memoryReport(counter, store):
+    """
+    Prints memory used by the NgramCounter and by the compact store
+    Return:
+        the dictionary with memory and serialized sizes in bytes
+    """
+    report = {"counter_memory":deepSizeOf(counter), "store_memory":store.nbytes(),
+              "counter_pickle":len(pickle.dumps(counter, protocol = pickle.HIGHEST_PROTOCOL)),
+              "store_pickle":len(pickle.dumps(store, protocol = pickle.HIGHEST_PROTOCOL))}
+    n_ngrams = max(store.n_ngrams(), 1)
+    print("n-grams: %d, words: %d" % (store.n_ngrams(), len(store.words)))
+    print("NgramCounter: memory = %.1f MB (%.1f bytes per n-gram), pickle = %.1f MB"
+          % (report["counter_memory"] / 2**20, report["counter_memory"] / n_ngrams, report["counter_pickle"] / 2**20))
+    print("NgramStore: memory = %.1f MB (%.1f bytes per n-gram), pickle = %.1f MB, memory ratio = %.1fx"
+          % (report["store_memory"] / 2**20, report["store_memory"] / n_ngrams, report["store_pickle"] / 2**20,
+             report["counter_memory"] / max(report["store_memory"], 1)))
+    return report
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='The converter of pickled n-gram counter into compact store')
+    parser.add_argument('--model_file', default=config.ngram_model_path,
+                        help='the path to the pickled n-gram counter')
+    parser.add_argument('--out_file', default=None,
+                        help='the path to save compact n-gram store, saved as uncompressed Numpy archive if ends with .npz '
+                             'or as binary bundle to be opened through mmap otherwise')
+    parser.add_argument('--reverse', action='store_true',
+                        help='if set then the reversed n-grams of bidirectional counter are saved (the right context '
+                             'index used by ngram_res.py --right_model_file)')
+    args = parser.parse_args()
+    if args.out_file == None:
+        args.out_file = config.ngram_reversed_bundle_path if args.reverse else config.ngram_bundle_path
+
+    # the counter pickled by earlier nltk_ngram.py script refers classes as members of __main__ module
+    from nltk_ngram import NgramModelVocabulary, FrozenVocabulary, NgramCounter
+
+    start = time.time()
+    with open(args.model_file, 'rb') as f:
+        counter = pickle.load(f)
+    print("Counter unpickled in %.2f s" % (time.time() - start))
+
+    start = time.time()
+    store = fromCounter(counter, reverse = args.reverse)
+    print("Store built in %.2f s" % (time.time() - start))
+    memoryReport(counter, store)
+    if args.out_file.endswith(".npz"):
+        store.save(args.out_file)
+    else:
+        store.saveBundle(args.out_file)
+    print("Store saved to: %s (%.1f MB)" % (args.out_file, os.path.getsize(args.out_file) / 2**20))
+
+    start = time.time()
+    store = openStore(args.out_file)
+    open_time = time.time() - start
+    ngrams = counter.reverse_ngrams if args.reverse else counter.ngrams
+    context = next(iter(ngrams[counter.order].keys()))
+    start = time.time()
+    store.ngrams[counter.order][context].freq(counter.unk_label)
+    print("Store opened in %.2f ms, first query in %.2f ms" % (open_time * 1000, (time.time() - start) * 1000))
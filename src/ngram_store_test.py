@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The test cases for compact n-gram counts store
+
+@author: yaric
+"""
+import pickle
+import tempfile
+import unittest
+
+import numpy as np
+
+import ngram_store as ns
+import nltk_ngram as nn
+from ngram_test_corpora import randomCorpora
+
+class TestNgramStoreMethods(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.corpora = randomCorpora(30, 300, 8)
+        words = [w for s in cls.corpora for w in s]
+        # the cutoff 2 makes rare words unknown
+        cls.counter = nn.count_ngrams(4, nn.build_vocabulary(2, words), cls.corpora)
+        cls.store = ns.fromCounter(cls.counter)
+
+    def assertSameCounts(self, store):
+        for order in range(2, self.counter.order + 1):
+            for context, freq_dist in self.counter.ngrams[order].items():
+                counts = store.ngrams[order][context]
+                self.assertEqual(counts.N(), freq_dist.N(), "Wrong context total: %s" % (context,))
+                self.assertEqual(counts.B(), freq_dist.B(), "Wrong number of words: %s" % (context,))
+                for w in freq_dist:
+                    self.assertEqual(counts[w], freq_dist[w], "Wrong count: %s %s" % (context, w))
+                    self.assertAlmostEqual(counts.freq(w), freq_dist.freq(w), 12, "Wrong frequency")
+
+    def test_counts(self):
+        self.assertSameCounts(self.store)
+        self.assertEqual(self.store.n_ngrams(), sum(len(fd) for o in range(2, 5)
+                                                    for fd in self.counter.ngrams[o].values()))
+
+    def test_unknown(self):
+        self.assertEqual(self.store.ngrams[3][("no", "such")].freq("the"), 0, "Unknown context")
+        self.assertEqual(self.store.ngrams[2][("the",)]["no such word"], 0, "Unknown word")
+        self.assertEqual(self.store.ngrams[3][("the",)].N(), 0, "Context length should match order")
+
+    def test_unigrams_and_vocabulary(self):
+        for w, c in self.counter.unigrams.items():
+            self.assertEqual(self.store.unigrams[w], c, "Wrong unigram count: " + w)
+        self.assertEqual(len(self.store.vocabulary), len(self.counter.vocabulary), "Wrong vocabulary size")
+        for w in self.counter.vocabulary:
+            self.assertEqual(self.store.check_against_vocab(w), self.counter.check_against_vocab(w))
+
+    def test_lidstone_model(self):
+        model = nn.LidstoneNgramModel(0.1, self.counter)
+        store_model = nn.LidstoneNgramModel(0.1, self.store)
+        for context in list(self.counter.ngrams[4].keys())[:20]:
+            for w in ["a", "an", "the"]:
+                self.assertAlmostEqual(store_model.score(w, context), model.score(w, context), 12)
+        self.assertAlmostEqual(store_model.perplexity(self.corpora[0]), model.perplexity(self.corpora[0]), 8)
+
+    def test_memory(self):
+        self.assertLess(self.store.nbytes(), ns.deepSizeOf(self.counter), "Store should be more compact")
+
+    def test_save_load(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        path = temp_dir.name + "/ngram_store_test.npz"
+        self.store.save(path)
+        self.assertSameCounts(ns.NgramStore.load(path))
+
+    def test_pickled_counter(self):
+        counter = pickle.loads(pickle.dumps(self.counter))
+        self.assertEqual(counter.vocabulary.cutoff, 2, "Vocabulary cutoff should be pickled")
+        self.assertEqual(len(counter.vocabulary), len(self.counter.vocabulary), "Wrong vocabulary size")
+
+        # the counter pickled before vocabulary cutoff was preserved
+        state = dict(self.counter.__dict__)
+        state["vocabulary"] = nn.NgramModelVocabulary(dict(self.counter.vocabulary))
+        legacy = nn.NgramCounter.__new__(nn.NgramCounter)
+        legacy.__setstate__(state)
+        self.assertEqual(legacy.vocabulary.cutoff, 1, "Default cutoff should be restored")
+        self.assertSameCounts(ns.fromCounter(legacy))
+
+    def test_frozen_vocabulary(self):
+        vocabulary = self.counter.vocabulary
+        frozen = vocabulary.freeze()
+        self.assertEqual(len(frozen), len(vocabulary), "Wrong vocabulary size")
+        for w in list(vocabulary.keys()) + ["<UNK>", "no such word"]:
+            self.assertEqual(w in frozen, w in vocabulary, "Wrong membership: " + w)
+            self.assertEqual(frozen.words[frozen.lookup(w)], w if w in frozen else "<UNK>", "Wrong id: " + w)
+
+        counter = nn.count_ngrams(4, nn.build_vocabulary(2, [w for s in self.corpora for w in s]).freeze(), self.corpora)
+        self.assertIsInstance(counter.vocabulary, nn.FrozenVocabulary)
+        self.assertEqual(len(counter.vocabulary), len(self.counter.vocabulary), "Padding symbols should be added")
+        self.assertSameCounts(ns.fromCounter(counter))
+        with self.assertRaises(ValueError):
+            nn.NgramCounter(4, frozen, unk_cutoff = 3)
+
+    def test_count_ids(self):
+        store = ns.countIds(self.corpora, self.counter.vocabulary.freeze(), 4)
+        self.assertSameCounts(store)
+        self.assertEqual(store.words, self.store.words, "Wrong vocabulary")
+        self.assertTrue(np.array_equal(store.unigram_counts, self.store.unigram_counts), "Wrong unigrams")
+        for n in range(2, 5):
+            self.assertTrue(np.array_equal(store.keys[n], self.store.keys[n]), "Wrong keys of order %d" % n)
+            self.assertTrue(np.array_equal(store.totals[n], self.store.totals[n]), "Wrong totals of order %d" % n)
+
+        weighted = ns.countIds(self.corpora[:2], self.counter.vocabulary.freeze(), 4, weights = [3, 1])
+        counter = nn.NgramCounter(4, self.counter.vocabulary)
+        counter.train_counts(self.corpora[:2], [3, 1])
+        self.assertTrue(np.array_equal(weighted.counts[4], ns.fromCounter(counter).counts[4]), "Wrong weighted counts")
+
+    def test_article_counter(self):
+        articles = ["a", "an", "the"]
+        counter = nn.ArticleNgramCounter(4, self.counter.vocabulary, articles)
+        counter.train_counts(self.corpora)
+        with self.assertRaises(ValueError):
+            counter.train_counts(iter(self.corpora))
+
+        for order in range(2, 5):
+            for context, freq_dist in self.counter.ngrams[order].items():
+                if any(freq_dist[w] > 0 for w in articles):
+                    for w in articles:
+                        self.assertEqual(counter.ngrams[order][context].freq(w), freq_dist.freq(w),
+                                         "Wrong frequency: %s %s" % (context, w))
+                else:
+                    self.assertNotIn(context, counter.ngrams[order], "Context without articles should not be counted")
+
+        unpickled = pickle.loads(pickle.dumps(counter))
+        context = next(iter(counter.ngrams[4]))
+        self.assertEqual(unpickled.ngrams[4][context].N(), counter.ngrams[4][context].N(), "Marginal should be pickled")
+        self.assertLess(ns.deepSizeOf(counter), ns.deepSizeOf(self.counter) / 2, "Targeted counter should be smaller")
+
+        # the same store is counted over word ids
+        store = ns.countIds(self.corpora, self.counter.vocabulary.freeze(), 4, targets = articles)
+        expected = ns.fromCounter(counter)
+        for n in range(2, 5):
+            self.assertTrue(np.array_equal(store.keys[n], expected.keys[n]), "Wrong keys of order %d" % n)
+            self.assertTrue(np.array_equal(store.totals[n], expected.totals[n]), "Wrong totals of order %d" % n)
+
+    def test_bidirectional(self):
+        counter = nn.NgramCounter(4, self.counter.vocabulary, bidirectional = True)
+        counter.train_counts(self.corpora)
+        forward, reverse = ns.countBidirectional(self.corpora, self.counter.vocabulary.freeze(), 4)
+        self.assertSameCounts(forward)
+        with self.assertRaises(Exception):
+            ns.fromCounter(self.counter, reverse = True)
+
+        # the reversed n-grams are the n-grams of reversed sentences with swapped padding
+        reversed_counter = nn.NgramCounter(4, self.counter.vocabulary, left_pad_symbol = "</s>", right_pad_symbol = "<s>")
+        reversed_counter.train_counts([s[::-1] for s in self.corpora])
+        expected = ns.fromCounter(reversed_counter)
+        for store in [ns.fromCounter(counter, reverse = True), reverse]:
+            self.assertEqual(store.ngrams_kwargs, expected.ngrams_kwargs, "Padding should be swapped")
+            for n in range(2, 5):
+                self.assertTrue(np.array_equal(store.keys[n], expected.keys[n]), "Wrong keys of order %d" % n)
+                self.assertTrue(np.array_equal(store.counts[n], expected.counts[n]), "Wrong counts of order %d" % n)
+                self.assertTrue(np.array_equal(store.totals[n], expected.totals[n]), "Wrong totals of order %d" % n)
+
+        articles = ["a", "an", "the"]
+        targeted = nn.ArticleNgramCounter(4, self.counter.vocabulary, articles, bidirectional = True)
+        targeted.train_counts(self.corpora)
+        _, reverse = ns.countBidirectional(self.corpora, self.counter.vocabulary.freeze(), 4, targets = articles)
+        self.assertTrue(np.array_equal(ns.fromCounter(targeted, reverse = True).keys[4], reverse.keys[4]),
+                        "Wrong targeted reversed keys")
+
+    def test_bundle(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        path = temp_dir.name + "/ngram_store_test.bin"
+        self.store.saveBundle(path)
+        bundle = ns.openStore(path)
+        self.assertIsInstance(bundle.words, ns.WordBlob, "Vocabulary should be read from blob")
+        self.assertEqual(list(bundle.words), self.store.words, "Wrong vocabulary")
+        for w in self.store.words:
+            self.assertEqual(bundle.wordId(w), self.store.wordId(w), "Wrong word id: " + w)
+        self.assertEqual(bundle.wordId("no such word"), -1, "Unknown word found")
+        self.assertSameCounts(bundle)
+
+if __name__ == '__main__':
+    unittest.main()
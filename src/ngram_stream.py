@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The streaming n-gram trainer for the n-grams texts corpus (ngrams.txt), which is JSON
+object with n-gram text as key and its frequency as value. The file is parsed
+incrementally, the vocabulary is built in the first streaming pass and n-grams are
+counted in the second one over word ids of frozen vocabulary, where the frequency of each n-gram text is used as its
+weight. The counts are collected by chunks of n-gram texts and merged into the compact
+n-gram store, so the memory stays bounded by the model rather than by the raw text.
+
+@author: yaric
+"""
+import json
+import time
+import argparse
+
+import ngram_store as ns
+import ngram_shards as sh
+import config
+
+# The whitespace characters allowed between JSON tokens
+JSON_WHITESPACE = " \t\n\r"
+
+def iterateNgramsFile(path, chunk_size = 1 << 20):
+    """
+    Iterates over items of JSON object with n-gram texts without loading whole file
+    Arguments:
+        path: the path to the n-grams texts file
+        chunk_size: the number of characters to read at once
+    Return:
+        the generator of tuples (list of words, weight)
+    """
+    decoder = json.JSONDecoder()
+    with open(path) as f:
+        buffer = ""
+        pos = 0
+        eof = False
+        started = False
+
+        def more():
+            nonlocal buffer, pos, eof
+            chunk = f.read(chunk_size)
+            eof = len(chunk) == 0
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            return eof == False
+
+        def skip(chars):
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos] in chars:
+                    pos += 1
+                if pos < len(buffer) or more() == False:
+                    return
+
+        def value(complete):
+            # parses next JSON value, reading more data while the value can be incomplete
+            nonlocal pos
+            while True:
+                try:
+                    result, end = decoder.raw_decode(buffer, pos)
+                    if complete(end) or eof:
+                        pos = end
+                        return result
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                more()
+
+        while True:
+            skip(JSON_WHITESPACE + ("," if started else ""))
+            if pos >= len(buffer):
+                raise Exception("Unexpected end of n-grams file: " + path)
+            if started == False:
+                if buffer[pos] != "{":
+                    raise Exception("The n-grams file should contain JSON object: " + path)
+                pos += 1
+                started = True
+                continue
+            if buffer[pos] == "}":
+                return
+
+            # the string is complete once its closing quote is parsed
+            key = value(lambda end: True)
+            skip(JSON_WHITESPACE)
+            if buffer[pos] != ":":
+                raise Exception("Malformed n-grams file at: %s" % buffer[pos:pos + 50])
+            pos += 1
+            skip(JSON_WHITESPACE)
+            # the number is complete only if followed by other character
+            weight = value(lambda end: end < len(buffer))
+            yield (key.split(), weight)
+
+class NgramsFileColumn(object):
+    """
+    The n-gram texts or their frequencies streamed from n-grams texts file, which can be
+    iterated several times (each iteration parses the file again)
+    """
+
+    def __init__(self, path, column):
+        """
+        Creates column
+        Arguments:
+            path: the path to the n-grams texts file
+            column: 0 for n-gram texts (lists of words), 1 for their frequencies
+        """
+        self.path = path
+        self.column = column
+
+    def __iter__(self):
+        return (item[self.column] for item in iterateNgramsFile(self.path))
+
+def buildVocabularyStreaming(path, cutoff = 1, weighted = True):
+    """
+    Builds vocabulary in one streaming pass over n-grams texts file
+    Arguments:
+        path: the path to the n-grams texts file
+        cutoff: the minimal count of word to be in vocabulary
+        weighted: the flag to indicate whether to count words with n-gram text frequency
+    Return:
+        the nltk_ngram.NgramModelVocabulary
+    """
+    import nltk_ngram as nn
+
+    vocabulary = nn.NgramModelVocabulary(cutoff)
+    for words, weight in iterateNgramsFile(path):
+        for w in words:
+            vocabulary[w] += weight if weighted else 1
+    return vocabulary
+
+def trainStreaming(path, order = 5, cutoff = 1, weighted = True, chunk_texts = 200000):
+    """
+    Trains n-gram counts with two streaming passes over n-grams texts file
+    Arguments:
+        path: the path to the n-grams texts file
+        order: the highest order of n-grams
+        cutoff: the minimal count of word to be in vocabulary
+        weighted: the flag to indicate whether to use frequency of n-gram text as its weight
+        chunk_texts: the number of n-gram texts to count before merging into the store
+    Return:
+        the NgramStore with counts
+    """
+    start = time.time()
+    vocabulary = buildVocabularyStreaming(path, cutoff, weighted).freeze()
+    print("Vocabulary of %d words built in %.2f s" % (len(vocabulary) - 1, time.time() - start))
+
+    start = time.time()
+    store = None
+    texts, weights = list(), list()
+    n_texts = 0
+
+    def flush():
+        nonlocal store, texts, weights
+        chunk = ns.countIds(texts, vocabulary, order, weights)
+        store = chunk if store is None else sh.mergeStores([store, chunk])
+        texts, weights = list(), list()
+
+    for words, weight in iterateNgramsFile(path):
+        texts.append(words)
+        weights.append(weight if weighted else 1)
+        n_texts += 1
+        if len(texts) >= chunk_texts:
+            flush()
+    if len(texts) > 0 or store is None:
+        flush()
+    print("Counted %d n-gram texts in %.2f s, store has %d n-grams" % (n_texts, time.time() - start, store.n_ngrams()))
+    return store
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='The streaming n-gram trainer from n-grams texts corpus')
+    parser.add_argument('--ngrams_file', default=config.data_dir + "/ngrams.txt",
+                        help='the path to the n-grams texts corpus')
+    parser.add_argument('--order', type=int, default=5,
+                        help='the highest order of n-grams')
+    parser.add_argument('--cutoff', type=int, default=1,
+                        help='the minimal count of word to be in vocabulary')
+    parser.add_argument('--unweighted', action='store_true',
+                        help='if set then each n-gram text counted once regardless of its frequency')
+    parser.add_argument('--chunk_texts', type=int, default=200000,
+                        help='the number of n-gram texts to count before merging into the store')
+    parser.add_argument('--out_file', default=config.ngram_bundle_path,
+                        help='the path to save n-gram store as binary bundle')
+    args = parser.parse_args()
+
+    store = trainStreaming(args.ngrams_file, order = args.order, cutoff = args.cutoff,
+                           weighted = args.unweighted == False, chunk_texts = args.chunk_texts)
+    store.saveBundle(args.out_file)
+    print("Store saved to: " + args.out_file)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The test cases for streaming n-gram trainer
+
+@author: yaric
+"""
+import json
+import tempfile
+import unittest
+
+import numpy as np
+
+import ngram_stream as st
+import ngram_store as ns
+import nltk_ngram as nn
+from ngram_test_corpora import randomCorpora
+
+class TestNgramStreamMethods(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        rnd = np.random.RandomState(123)
+        cls.ngrams = dict()
+        for sentence in randomCorpora(30, 1000, 6, extra_words = ["\"quoted\"", "café", "back\\slash"]):
+            cls.ngrams[" ".join(sentence)] = int(rnd.randint(1, 1000))
+            if len(cls.ngrams) == 300:
+                break
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        cls.path = cls.temp_dir.name + "/ngrams_stream_test.txt"
+        with open(cls.path, mode = 'w') as f:
+            json.dump(cls.ngrams, f, indent = 1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.temp_dir.cleanup()
+
+    def test_iterate_ngrams_file(self):
+        # small chunks split keys and numbers between reads
+        for chunk_size in [1, 7, 64, 1 << 20]:
+            items = list(st.iterateNgramsFile(self.path, chunk_size = chunk_size))
+            self.assertEqual(items, [(k.split(), v) for k, v in self.ngrams.items()],
+                             "Wrong items parsed with chunk size: %d" % chunk_size)
+
+    def test_vocabulary(self):
+        vocabulary = st.buildVocabularyStreaming(self.path)
+        for w in vocabulary:
+            self.assertEqual(vocabulary[w], sum(v * k.split().count(w) for k, v in self.ngrams.items()),
+                             "Wrong weighted word count: " + w)
+
+    def test_train_streaming(self):
+        store = st.trainStreaming(self.path, order = 4, chunk_texts = 70)
+        texts = [k.split() for k in self.ngrams]
+        weights = list(self.ngrams.values())
+        vocabulary = nn.NgramModelVocabulary(1)
+        for words, weight in zip(texts, weights):
+            for w in words:
+                vocabulary[w] += weight
+        counter = nn.NgramCounter(4, vocabulary)
+        counter.train_counts(texts, weights)
+        expected = ns.fromCounter(counter)
+        self.assertEqual(list(store.words), list(expected.words), "Wrong vocabulary")
+        for order in range(2, 5):
+            self.assertTrue(np.array_equal(store.keys[order], expected.keys[order]), "Wrong keys")
+            self.assertTrue(np.array_equal(store.counts[order], expected.counts[order]), "Wrong counts")
+        context = tuple(texts[0][:1])
+        self.assertEqual(store.ngrams[2][context].N(), counter.ngrams[2][context].N(), "Wrong weighted total")
+
+    def test_targeted_counting(self):
+        texts = st.NgramsFileColumn(self.path, 0)
+        weights = st.NgramsFileColumn(self.path, 1)
+        self.assertEqual(list(texts), [k.split() for k in self.ngrams], "Wrong texts column")
+        self.assertEqual(list(weights), list(self.ngrams.values()), "Wrong weights column")
+
+        # the article counter iterates the file columns twice
+        vocabulary = st.buildVocabularyStreaming(self.path).freeze()
+        counter = nn.ArticleNgramCounter(4, vocabulary)
+        counter.train_counts(texts, weights)
+        expected = ns.countIds([k.split() for k in self.ngrams], vocabulary, 4,
+                               weights = list(self.ngrams.values()), targets = ["a", "an", "the"])
+        store = ns.fromCounter(counter)
+        for order in range(2, 5):
+            self.assertTrue(np.array_equal(store.keys[order], expected.keys[order]), "Wrong keys")
+            self.assertTrue(np.array_equal(store.counts[order], expected.counts[order]), "Wrong counts")
+            self.assertTrue(np.array_equal(store.totals[order], expected.totals[order]), "Wrong totals")
+
+if __name__ == '__main__':
+    unittest.main()
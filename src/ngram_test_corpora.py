@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The random corpora shared by test cases of n-gram models
+
+@author: yaric
+"""
+import numpy as np
+
+ARTICLES = ["a", "an", "the"]
+
+def randomCorpora(n_words, n_sentences, max_length, article_repeat = 1, seed = 123, extra_words = []):
+    """
+    Generates the corpora of random sentences
+    Arguments:
+        n_words: the number of regular words named w0, w1, ...
+        n_sentences: the number of sentences
+        max_length: the upper bound (exclusive) of sentence length
+        article_repeat: the number of times the articles repeated in vocabulary to make them
+                        more frequent than regular words
+        seed: the seed of random generator
+        extra_words: the additional words of vocabulary
+    Return:
+        the list of sentences (lists of words)
+    """
+    rnd = np.random.RandomState(seed)
+    vocab_words = ["w%d" % i for i in range(n_words)] + ARTICLES * article_repeat + list(extra_words)
+    return [[vocab_words[i] for i in rnd.randint(0, len(vocab_words), size = rnd.randint(1, max_length))]
+            for _ in range(n_sentences)]
@@ -5,16 +5,12 @@ Created on Wed Mar 15 12:58:14 2017
 
 @author: yaric
 """
-import json
 from math import log
 import pickle
 
-from nltk import word_tokenize          
-from nltk.stem import WordNetLemmatizer
-
 from collections import Counter, defaultdict
 from copy import copy
-from itertools import chain
+from itertools import chain, repeat
 
 from nltk.util import ngrams
 from nltk.probability import FreqDist, ConditionalFreqDist
@@ -60,6 +56,65 @@ class NgramModelVocabulary(Counter):
     def __copy__(self):
         return self.__class__(self.cutoff, self)
 
+    def __reduce__(self):
+        """Counter pickles only the counts, the cutoff should be preserved as well."""
+        return (self.__class__, (self.cutoff, dict(self)))
+
+    def freeze(self, unk_label="<UNK>", extra_words=()):
+        """Creates immutable vocabulary with the cutoff already applied.
+        :param unk_label: the label of unknown words
+        :param extra_words: the words to add to vocabulary regardless of their counts
+        :rtype: FrozenVocabulary
+        """
+        members = [item for item, count in self.items() if count >= self.cutoff]
+        return FrozenVocabulary(chain(members, extra_words), self.cutoff, unk_label)
+
+
+class FrozenVocabulary(object):
+    """Immutable vocabulary with dense integer ids.
+    The words are filtered by cutoff once, so membership is a single dictionary lookup
+    and the size (accounting for unknowns the same way as NgramModelVocabulary) is
+    precomputed. The word id is the rank of word in sorted list of vocabulary words
+    together with the unknown label, the same as in ngram_store.NgramStore.
+    """
+
+    def __init__(self, words, cutoff, unk_label="<UNK>"):
+        members = set(words)
+        self.cutoff = cutoff
+        self.unk_label = unk_label
+        self.words = sorted(members | {unk_label})
+        self.word2id = {w: i for i, w in enumerate(self.words)}
+        self.unk_id = self.word2id[unk_label]
+        self.unk_is_member = unk_label in members
+        self._len = len(members) + 1
+
+    def __contains__(self, item):
+        return item in self.word2id and (item != self.unk_label or self.unk_is_member)
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return (w for w in self.words if w in self)
+
+    def __copy__(self):
+        return self
+
+    def lookup(self, word):
+        """Returns the id of word, the id of unknown label for words out of vocabulary."""
+        return self.word2id.get(word, self.unk_id)
+
+    def in_vocabulary(self):
+        """Returns the list of membership flags per word id."""
+        return [w in self for w in self.words]
+
+    def with_words(self, words, unk_label=None):
+        """Returns vocabulary extended with provided words (self if nothing changes)."""
+        unk_label = self.unk_label if unk_label is None else unk_label
+        if unk_label == self.unk_label and all(w in self for w in words):
+            return self
+        return FrozenVocabulary(chain(self, words), self.cutoff, unk_label)
+
 
 class EmptyVocabularyError(Exception):
     pass
@@ -68,9 +123,12 @@ class EmptyVocabularyError(Exception):
 class NgramCounter(object):
     """Class for counting ngrams"""
 
-    def __init__(self, order, vocabulary, unk_cutoff=None, unk_label="<UNK>", **ngrams_kwargs):
+    def __init__(self, order, vocabulary, unk_cutoff=None, unk_label="<UNK>", bidirectional=False, **ngrams_kwargs):
         """
         :type training_text: List[List[str]]
+        :param bidirectional: if set then the reversed ngrams are counted as well in reverse_ngrams,
+        where the word is counted following its right context ordered from the farthest word to
+        the nearest one, i.e. the same as ngrams of reversed sentences
         """
 
         if order < 1:
@@ -93,9 +151,21 @@ class NgramCounter(object):
         self._set_up_vocabulary(vocabulary, unk_cutoff)
 
         self.ngrams = defaultdict(ConditionalFreqDist)
+        self.reverse_ngrams = defaultdict(ConditionalFreqDist) if bidirectional else None
         self.unigrams = FreqDist()
 
     def _set_up_vocabulary(self, vocabulary, unk_cutoff):
+        # the frozen vocabulary checked by interface as it may be created by this module
+        # imported under other name, i.e. by ngram_stream when this module run as script
+        if hasattr(vocabulary, "with_words"):
+            if unk_cutoff is not None:
+                raise ValueError("The cutoff is already applied to frozen vocabulary")
+            pad_symbols = [self.ngrams_kwargs.get(symbol) for pad, symbol in
+                           [("pad_left", "left_pad_symbol"), ("pad_right", "right_pad_symbol")]
+                           if self.ngrams_kwargs[pad]]
+            self.vocabulary = vocabulary.with_words(pad_symbols, self.unk_label)
+            return
+
         self.vocabulary = copy(vocabulary)  # copy needed to prevent state sharing
         if unk_cutoff is not None:
             # If cutoff value is provided, override vocab's cutoff
@@ -109,17 +179,33 @@ class NgramCounter(object):
             rpad_sym = self.ngrams_kwargs.get("right_pad_symbol")
             self.vocabulary[rpad_sym] = self.vocabulary.cutoff
 
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # the counter pickled before reversed ngrams were introduced
+        self.__dict__.setdefault("reverse_ngrams", None)
+        if isinstance(self.vocabulary.cutoff, dict):
+            # the vocabulary pickled without cutoff, where the counts were restored as cutoff,
+            # the cutoff is set to the default value of vocabulary built by this script
+            self.vocabulary = NgramModelVocabulary(1, self.vocabulary.cutoff)
+
     def _enumerate_ngram_orders(self):
         return enumerate(range(self.order, 1, -1))
 
-    def train_counts(self, training_text):
+    def train_counts(self, training_text, weights=None):
+        """Counts ngrams of sentences in training text.
+        :param weights: the integer weight (frequency) of each sentence, all sentences
+        counted once if not provided
+        :type weights: Iterable[int]
+        """
         # Note here "1" indicates an empty vocabulary!
         # See NgramModelVocabulary __len__ method for more.
         if len(self.vocabulary) <= 1:
             raise EmptyVocabularyError("Cannot start counting ngrams until "
                                        "vocabulary contains more than one item.")
 
-        for sent in training_text:
+        if weights is None:
+            weights = repeat(1)
+        for sent, weight in zip(training_text, weights):
             checked_sent = (self.check_against_vocab(word) for word in sent)
             sent_start = True
             for ngram in self.to_ngrams(checked_sent):
@@ -127,14 +213,18 @@ class NgramCounter(object):
 
                 if sent_start:
                     for context_word in context:
-                        self.unigrams[context_word] += 1
+                        self.unigrams[context_word] += weight
                     sent_start = False
 
                 for trunc_index, ngram_order in self._enumerate_ngram_orders():
                     trunc_context = context[trunc_index:]
                     # note that above line doesn't affect context on first iteration
-                    self.ngrams[ngram_order][trunc_context][word] += 1
-                self.unigrams[word] += 1
+                    self.ngrams[ngram_order][trunc_context][word] += weight
+                if self.reverse_ngrams is not None:
+                    reverse_context, first_word = tuple(reversed(ngram[1:])), ngram[0]
+                    for trunc_index, ngram_order in self._enumerate_ngram_orders():
+                        self.reverse_ngrams[ngram_order][reverse_context[trunc_index:]][first_word] += weight
+                self.unigrams[word] += weight
 
     def check_against_vocab(self, word):
         if word in self.vocabulary:
@@ -148,6 +238,100 @@ class NgramCounter(object):
         """
         return ngrams(sequence, self.order, **self.ngrams_kwargs)
     
+class MarginalFreqDist(FreqDist):
+    """Frequency distribution of selected samples, where the total number of outcomes
+    (including the samples not stored) is counted separately as marginal."""
+
+    def __init__(self, samples=None, marginal=0):
+        FreqDist.__init__(self, samples)
+        self.marginal = marginal
+
+    def N(self):
+        return self.marginal
+
+    def __reduce__(self):
+        return (self.__class__, (dict(self), self.marginal))
+
+
+class MarginalConditionalFreqDist(ConditionalFreqDist):
+    """Conditional frequency distribution with MarginalFreqDist per condition."""
+
+    def __init__(self):
+        ConditionalFreqDist.__init__(self)
+        self.default_factory = MarginalFreqDist
+
+
+class ArticleNgramCounter(NgramCounter):
+    """Counts only ngrams ending with the target words (articles) with the total counts
+    of their contexts, which is all the article predictions need: the frequency of
+    target word in context keeps the same value as with NgramCounter.
+    The training text is iterated twice: the target ngrams are counted first and
+    the totals of their contexts second, so the other contexts are never stored.
+    """
+
+    def __init__(self, order, vocabulary, targets=("a", "an", "the"), **counter_kwargs):
+        super(ArticleNgramCounter, self).__init__(order, vocabulary, **counter_kwargs)
+        self.targets = frozenset(targets)
+        self.ngrams = defaultdict(MarginalConditionalFreqDist)
+        if self.reverse_ngrams is not None:
+            self.reverse_ngrams = defaultdict(MarginalConditionalFreqDist)
+
+    def train_counts(self, training_text, weights=None):
+        """Counts target ngrams of sentences in training text and their context totals.
+        :param training_text: the sentences, should be iterable twice
+        :param weights: the integer weight (frequency) of each sentence, should be
+        iterable twice, all sentences counted once if not provided
+        """
+        if iter(training_text) is training_text or (weights is not None and iter(weights) is weights):
+            raise ValueError("The training text is iterated twice and can not be an iterator")
+        if len(self.vocabulary) <= 1:
+            raise EmptyVocabularyError("Cannot start counting ngrams until "
+                                       "vocabulary contains more than one item.")
+
+        indexes = [(self.ngrams, False)]
+        if self.reverse_ngrams is not None:
+            indexes.append((self.reverse_ngrams, True))
+
+        for ngram, weight in self._windows(training_text, weights, self.unigrams):
+            for index, reverse in indexes:
+                context, word = self._split(ngram, reverse)
+                if word in self.targets:
+                    for trunc_index, ngram_order in self._enumerate_ngram_orders():
+                        index[ngram_order][context[trunc_index:]][word] += weight
+
+        for ngram, weight in self._windows(training_text, weights):
+            for index, reverse in indexes:
+                context, _ = self._split(ngram, reverse)
+                for trunc_index, ngram_order in self._enumerate_ngram_orders():
+                    order_ngrams = index[ngram_order]
+                    trunc_context = context[trunc_index:]
+                    if trunc_context in order_ngrams:
+                        order_ngrams[trunc_context].marginal += weight
+
+    @staticmethod
+    def _split(ngram, reverse):
+        """Splits ngram into context and word, the first word follows the reversed context if reverse."""
+        if reverse:
+            return tuple(reversed(ngram[1:])), ngram[0]
+        return tuple(ngram[:-1]), ngram[-1]
+
+    def _windows(self, training_text, weights, unigrams=None):
+        """Generates (ngram, weight) of ngrams in training text, counting unigrams if provided."""
+        if weights is None:
+            weights = repeat(1)
+        for sent, weight in zip(training_text, weights):
+            checked_sent = (self.check_against_vocab(word) for word in sent)
+            sent_start = True
+            for ngram in self.to_ngrams(checked_sent):
+                if unigrams is not None:
+                    if sent_start:
+                        for context_word in ngram[:-1]:
+                            unigrams[context_word] += weight
+                    unigrams[ngram[-1]] += weight
+                sent_start = False
+                yield (ngram, weight)
+
+
 NEG_INF = float("-inf")
 
 
@@ -271,24 +455,36 @@ class LaplaceNgramModel(LidstoneNgramModel):
         super(LaplaceNgramModel, self).__init__(1, *args)
     
 if __name__ == '__main__':
-
-    with open('../data/ngrams.txt') as f:
-        ngrams_txt = json.load(f)
-        
-    corpora = list()
-    words = list()
-    for key, value in ngrams_txt.items():
-        ws = key.split()
-        corpora.append(ws)
-        words.extend(ws)
-
-    print("Collected %d ngrams with %d words" % (len(corpora), len(words)))
-    #with open("../out/corpora.pkl", "wb") as f:
-    #    pickle.dump(corpora, f)
-
-    vocab = build_vocabulary(1, words)
+    import argparse
+    import ngram_stream
+    # the counter created with classes of imported module to be pickled with module qualified
+    # class names, which are loaded by other scripts without importing them into __main__
+    import nltk_ngram
+
+    parser = argparse.ArgumentParser(description='The n-gram counter trainer from n-grams texts corpus')
+    parser.add_argument('--targets', nargs='+', default=None,
+                        help='the target words (for example: a an the), if set then only n-grams ending '
+                             'with them are counted along with totals of their contexts')
+    parser.add_argument('--bidirectional', action='store_true',
+                        help='if set then the reversed n-grams are counted in the same pass for right context scoring')
+    parser.add_argument('--ngrams_file', default='../data/ngrams.txt',
+                        help='the n-grams texts corpus file with frequency of each n-gram text')
+    parser.add_argument('--out_file', default=config.ngram_model_path,
+                        help='the path to save pickled n-gram counter')
+    args = parser.parse_args()
+
+    # the n-grams texts are streamed from file: to build vocabulary and to count,
+    # the frequency of each n-gram text is used as its weight
+    ngrams_path = args.ngrams_file
+    vocab = ngram_stream.buildVocabularyStreaming(ngrams_path, 1).freeze()
     print("Vocabulary built")
-    counter = count_ngrams(5, vocab, corpora)
+    if args.targets is not None:
+        counter = nltk_ngram.ArticleNgramCounter(5, vocab, targets=args.targets, bidirectional=args.bidirectional)
+    else:
+        counter = nltk_ngram.NgramCounter(5, vocab, bidirectional=args.bidirectional)
+    counter.train_counts(ngram_stream.NgramsFileColumn(ngrams_path, 0),
+                         ngram_stream.NgramsFileColumn(ngrams_path, 1))
     print("Counter ready")
-    with open(config.ngram_model_path, "wb") as f:
+    with open(args.out_file, "wb") as f:
         pickle.dump(counter, f)
+    print("Counter saved to: " + args.out_file)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The test cases for n-gram counter training script run end to end over n-grams texts file
+along with the scripts consuming the trained counter
+
+@author: yaric
+"""
+import os
+import sys
+import json
+import pickle
+import tempfile
+import subprocess
+import unittest
+
+import numpy as np
+
+import ngram_stream as st
+import ngram_store as ns
+import nltk_ngram as nn
+import ngram_scoring as sc
+import ngram_res as nr
+from ngram_test_corpora import randomCorpora
+
+def runScript(script, *args):
+    """
+    Runs the script from the source directory in the fresh interpreter
+    Return:
+        the completed process with captured output
+    """
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    return subprocess.run([sys.executable, script] + list(args), cwd = src_dir,
+                          stdout = subprocess.PIPE, stderr = subprocess.PIPE, universal_newlines = True)
+
+class TestNgramCounterScript(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        rnd = np.random.RandomState(123)
+        cls.ngrams = dict()
+        for sentence in randomCorpora(20, 400, 6):
+            cls.ngrams[" ".join(sentence)] = int(rnd.randint(1, 100))
+            if len(cls.ngrams) == 150:
+                break
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        cls.ngrams_path = cls.temp_dir.name + "/ngrams.txt"
+        with open(cls.ngrams_path, mode = 'w') as f:
+            json.dump(cls.ngrams, f, indent = 1)
+        cls.expected = st.trainStreaming(cls.ngrams_path, order = 5)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.temp_dir.cleanup()
+
+    def assertScriptRun(self, script, *args):
+        proc = runScript(script, *args)
+        self.assertEqual(proc.returncode, 0, "Script %s failed:\n%s" % (script, proc.stderr))
+
+    def test_train_counter(self):
+        counter_path = self.temp_dir.name + "/counter.pkl"
+        store_path = self.temp_dir.name + "/counter_store.npz"
+        self.assertScriptRun("nltk_ngram.py", "--ngrams_file", self.ngrams_path, "--out_file", counter_path)
+        self.assertScriptRun("ngram_store.py", "--model_file", counter_path, "--out_file", store_path)
+
+        store = ns.NgramStore.load(store_path)
+        self.assertEqual(list(store.words), list(self.expected.words), "Wrong vocabulary")
+        for order in range(2, 6):
+            self.assertTrue(np.array_equal(store.keys[order], self.expected.keys[order]), "Wrong keys")
+            self.assertTrue(np.array_equal(store.counts[order], self.expected.counts[order]), "Wrong counts")
+
+    def test_train_targeted_counter(self):
+        counter_path = self.temp_dir.name + "/targeted_counter.pkl"
+        store_path = self.temp_dir.name + "/targeted_store.npz"
+        self.assertScriptRun("nltk_ngram.py", "--ngrams_file", self.ngrams_path, "--out_file", counter_path,
+                             "--targets", "a", "an", "the")
+
+        # the pickled counter refers classes of nltk_ngram module and loads anywhere
+        with open(counter_path, 'rb') as f:
+            counter = pickle.load(f)
+        self.assertIsInstance(counter, nn.ArticleNgramCounter, "Wrong counter class")
+        vocabulary = st.buildVocabularyStreaming(self.ngrams_path).freeze()
+        expected = ns.countIds([k.split() for k in self.ngrams], vocabulary, 5,
+                               weights = list(self.ngrams.values()), targets = ["a", "an", "the"])
+        store = ns.fromCounter(counter)
+        for order in range(2, 6):
+            self.assertTrue(np.array_equal(store.keys[order], expected.keys[order]), "Wrong keys")
+            self.assertTrue(np.array_equal(store.counts[order], expected.counts[order]), "Wrong counts")
+            self.assertTrue(np.array_equal(store.totals[order], expected.totals[order]), "Wrong totals")
+
+        # the same counter loaded by converter script
+        self.assertScriptRun("ngram_store.py", "--model_file", counter_path, "--out_file", store_path)
+        self.assertTrue(np.array_equal(ns.NgramStore.load(store_path).totals[5], expected.totals[5]),
+                        "Wrong totals of converted store")
+
+    def test_bidirectional_workflow(self):
+        counter_path = self.temp_dir.name + "/bidirectional_counter.pkl"
+        right_path = self.temp_dir.name + "/reversed_store.bin"
+        sentences_path = self.temp_dir.name + "/sentences.json"
+        results_path = self.temp_dir.name + "/results.json"
+        sentences = randomCorpora(20, 30, 12, seed = 7)
+        with open(sentences_path, mode = 'w') as f:
+            json.dump(sentences, f)
+
+        self.assertScriptRun("nltk_ngram.py", "--ngrams_file", self.ngrams_path, "--out_file", counter_path,
+                             "--bidirectional")
+        self.assertScriptRun("ngram_store.py", "--model_file", counter_path, "--out_file", right_path, "--reverse")
+        self.assertScriptRun("ngram_res.py", "--model_file", counter_path, "--test_sentences_file", sentences_path,
+                             "--out_file", results_path, "--bidirectional", "--right_model_file", right_path)
+
+        with open(counter_path, 'rb') as f:
+            counter = pickle.load(f)
+        with open(results_path) as f:
+            results = json.load(f)
+        expected = nr.buildPredictions(sentences, sc.buildModel("mle", counter),
+                                       sc.buildModel("mle", ns.fromCounter(counter, reverse = True)))
+        self.assertEqual(results, json.loads(json.dumps(expected)), "Wrong bidirectional predictions")
+        self.assertTrue(any(p != None for r in results for p in r), "No articles predicted")
+        left_only = nr.buildPredictions(sentences, sc.buildModel("mle", counter))
+        self.assertNotEqual(results, json.loads(json.dumps(left_only)), "Right context not used")
+
+if __name__ == '__main__':
+    unittest.main()
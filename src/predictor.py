@@ -9,15 +9,36 @@ to different predictors.
 import os
 import shutil
 import argparse
+import json
+import time
+import multiprocessing
 
 import numpy as np
-from sklearn.externals import joblib
-from sklearn.preprocessing import StandardScaler
 
-from random_forest_model import RandomForest
+from random_forest_model import RandomForest, PARAM_GRID, RANDOM_STATE
+from hist_gradient_boosting_model import HistGradientBoosting
+from sparse_linear_model import SparseLinear
+import flat_forest as ff
+import minibatch_trainer as mt
+import row_cache as rc
+import negative_sampling as ns
+import evaluate
 import config
 
-def predict(predictor_name, X_test, save_model = False, validate_model = True, save_labels = False):
+# The registry of predictors by name
+PREDICTORS = {"RandomForest":lambda: RandomForest(n_estimators = 1500),
+              "HistGradientBoosting":HistGradientBoosting,
+              "SparseLinear":SparseLinear}
+
+# The train corpora shared by search worker processes as memory-mapped arrays
+__search_corpora = None
+
+def predict(predictor_name, X_test, save_model = False, validate_model = True, save_labels = False,
+            anytime = False, anytime_chunk_trees = 50, anytime_delta = None,
+            warm_start = False, minibatch = False, batch_size = 10000,
+            train_features_paths = [config.train_features_path], 
+            train_labels_paths = [config.train_labels_path], row_cache = False,
+            neg_rate = None, neg_calibration = 'weights'):
     """
     Invoked to predict labels for provided test data features
     Arguments:
@@ -26,29 +47,95 @@ def predict(predictor_name, X_test, save_model = False, validate_model = True, s
         save_model: flag to indicate whether to save trained model
         validate_model: flag to indicate whether to run trained model against validation data
         save_labels: the flag to indicate whether to save predicted labels array
+        anytime: the flag to indicate whether to use early-exit forest inference which stops
+                 evaluating trees for a row once its decision can not be changed
+        anytime_chunk_trees: the number of trees to evaluate before checking the early-exit condition
+        anytime_delta: the allowed probability for early-exit decision to differ from full 
+                       evaluation [optional], if None row stops only when decision is exact
+        warm_start: the flag to indicate whether to grow the forest with warm start until 
+                    score plateaus. If saved model exists it will be grown with train data
+        minibatch: the flag to indicate whether to train with minibatches streamed from 
+                   memory-mapped train data files instead of loading train corpora in memory
+        batch_size: the number of rows in minibatch
+        train_features_paths: the list of train features shard files for minibatch training
+        train_labels_paths: the list of train labels shard files for minibatch training
+        row_cache: the flag to indicate whether to use persistent cache of predicted probabilities
+                   per features row keyed by the model checksum
+        neg_rate: the fraction of train rows with label 0 to keep for training [optional], all
+                  train rows used if None
+        neg_calibration: the correction of negative downsampling - 'weights' to train with 
+                         sample weights 1 / neg_rate for kept negative rows, or 'prior' to 
+                         recalibrate predicted probabilities to the original class prior
     Return:
         tuple with predicted labels and validation score
     """
+    if predictor_name not in PREDICTORS:
+        raise Exception("Unknown predictor name: " + predictor_name)
+    if (anytime or warm_start) and predictor_name != 'RandomForest':
+        raise Exception("Anytime inference and warm start supported only by RandomForest predictor")
+    if neg_rate != None and (warm_start or minibatch):
+        raise Exception("Negative downsampling not supported with warm start or minibatch training")
+    if neg_rate != None and neg_calibration not in ('weights', 'prior'):
+        raise Exception("Unknown negative downsampling calibration: " + neg_calibration)
+    if anytime and neg_rate != None and neg_calibration == 'prior':
+        raise Exception("Anytime inference not supported for model with prior recalibration")
+    predictor = PREDICTORS[predictor_name]()
+    
+    if minibatch:
+        return __predictMinibatch(predictor, X_test, save_model = save_model, validate_model = validate_model,
+                                  save_labels = save_labels, batch_size = batch_size,
+                                  train_features_paths = train_features_paths, 
+                                  train_labels_paths = train_labels_paths, row_cache = row_cache)
+    
     corpora = __loadTrainCorpora()
-    if predictor_name == 'RandomForest':
-        predictor = RandomForest(n_estimators = 1500)
+    if warm_start and os.path.exists(predictor.model_path):
+        # grow saved model, the saved scaler should be used for trees splits to stay valid
+        __loadPredictorModel(predictor)
+        X_scaler = predictor.X_scaler
+        X_train = X_scaler.transform(corpora["train"]["features"])
     else:
-        raise Exception("Unknown predictor name: " + predictor_name)
-        
-    # statndardize features
-    X_scaler = StandardScaler(with_mean = False)
-    X_train = X_scaler.fit_transform(corpora["train"]["features"])
+        predictor.model = None
+        # statndardize (or encode) features
+        X_scaler = predictor.createScaler()
+        X_train = X_scaler.fit_transform(corpora["train"]["features"])
     Y_train = corpora["train"]["labels"]
+    sample_weight = None
+    if neg_rate != None:
+        X_train, Y_train, sample_weight = ns.downsampleNegatives(X_train, Y_train, neg_rate)
+        if neg_calibration == 'prior':
+            sample_weight = None
     
     # train model
-    model = predictor.train(X_train, Y_train)
+    start = time.time()
+    if warm_start and predictor.model != None:
+        # the forest grown by up to n_estimators of fresh predictor over already trained trees
+        X_validate = X_scaler.transform(corpora["validate"]["features"])
+        model = predictor.trainWarmStart(X_train, Y_train, X_validate, corpora["validate"]["labels"],
+                                         model = predictor.model, grow_by = predictor.n_estimators)
+    elif warm_start:
+        model = predictor.trainWarmStart(X_train, Y_train)
+    else:
+        model = predictor.train(X_train, Y_train, sample_weight = sample_weight)
+    if neg_rate != None and neg_calibration == 'prior':
+        model = ns.PriorCorrectedModel(model, neg_rate)
+        predictor.model = model
+    predictor.negative_sampling = {"rate":neg_rate, "calibration":neg_calibration} if neg_rate != None else None
+    fit_time = time.time() - start
+    print("%s: fit time = %.2f s" % (predictor_name, fit_time))
     v_score = None    
     if validate_model:
-        v_score = __validate(corpora["validate"]["features"], corpora["validate"]["labels"], model, X_scaler)
-        print("validate score = %.3f" % (v_score))
+        v_score, t_score = __validate(corpora["validate"]["features"], corpora["validate"]["labels"], model, X_scaler)
+        print("validate score = %.3f, validate target score = %.2f %%" % (v_score, t_score * 100))
     
     # predict
-    labels = __predict(X_test, model, X_scaler)
+    start = time.time()
+    if anytime:
+        labels = __predictAnytime(X_test, model, X_scaler, chunk_trees = anytime_chunk_trees, 
+                                  delta = anytime_delta)
+    else:
+        cache = rc.RowProbabilityCache(rc.modelChecksum(model, X_scaler)) if row_cache else None
+        labels = __predict(X_test, model, X_scaler, cache)
+    print("%s: predict time = %.2f s for %d samples" % (predictor_name, time.time() - start, len(X_test)))
     if save_labels:
         np.save(config.test_labels_prob_path, labels)
         print("Predicted labels saved to: " + config.test_labels_prob_path)
@@ -59,6 +146,40 @@ def predict(predictor_name, X_test, save_model = False, validate_model = True, s
 
     return (labels, v_score)
     
+def __predictMinibatch(predictor, X_test, save_model, validate_model, save_labels, batch_size,
+                       train_features_paths, train_labels_paths, row_cache):
+    """
+    Trains predictor with minibatches streamed from memory-mapped train data files and
+    predicts labels for provided test data features
+    Return:
+        tuple with predicted labels and validation score
+    """
+    name = type(predictor).__name__
+    start = time.time()
+    # predictors without partial_fit support rejected by minibatch trainer
+    model, X_scaler = mt.trainMinibatches(predictor, train_features_paths, train_labels_paths, 
+                                          batch_size = batch_size, n_epochs = getattr(predictor, "n_epochs", 1))
+    print("%s: fit time = %.2f s" % (name, time.time() - start))
+    v_score = None
+    if validate_model:
+        v_score, t_score = mt.validate(model, X_scaler, [config.validate_features_path], 
+                                       [config.validate_labels_path], batch_size = batch_size)
+        print("validate score = %.3f, validate target score = %.2f %%" % (v_score, t_score * 100))
+    
+    start = time.time()
+    cache = rc.RowProbabilityCache(rc.modelChecksum(model, X_scaler)) if row_cache else None
+    labels = __predict(X_test, model, X_scaler, cache)
+    print("%s: predict time = %.2f s for %d samples" % (name, time.time() - start, len(X_test)))
+    if save_labels:
+        np.save(config.test_labels_prob_path, labels)
+        print("Predicted labels saved to: " + config.test_labels_prob_path)
+        
+    if save_model:
+        predictor.X_scaler = X_scaler
+        __savePredictorModel(predictor)
+
+    return (labels, v_score)
+
 def __validate(X_test, labels, model, X_scaler):
     """
     Run trained models against validation data
@@ -68,26 +189,58 @@ def __validate(X_test, labels, model, X_scaler):
         model: the prediction model
         X_scaler: the standard scaler to scale input features
     Return:
-         the mean accuracy on the given test data and labels
+         the tuple with mean accuracy and target score (recall level at 2% false positive rate)
+         on the given test data and labels
     """
     X_test = X_scaler.transform(X_test)
-    return model.score(X_test, labels)
+    t_score, _ = evaluate.targetScoreFromLabels(model.predict_proba(X_test), labels, model.classes_)
+    return (model.score(X_test, labels), t_score)
 
-def __predict(X_test, model, X_scaler):
+def __predict(X_test, model, X_scaler, cache = None):
     """
-    Do prediction for provided fetures
+    Do prediction for provided fetures. Only unique features rows are scored and 
+    probabilities scattered back to duplicate rows.
     Arguments:
         X_test: the test data [n_samples, n_features]
         model: the classification predictive model
         X_scaler: the standard scaler used to scale train features
+        cache: the persistent cache of probabilities per features row [optional]
     Return:
         predicted labels as array of shape = [n_samples, n_classes] with probabilities
         of each class
     """
-    X_test = X_scaler.transform(X_test)
-    labels = model.predict_proba(X_test)
+    predict_proba = lambda X: model.predict_proba(X_scaler.transform(X))
+    labels = rc.predictUnique(predict_proba, X_test, cache)
     return labels
 
+def __predictAnytime(X_test, model, X_scaler, chunk_trees = 50, delta = None):
+    """
+    Do prediction for provided features with early-exit evaluation of the forest trees.
+    The predicted class of the stopped row is the same as of full evaluation (if delta is None),
+    but its probability is the mean vote over k evaluated trees and may differ from full 
+    evaluation by up to (n_trees - k) / n_trees. As evaluate.targetScore ranks suggested 
+    corrections by this probability, the ranking of early stopped rows and hence the
+    target score may differ from full evaluation.
+    Arguments:
+        X_test: the test data [n_samples, n_features]
+        model: the trained random forest classifier
+        X_scaler: the standard scaler used to scale train features
+        chunk_trees: the number of trees to evaluate before checking the early-exit condition
+        delta: the allowed probability for decision to differ from full evaluation [optional]
+    Return:
+        predicted labels as array of shape = [n_samples, n_classes] with probabilities
+        of each class
+    """
+    flat = ff.exportForest(model)
+    def predict_proba(X):
+        labels, n_evaluated = flat.predict_proba_anytime(X_scaler.transform(X), chunk_trees = chunk_trees,
+                                                         delta = delta)
+        print("Anytime prediction: mean trees evaluated = %.1f of %d (min = %d, max = %d)" 
+              % (n_evaluated.mean(), flat.n_trees, n_evaluated.min(), n_evaluated.max()))
+        return labels
+    
+    return rc.predictUnique(predict_proba, X_test)
+
 def __savePredictorModel(predictor):
     """
     Saves trained model 
@@ -95,6 +248,8 @@ def __savePredictorModel(predictor):
     if predictor.model == None or predictor.X_scaler == None:
         raise Exception("Model not trained yet - nothing to save")
         
+    import joblib
+    
     # Create output directory
     model_dir = os.path.dirname(predictor.model_path)
     if os.path.exists(model_dir) == True:
@@ -105,6 +260,13 @@ def __savePredictorModel(predictor):
     joblib.dump(predictor.model, predictor.model_path)
     joblib.dump(predictor.X_scaler, predictor.scaler_path)
     
+    # save model manifest with training details
+    manifest = predictor.manifest()
+    if getattr(predictor, "negative_sampling", None) != None:
+        manifest["negative_sampling"] = predictor.negative_sampling
+    with open(predictor.manifest_path, mode = 'w') as f:
+        json.dump(manifest, f, indent = 2)
+    
     print("Model saved to: " + model_dir)
     
 def __loadPredictorModel(predictor):
@@ -113,8 +275,15 @@ def __loadPredictorModel(predictor):
     Return:
         loaded model
     """
+    import joblib
+    
     predictor.model = joblib.load(predictor.model_path)
     predictor.X_scaler = joblib.load(predictor.scaler_path)
+    if os.path.exists(predictor.manifest_path):
+        with open(predictor.manifest_path) as f:
+            manifest = json.load(f)
+        predictor.score_curve = manifest.get("score_curve")
+        predictor.score_metric = manifest.get("score_metric")
     
 def __loadTrainCorpora():
     # check that train corpora exists
@@ -132,10 +301,159 @@ def __loadTrainCorpora():
     return {"train":{"features":train_features, "labels":train_labels},
             "validate":{"features":validate_features, "labels":validate_labels}}
 
+def compareNegativeSampling(predictor_name, rates, neg_calibration = 'weights'):
+    """
+    Trains predictor over all train rows and with negative downsampling for each rate and
+    reports the fit time reduction and the change in validation target score
+    Arguments:
+        predictor_name: the name of predictor to use
+        rates: the list of fractions of train rows with label 0 to keep
+        neg_calibration: the correction of negative downsampling ('weights' or 'prior')
+    Return:
+        the list of dictionaries with rate, fit time and target score, where the first
+        one is for training over all rows
+    """
+    corpora = __loadTrainCorpora()
+    results = list()
+    for rate in [None] + list(rates):
+        predictor = PREDICTORS[predictor_name]()
+        X_scaler = predictor.createScaler()
+        X_train = X_scaler.fit_transform(corpora["train"]["features"])
+        Y_train = corpora["train"]["labels"]
+        sample_weight = None
+        if rate != None:
+            X_train, Y_train, sample_weight = ns.downsampleNegatives(X_train, Y_train, rate)
+            if neg_calibration == 'prior':
+                sample_weight = None
+        
+        start = time.time()
+        model = predictor.train(X_train, Y_train, sample_weight = sample_weight)
+        fit_time = time.time() - start
+        if rate != None and neg_calibration == 'prior':
+            model = ns.PriorCorrectedModel(model, rate)
+        _, t_score = __validate(corpora["validate"]["features"], corpora["validate"]["labels"], model, X_scaler)
+        results.append({"rate":rate, "fit_time":fit_time, "target_score":t_score})
+    
+    full = results[0]
+    print("Negative downsampling with '%s' calibration, all rows: fit time = %.2f s, target score = %.2f %%"
+          % (neg_calibration, full["fit_time"], full["target_score"] * 100))
+    for r in results[1:]:
+        print("rate = %.3f: fit time = %.2f s (%.1f %% reduction), target score = %.2f %% (%+.2f %%)"
+              % (r["rate"], r["fit_time"], (1 - r["fit_time"] / full["fit_time"]) * 100,
+                 r["target_score"] * 100, (r["target_score"] - full["target_score"]) * 100))
+    return results
+
+def search(param_grid = PARAM_GRID, n_iter = None, n_folds = 5, processes = None, 
+           results_log = config.search_log_path, features_path = config.train_features_path, 
+           labels_path = config.train_labels_path):
+    """
+    Runs hyper-parameters search for the random forest settings with k-fold cross-validation 
+    over train features. The candidates evaluated in parallel by the process pool, where 
+    workers share one memory-mapped copy of train features and labels files instead of 
+    receiving pickled arrays. Each candidate scored with the same target score (recall level at
+    2% false positive rate) as in evaluate.py. The features are not scaled as forest splits 
+    are invariant to the features scaling.
+    The results are appended to the results log as JSON lines and candidates already present 
+    in the log for the same number of folds are skipped, so the interrupted search can be resumed.
+    Only results with the same number of folds are returned as scores of different folds are 
+    not comparable.
+    Arguments:
+        param_grid: the dictionary with lists of values per forest parameter
+        n_iter: the number of random candidates to sample from the grid [optional], 
+                if None the full grid evaluated
+        n_folds: the number of cross-validation folds
+        processes: the number of worker processes [optional], if None the CPU count used
+        results_log: the path to the search results log file
+        features_path: the path to the train features file
+        labels_path: the path to the train labels file
+    Return:
+        the list of results sorted by mean target score in descending order
+    """
+    from sklearn.model_selection import ParameterGrid, ParameterSampler
+    
+    if n_iter == None:
+        candidates = list(ParameterGrid(param_grid))
+    else:
+        candidates = list(ParameterSampler(param_grid, n_iter = n_iter, random_state = RANDOM_STATE))
+        
+    # load already evaluated candidates
+    results = list()
+    if os.path.exists(results_log):
+        with open(results_log) as f:
+            results = [json.loads(line) for line in f if len(line.strip()) > 0]
+        results = [r for r in results if r.get("n_folds") == n_folds]
+    done = set(__paramsKey(r["params"], r["n_folds"]) for r in results)
+    pending = [p for p in candidates if __paramsKey(p, n_folds) not in done]
+    print("Search: %d candidates, %d already evaluated, %d folds" 
+          % (len(candidates), len(candidates) - len(pending), n_folds))
+    
+    if len(pending) > 0:
+        log_dir = os.path.dirname(results_log)
+        if len(log_dir) > 0 and os.path.exists(log_dir) == False:
+            os.makedirs(log_dir)
+        with multiprocessing.Pool(processes, initializer = __initSearchWorker, 
+                                  initargs = (features_path, labels_path, n_folds)) as pool, \
+             open(results_log, mode = 'a') as log:
+            for result in pool.imap_unordered(__evaluateCandidate, pending):
+                log.write(json.dumps(result) + "\n")
+                log.flush()
+                results.append(result)
+                print("score = %.4f (+/- %.4f), time = %.1f s, params: %s" 
+                      % (result["mean_score"], result["std_score"], result["time"], result["params"]))
+    
+    results.sort(key = lambda r: r["mean_score"], reverse = True)
+    if len(results) > 0:
+        print("Best target score = %.4f with params: %s" % (results[0]["mean_score"], results[0]["params"]))
+    return results
+
+def __paramsKey(params, n_folds):
+    """
+    Returns the key to identify candidate parameters evaluated with given number of 
+    cross-validation folds in the search results log
+    """
+    return json.dumps({"params":params, "n_folds":n_folds}, sort_keys = True)
+
+def __initSearchWorker(features_path, labels_path, n_folds):
+    """
+    Initializes search worker process with memory-mapped train corpora and folds
+    """
+    global __search_corpora
+    from sklearn.model_selection import KFold
+    
+    features = np.load(features_path, mmap_mode = 'r')
+    labels = np.load(labels_path, mmap_mode = 'r')
+    folds = list(KFold(n_splits = n_folds, shuffle = True, random_state = RANDOM_STATE).split(labels))
+    __search_corpora = {"features":features, "labels":labels, "folds":folds}
+    
+def __evaluateCandidate(params):
+    """
+    Evaluates forest settings with cross-validation over shared train corpora
+    Arguments:
+        params: the forest parameters
+    Return:
+        the dictionary with parameters, number of folds, per fold scores, mean score and evaluation time
+    """
+    from sklearn.ensemble import RandomForestClassifier
+    
+    features = __search_corpora["features"]
+    labels = __search_corpora["labels"]
+    start = time.time()
+    scores = list()
+    for train_index, validate_index in __search_corpora["folds"]:
+        clf = RandomForestClassifier(random_state = RANDOM_STATE, n_jobs = 1, **params)
+        clf.fit(features[train_index], labels[train_index])
+        labels_prob = clf.predict_proba(features[validate_index])
+        score, _ = evaluate.targetScoreFromLabels(labels_prob, labels[validate_index], clf.classes_)
+        scores.append(float(score))
+        
+    return {"params":params, "n_folds":len(__search_corpora["folds"]), "scores":scores, 
+            "mean_score":float(np.mean(scores)), "std_score":float(np.std(scores)),
+            "time":time.time() - start}
+
 if __name__ == '__main__':
     
     parser = argparse.ArgumentParser(description='The predictive model runner')
-    parser.add_argument('predictor_name', 
+    parser.add_argument('predictor_name', choices=sorted(PREDICTORS.keys()),
                         help='the name of predictor')
     parser.add_argument('--test_data', default=config.test_features_path, 
                         help='the path to the test data file to make predictions for')
@@ -145,8 +463,53 @@ if __name__ == '__main__':
                         help='if set then trained model will be validated against validate data')
     parser.add_argument('--save_labels', action='store_true', 
                         help='if set then predicted labels will be saved')
+    parser.add_argument('--anytime', action='store_true', 
+                        help='if set then forest trees evaluated only until the decision for a row is known')
+    parser.add_argument('--anytime_chunk_trees', type=int, default=50, 
+                        help='the number of trees to evaluate before checking the early-exit condition of anytime inference')
+    parser.add_argument('--anytime_delta', type=float, default=None, 
+                        help='the allowed probability for anytime decision to differ from full evaluation, if not set only exact decisions stop early')
+    parser.add_argument('--warm_start', action='store_true', 
+                        help='if set then forest grown with warm start until score plateaus, saved model is grown if exists')
+    parser.add_argument('--search', action='store_true', 
+                        help='if set then hyper-parameters search with cross-validation over train data performed')
+    parser.add_argument('--search_iter', type=int, default=None, 
+                        help='the number of random candidates to evaluate, if not set the full grid evaluated')
+    parser.add_argument('--search_folds', type=int, default=5, 
+                        help='the number of cross-validation folds for hyper-parameters search')
+    parser.add_argument('--search_processes', type=int, default=None, 
+                        help='the number of worker processes for hyper-parameters search')
+    parser.add_argument('--search_log', default=config.search_log_path, 
+                        help='the path to the hyper-parameters search results log to resume from')
+    parser.add_argument('--minibatch', action='store_true', 
+                        help='if set then model trained with minibatches streamed from memory-mapped train data files')
+    parser.add_argument('--batch_size', type=int, default=10000, 
+                        help='the number of rows in minibatch')
+    parser.add_argument('--train_features', nargs='+', default=[config.train_features_path], 
+                        help='the list of train features shard files for minibatch training')
+    parser.add_argument('--train_labels', nargs='+', default=[config.train_labels_path], 
+                        help='the list of train labels shard files for minibatch training')
+    parser.add_argument('--row_cache', action='store_true', 
+                        help='if set then predicted probabilities cached per features row for the same model')
+    parser.add_argument('--neg_rate', type=float, default=None, 
+                        help='the fraction of train rows with label 0 to keep for training')
+    parser.add_argument('--neg_calibration', choices=['weights', 'prior'], default='weights', 
+                        help='the correction of negative downsampling: sample weights or prior recalibration of probabilities')
+    parser.add_argument('--neg_compare', type=float, nargs='+', default=None, 
+                        help='the negative downsampling rates to compare fit time and target score against training over all rows')
     args = parser.parse_args()
     
+    if args.search:
+        if args.predictor_name != 'RandomForest':
+            raise Exception("Hyper-parameters search not supported for predictor: " + args.predictor_name)
+        search(n_iter = args.search_iter, n_folds = args.search_folds, 
+               processes = args.search_processes, results_log = args.search_log)
+        exit()
+    
+    if args.neg_compare != None:
+        compareNegativeSampling(args.predictor_name, args.neg_compare, args.neg_calibration)
+        exit()
+    
     # Do prediction
     #
     print("Start '%s' predictor for [%s] data set" % (args.predictor_name, args.test_data))
@@ -154,7 +517,18 @@ if __name__ == '__main__':
     labels, _ = predict(args.predictor_name, test_features, 
                         save_model = args.save_model, 
                         validate_model = args.validate_model, 
-                        save_labels = args.save_labels)
+                        save_labels = args.save_labels,
+                        anytime = args.anytime,
+                        anytime_chunk_trees = args.anytime_chunk_trees,
+                        anytime_delta = args.anytime_delta,
+                        warm_start = args.warm_start,
+                        minibatch = args.minibatch,
+                        batch_size = args.batch_size,
+                        train_features_paths = args.train_features,
+                        train_labels_paths = args.train_labels,
+                        row_cache = args.row_cache,
+                        neg_rate = args.neg_rate,
+                        neg_calibration = args.neg_calibration)
     
     
     
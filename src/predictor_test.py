@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The test cases for the predictive models runner
+
+@author: yaric
+"""
+import json
+import tempfile
+import unittest
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+import predictor as pr
+import evaluate
+
+class TestPredictorSearchMethods(unittest.TestCase):
+
+    def setUp(self):
+        rnd = np.random.RandomState(123)
+        # integer valued features similar to glove indices and POS tags
+        self.X = rnd.randint(0, 40, size = (300, 8)).astype("f")
+        self.labels = (self.X[:, 0] + self.X[:, 3] + rnd.randint(0, 20, size = 300)).astype("int") % 4
+
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.features_path = self.temp_dir.name + "/features.npy"
+        self.labels_path = self.temp_dir.name + "/labels.npy"
+        self.results_log = self.temp_dir.name + "/search/results.jsonl"
+        np.save(self.features_path, self.X)
+        np.save(self.labels_path, self.labels)
+        self.param_grid = {"n_estimators":[5, 10], "max_depth":[None, 4]}
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def search(self, n_folds):
+        return pr.search(param_grid = self.param_grid, n_folds = n_folds, processes = 2,
+                         results_log = self.results_log, features_path = self.features_path,
+                         labels_path = self.labels_path)
+
+    def logLines(self):
+        with open(self.results_log) as f:
+            return [json.loads(line) for line in f]
+
+    def test_evaluate_candidate(self):
+        getattr(pr, "__initSearchWorker")(self.features_path, self.labels_path, 3)
+        params = {"n_estimators":5, "max_depth":4}
+        result = getattr(pr, "__evaluateCandidate")(params)
+        self.assertEqual(result["params"], params, "Wrong candidate parameters")
+        self.assertEqual(result["n_folds"], 3, "Wrong number of folds")
+        self.assertEqual(len(result["scores"]), 3, "Wrong number of fold scores")
+        self.assertAlmostEqual(result["mean_score"], np.mean(result["scores"]), msg = "Wrong mean score")
+
+        # the first fold scored with target score of the same forest
+        train_index, validate_index = getattr(pr, "__search_corpora")["folds"][0]
+        clf = RandomForestClassifier(random_state = pr.RANDOM_STATE, n_jobs = 1, **params)
+        clf.fit(self.X[train_index], self.labels[train_index])
+        score, _ = evaluate.targetScoreFromLabels(clf.predict_proba(self.X[validate_index]),
+                                                  self.labels[validate_index], clf.classes_)
+        self.assertAlmostEqual(result["scores"][0], score, msg = "Wrong fold score")
+
+    def test_search(self):
+        results = self.search(n_folds = 2)
+        self.assertEqual(len(results), 4, "Not all candidates evaluated")
+        self.assertEqual(len(self.logLines()), 4, "Not all results logged")
+        scores = [r["mean_score"] for r in results]
+        self.assertEqual(scores, sorted(scores, reverse = True), "Results not sorted by score")
+        self.assertTrue(all(0 <= s <= 1 for s in scores), "Score out of range")
+
+    def test_search_resume(self):
+        self.param_grid = {"n_estimators":[5], "max_depth":[None, 4]}
+        self.search(n_folds = 2)
+
+        # the logged candidates skipped and only new ones evaluated
+        self.param_grid = {"n_estimators":[5, 10], "max_depth":[None, 4]}
+        results = self.search(n_folds = 2)
+        self.assertEqual(len(results), 4, "Logged results not returned")
+        lines = self.logLines()
+        self.assertEqual(len(lines), 4, "Logged candidates evaluated again")
+        self.assertEqual(sorted(r["params"]["n_estimators"] for r in lines[2:]), [10, 10],
+                         "Wrong candidates evaluated on resume")
+
+        # the candidates are evaluated again for other number of folds
+        results = self.search(n_folds = 3)
+        self.assertEqual(len(results), 4, "Results of other folds returned")
+        self.assertTrue(all(r["n_folds"] == 3 for r in results), "Wrong number of folds in results")
+        self.assertEqual(len(self.logLines()), 8, "Candidates not evaluated for other number of folds")
+
+class TestPredictorMethods(unittest.TestCase):
+
+    def test_minibatch_not_supported(self):
+        X_test = np.zeros((2, 8), dtype = "f")
+        for name in ["RandomForest", "HistGradientBoosting"]:
+            with self.assertRaisesRegex(Exception, "does not support minibatch"):
+                pr.predict(name, X_test, minibatch = True, validate_model = False)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,40 +6,129 @@ The predictor model based on RandomForestClassifier
 @author: yaric
 """
 
-from sklearn.ensemble import RandomForestClassifier
-
 import config
 
 RANDOM_STATE = 123
 
+# The forest settings to be evaluated by hyper-parameters search
+PARAM_GRID = {"n_estimators":[300, 500, 1000, 1500, 2000],
+              "max_features":["sqrt", "log2", None],
+              "min_samples_leaf":[1, 2, 5],
+              "max_depth":[None, 20, 40]}
+
 class RandomForest(object):
     
     def __init__(self, n_estimators = 300, model_path = config.models_dir +  "/random_forest/model.pkl", 
-                 scaler_path = config.models_dir + "/random_forest/scaler.pkl"):
+                 scaler_path = config.models_dir + "/random_forest/scaler.pkl",
+                 manifest_path = config.models_dir + "/random_forest/manifest.json"):
         self.model_path = model_path
         self.scaler_path = scaler_path
+        self.manifest_path = manifest_path
         self.n_estimators = n_estimators
+        self.score_curve = None
+        self.score_metric = None
     
+    def createScaler(self):
+        """
+        Creates the transformer of features to be fitted over train data before training
+        """
+        from sklearn.preprocessing import StandardScaler
+        return StandardScaler(with_mean = False)
 
-    def train(self, X_train, labels):
+    def train(self, X_train, labels, sample_weight = None):
         """
         Train model with given data corpus
         Arguments:
             X_train: the train data [n_samples, n_features]
             labels: the GT labels [n_samples, n_classes]
+            sample_weight: the weights of train samples [optional]
         Return:
             return trained model
         """
+        from sklearn.ensemble import RandomForestClassifier
+        
         # train estimator
         clf = RandomForestClassifier(n_estimators = self.n_estimators, random_state = RANDOM_STATE, n_jobs = -1)
-        self.model = clf.fit(X_train, labels)
+        self.model = clf.fit(X_train, labels, sample_weight = sample_weight)
         
         train_score = self.model.score(X_train, labels)
         print("RandomForest:\ntrain score = %.3f, n_estimators = %d" % (train_score, self.n_estimators))
         
         return self.model
 
+    def trainWarmStart(self, X_train, labels, X_validate = None, labels_validate = None, model = None,
+                       step = 100, tolerance = 1e-3, patience = 2, grow_by = None):
+        """
+        Train model by growing the forest with warm start until score plateaus. The score 
+        is measured after each step of added trees and the tree-count/score curve is 
+        stored in score_curve attribute along with the name of score metric in score_metric
+        attribute. The curve of grown model is continued only if it was measured by the
+        same metric, otherwise the new curve is started.
+        Arguments:
+            X_train: the train data [n_samples, n_features]
+            labels: the GT labels [n_samples, n_classes]
+            X_validate: the validation data [optional], if None the out-of-bag score is used
+            labels_validate: the validation GT labels [optional]
+            model: the already trained forest to grow [optional]. As out-of-bag samples of 
+                   trees trained over other data unknown, the validation data should be 
+                   provided when new train data used to grow existing forest
+            step: the number of trees to add at each step
+            tolerance: the minimal score improvement to consider that score is still growing
+            patience: the number of steps without improvement before stop adding trees
+            grow_by: the maximal number of trees to add to the provided model [optional], if None
+                     the forest grown up to n_estimators trees in total
+        Return:
+            return trained model
+        """
+        from sklearn.ensemble import RandomForestClassifier
+        
+        use_oob = X_validate is None
+        metric = "oob" if use_oob else "validate"
+        if model is None:
+            model = RandomForestClassifier(n_estimators = 0, random_state = RANDOM_STATE, n_jobs = -1)
+            self.score_curve = list()
+        elif self.score_curve is None or self.score_metric != metric:
+            # the scores of other metric are not comparable
+            self.score_curve = list()
+        self.score_metric = metric
+        model.set_params(warm_start = True, oob_score = use_oob)
+        
+        n_trees = len(model.estimators_) if hasattr(model, "estimators_") else 0
+        max_trees = self.n_estimators if grow_by is None else n_trees + grow_by
+        best_score = max([s for _, s in self.score_curve], default = float("-inf"))
+        no_improvement = 0
+        while n_trees < max_trees and no_improvement < patience:
+            n_trees = min(n_trees + step, max_trees)
+            model.set_params(n_estimators = n_trees)
+            model.fit(X_train, labels)
+            
+            if use_oob:
+                score = model.oob_score_
+            else:
+                score = model.score(X_validate, labels_validate)
+            self.score_curve.append((n_trees, score))
+            print("RandomForest warm start: n_estimators = %d, %s score = %.4f" 
+                  % (n_trees, metric, score))
+            
+            if score > best_score + tolerance:
+                no_improvement = 0
+            else:
+                no_improvement += 1
+            best_score = max(best_score, score)
+            
+        self.model = model
+        self.n_estimators = n_trees
+        
+        train_score = self.model.score(X_train, labels)
+        print("RandomForest:\ntrain score = %.3f, n_estimators = %d" % (train_score, self.n_estimators))
+        
+        return self.model
 
-
-    
-
+    def manifest(self):
+        """
+        Returns the dictionary with trained model description to be saved along with model
+        """
+        return {"predictor":"RandomForest", 
+                "n_estimators":self.n_estimators, 
+                "score_curve":self.score_curve,
+                "score_metric":self.score_metric}
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The test cases for predictor model based on RandomForestClassifier
+
+@author: yaric
+"""
+import os
+import json
+import tempfile
+import unittest
+
+import numpy as np
+
+from random_forest_model import RandomForest
+import predictor as pr
+
+class TestRandomForestMethods(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        rnd = np.random.RandomState(123)
+        # integer valued features similar to glove indices and POS tags
+        cls.X = rnd.randint(0, 40, size = (400, 16)).astype("f")
+        cls.labels = (cls.X[:, 0] + cls.X[:, 3] + rnd.randint(0, 20, size = 400)).astype("int") % 4
+        cls.X_validate = rnd.randint(0, 40, size = (200, 16)).astype("f")
+        cls.labels_validate = (cls.X_validate[:, 0] + cls.X_validate[:, 3]
+                               + rnd.randint(0, 20, size = 200)).astype("int") % 4
+
+    def test_warm_start_step(self):
+        # negative tolerance - the score always considered improving
+        rf = RandomForest(n_estimators = 25)
+        model = rf.trainWarmStart(self.X, self.labels, step = 10, tolerance = -1.)
+        self.assertEqual(len(model.estimators_), 25, "Forest not grown up to n_estimators")
+        self.assertEqual([n for n, _ in rf.score_curve], [10, 20, 25], "Trees not added by step")
+        self.assertEqual(rf.score_metric, "oob", "Wrong score metric")
+        self.assertEqual(rf.n_estimators, 25, "Wrong number of trees")
+
+    def test_warm_start_plateau(self):
+        # the improvement never exceeds tolerance after the first step
+        rf = RandomForest(n_estimators = 100)
+        model = rf.trainWarmStart(self.X, self.labels, self.X_validate, self.labels_validate,
+                                  step = 5, tolerance = 1., patience = 2)
+        self.assertEqual(len(model.estimators_), 15, "Not stopped after patience steps of plateau")
+        self.assertEqual(len(rf.score_curve), 3, "Wrong score curve length")
+        self.assertEqual(rf.score_metric, "validate", "Wrong score metric")
+        self.assertEqual(rf.n_estimators, 15, "Wrong number of trees")
+
+    def test_manifest(self):
+        rf = RandomForest(n_estimators = 20)
+        rf.trainWarmStart(self.X, self.labels, self.X_validate, self.labels_validate, step = 10, tolerance = -1.)
+        manifest = json.loads(json.dumps(rf.manifest()))
+        self.assertEqual(manifest["n_estimators"], 20, "Wrong number of trees in manifest")
+        self.assertEqual(manifest["score_metric"], "validate", "Wrong score metric in manifest")
+        self.assertEqual([n for n, _ in manifest["score_curve"]], [10, 20], "Wrong score curve in manifest")
+        self.assertTrue(all(0 <= s <= 1 for _, s in manifest["score_curve"]), "Score out of range")
+
+    def test_warm_start_resume(self):
+        rf = RandomForest(n_estimators = 20)
+        rf.trainWarmStart(self.X, self.labels, self.X_validate, self.labels_validate, step = 10, tolerance = -1.)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            rf.model_path = temp_dir + "/random_forest/model.pkl"
+            rf.scaler_path = temp_dir + "/random_forest/scaler.pkl"
+            rf.manifest_path = temp_dir + "/random_forest/manifest.json"
+            rf.X_scaler = rf.createScaler().fit(self.X)
+            getattr(pr, "__savePredictorModel")(rf)
+            self.assertTrue(os.path.exists(rf.manifest_path), "Manifest not saved")
+
+            # the fresh predictor loads saved model as predictor.py does for warm start
+            resumed = RandomForest(n_estimators = 20, model_path = rf.model_path,
+                                   scaler_path = rf.scaler_path, manifest_path = rf.manifest_path)
+            getattr(pr, "__loadPredictorModel")(resumed)
+        self.assertEqual(resumed.n_estimators, 20, "Number of trees to add changed by loading")
+        self.assertEqual(resumed.score_metric, "validate", "Score metric not loaded")
+
+        model = resumed.trainWarmStart(self.X, self.labels, self.X_validate, self.labels_validate,
+                                       model = resumed.model, step = 10, tolerance = -1.,
+                                       grow_by = resumed.n_estimators)
+        self.assertEqual(len(model.estimators_), 40, "Trees double counted on resume")
+        self.assertEqual(resumed.n_estimators, 40, "Wrong number of trees after resume")
+        self.assertEqual([n for n, _ in resumed.score_curve], [10, 20, 30, 40], "Score curve not continued")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -24,7 +24,8 @@ def saveSubmissionResults(f_type,
                           out_file = config.test_reults_path, 
                           labels_file = config.test_labels_prob_path, 
                           test_senetnces_file = config.sentence_test_path, 
-                          test_parse_tree_file = config.parse_test_path,):
+                          test_parse_tree_file = config.parse_test_path,
+                          thresholds = None):
     """
     Saves submission results from provided prediction labels
     Argument:
@@ -33,6 +34,8 @@ def saveSubmissionResults(f_type,
         labels_file: the path to the file with predcitions label Numpy array
         test_senetnces_file: the text's corpora file for test data
         test_parse_tree_file: the parse tree file for test data
+        thresholds: the confidence threshold or dictionary with thresholds per suggested 
+                    article [optional], if None the confidence_threshold used
     """
     labels = np.load(labels_file)
     text_data = utils.read_json(test_senetnces_file)
@@ -42,7 +45,7 @@ def saveSubmissionResults(f_type,
     if f_type == 'tree':
         predictions = predictionsFromLabels(labels, text_data, parse_trees_list)
     elif f_type == 'tags':
-        predictions = predictionsFromTagLabels(text_data = text_data, labels = labels)
+        predictions = predictionsFromTagLabels(text_data = text_data, labels = labels, thresholds = thresholds)
     else:
         raise Exception('Unknown features type: ' + f_type)
     print("Generated %d prediction sentences" % len(predictions))
@@ -124,13 +127,15 @@ def predictionsFromLabels(labels, text_data, parse_trees_list):
         
     return res_list 
 
-def predictionsFromTagLabels(text_data, labels):
+def predictionsFromTagLabels(text_data, labels, thresholds = None):
     """
     Create predictions results to be accepted by savePredictions based on features set
     generated with pos tags
     Arguments:
         labels: the predicted labels from predictive model
         text_data: the text corpora as loaded from JSON
+        thresholds: the confidence threshold or dictionary with thresholds per suggested 
+                    article [optional], if None the confidence_threshold used
     Returns:
         list of predictions per sentence to be accepted by savePredictions
     """
@@ -141,7 +146,7 @@ def predictionsFromTagLabels(text_data, labels):
         for w in s:
             if w.lower() in ['a', 'an', 'the']:
                 max_lab_ind = np.argmax(labels[l_index]) # the most confident prediction
-                if labels[l_index, max_lab_ind] > confidence_threshold:
+                if labels[l_index, max_lab_ind] > __threshold(thresholds, max_lab_ind):
                     row_data.append([max_lab_ind, labels[l_index, max_lab_ind]]) # [class, probability]
                 else:
                     row_data.append([0, 0]) # too low confidence
@@ -156,19 +161,47 @@ def predictionsFromTagLabels(text_data, labels):
         raise Exception("Not all labels was processed")
         
     return res_list 
+
+def __threshold(thresholds, class_label):
+    """
+    Returns the confidence threshold for suggested class label
+    """
+    if thresholds is None:
+        return confidence_threshold
+    if isinstance(thresholds, dict):
+        if class_label == 0:
+            return confidence_threshold
+        return thresholds.get(ds.DT.nameByValue(class_label).lower(), confidence_threshold)
+    return thresholds
+
+def thresholdsFromManifest(manifest_path, per_article = True):
+    """
+    Loads confidence thresholds calibrated by threshold_sweep.py from the model manifest
+    Arguments:
+        manifest_path: the path to the model manifest file
+        per_article: the flag to indicate whether to return thresholds per suggested article
+                     if present in manifest
+    Return:
+        the dictionary with thresholds per article or single threshold value, where null
+        threshold of manifest returned as -inf
+    """
+    with open(manifest_path) as f:
+        calibration = json.load(f).get("confidence_thresholds")
+    if calibration == None:
+        raise Exception("Confidence thresholds not found in manifest: " + manifest_path)
+    from_json = lambda value: float('-inf') if value == None else value
+    if per_article and calibration.get("per_article") != None:
+        return {article:from_json(value) for article, value in calibration["per_article"].items()}
+    return from_json(calibration["threshold"])
     
-def savePredictions(predictions, file):
+def submissionFromPredictions(predictions):
     """
-    Method to save predictions results.
+    Converts predictions results into submission format where suggested class replaced
+    with article name and positions without suggested correction are None
     Arguments:
         predictions: the list of lists with predictions per sentences for each unit
-        [
-             [None,[class, confidece],None],
-             [None,None,[class, confidece]],
-             ...
-             [[class, confidece],None,None]
-        ]
-        file: the file path to save
+    Return:
+        the list of lists with [article, confidence] or None per sentence unit
     """
     out = list()
     for s in predictions:
@@ -189,6 +222,22 @@ def savePredictions(predictions, file):
                 out_s.append([class_label, float(w[1])])
         # Append sentence
         out.append(out_s)
+    return out
+    
+def savePredictions(predictions, file):
+    """
+    Method to save predictions results.
+    Arguments:
+        predictions: the list of lists with predictions per sentences for each unit
+        [
+             [None,[class, confidece],None],
+             [None,None,[class, confidece]],
+             ...
+             [[class, confidece],None,None]
+        ]
+        file: the file path to save
+    """
+    out = submissionFromPredictions(predictions)
         
     # save result to JSON
     with open(file, mode = 'w') as f:
@@ -208,6 +257,8 @@ if __name__ == '__main__':
                         help='the parse tree file for test data')
     parser.add_argument('--f_type', default='tree',
                         help='the type of features used for training [tree, tags]')
+    parser.add_argument('--manifest', default=None,
+                        help='the path to the model manifest with calibrated confidence thresholds')
     args = parser.parse_args()
     
     print("Generating test results for features with type: %s" % args.f_type)
@@ -216,4 +267,5 @@ if __name__ == '__main__':
                           out_file = args.out_file, 
                           labels_file = args.labels_file, 
                           test_senetnces_file = args.test_sentences_file, 
-                          test_parse_tree_file = args.test_parse_tree_file)
+                          test_parse_tree_file = args.test_parse_tree_file,
+                          thresholds = thresholdsFromManifest(args.manifest) if args.manifest != None else None)
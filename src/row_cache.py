@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The deduplication of features rows before inference and persistent cache of predicted
+probabilities per features row. The article contexts repeat heavily in the web text,
+so the same features rows are generated many times and it is enough to score only
+unique rows and scatter probabilities back.
+
+@author: yaric
+"""
+import os
+import time
+import pickle
+import hashlib
+import argparse
+
+import numpy as np
+
+import config
+
+def rowKeys(X):
+    """
+    Creates the byte view of features rows, where each row is one comparable item
+    Arguments:
+        X: the features [n_samples, n_features]
+    Return:
+        the array of void items [n_samples]
+    """
+    X = np.ascontiguousarray(X)
+    return X.view(np.dtype((np.void, X.dtype.itemsize * X.shape[1]))).ravel()
+
+def uniqueRows(X):
+    """
+    Finds unique features rows
+    Arguments:
+        X: the features [n_samples, n_features]
+    Return:
+        the tuple with unique rows [n_unique, n_features] and indices of unique row for
+        each original row [n_samples]
+    """
+    X = np.ascontiguousarray(X)
+    _, index, inverse = np.unique(rowKeys(X), return_index = True, return_inverse = True)
+    return (X[index], inverse.ravel())
+
+def predictUnique(predict_proba, X, cache = None):
+    """
+    Predicts probabilities only for unique features rows and scatters them back to all rows
+    Arguments:
+        predict_proba: the function to predict probabilities for features rows
+        X: the features [n_samples, n_features]
+        cache: the RowProbabilityCache to look up already predicted rows [optional]
+    Return:
+        the array of shape = [n_samples, n_classes] with probabilities of each class
+    """
+    unique, inverse = uniqueRows(X)
+    if cache == None:
+        labels = predict_proba(unique)
+    else:
+        labels = cache.predict(predict_proba, unique)
+    print("Deduplication: rows = %d, unique rows = %d, dedup ratio = %.2f"
+          % (len(X), len(unique), len(X) / max(len(unique), 1)))
+    return labels[inverse]
+
+def modelChecksum(*objects):
+    """
+    Calculates checksum of serialized model objects (for example, model and features scaler)
+    Return:
+        the hex digest of MD5 checksum
+    """
+    md5 = hashlib.md5()
+    for obj in objects:
+        md5.update(pickle.dumps(obj, protocol = pickle.HIGHEST_PROTOCOL))
+    return md5.hexdigest()
+
+class RowProbabilityCache(object):
+    """
+    The persistent cache of predicted probabilities per features row. The cache file is
+    keyed by the model checksum, so the cached probabilities are never reused with other
+    model.
+    """
+
+    def __init__(self, checksum, cache_dir = config.models_dir + "/row_cache"):
+        """
+        Creates cache for model with specified checksum
+        Arguments:
+            checksum: the checksum of model
+            cache_dir: the directory to store cache files
+        """
+        self.path = "%s/row_proba_%s.npz" % (cache_dir, checksum)
+        self.rows = None
+        self.labels = None
+        if os.path.exists(self.path):
+            with np.load(self.path) as data:
+                self.rows = data["rows"]
+                self.labels = data["labels"]
+
+    def predict(self, predict_proba, unique):
+        """
+        Predicts probabilities for unique rows which are not cached yet and stores them in cache
+        Arguments:
+            predict_proba: the function to predict probabilities for features rows
+            unique: the unique features rows [n_unique, n_features]
+        Return:
+            the array of shape = [n_unique, n_classes] with probabilities of each class
+        """
+        if self.rows is None:
+            labels = predict_proba(unique)
+            self.__store(unique, labels)
+            return labels
+
+        # the cached rows are sorted by keys
+        keys = rowKeys(unique.astype(self.rows.dtype))
+        cached_keys = rowKeys(self.rows)
+        index = np.minimum(np.searchsorted(cached_keys, keys), len(cached_keys) - 1)
+        hit = cached_keys[index] == keys
+        labels = np.empty((len(unique), self.labels.shape[1]), dtype = self.labels.dtype)
+        labels[hit] = self.labels[index[hit]]
+        print("Row cache: %d of %d unique rows found in cache" % (hit.sum(), len(unique)))
+        if np.all(hit) == False:
+            labels[~hit] = predict_proba(unique[~hit])
+            self.__store(np.concatenate((self.rows, unique[~hit].astype(self.rows.dtype))),
+                         np.concatenate((self.labels, labels[~hit])))
+        return labels
+
+    def __store(self, rows, labels):
+        """
+        Stores rows sorted by keys with probabilities to the cache file
+        """
+        order = np.argsort(rowKeys(rows))
+        self.rows = np.ascontiguousarray(rows[order])
+        self.labels = labels[order]
+        cache_dir = os.path.dirname(self.path)
+        if os.path.exists(cache_dir) == False:
+            os.makedirs(cache_dir)
+        np.savez(self.path, rows = self.rows, labels = self.labels)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='The benchmark of features rows deduplication before inference')
+    parser.add_argument('--model_dir', default=config.models_dir + "/random_forest",
+                        help='the directory with trained model and features scaler')
+    parser.add_argument('--test_data', default=config.test_features_path,
+                        help='the path to the test data file to make predictions for')
+    args = parser.parse_args()
+
+    import joblib
+
+    model = joblib.load(args.model_dir + "/model.pkl")
+    X_scaler = joblib.load(args.model_dir + "/scaler.pkl")
+    X_test = np.load(args.test_data)
+    predict_proba = lambda X: model.predict_proba(X_scaler.transform(X))
+
+    start = time.time()
+    full = predict_proba(X_test)
+    full_time = time.time() - start
+
+    start = time.time()
+    dedup = predictUnique(predict_proba, X_test)
+    dedup_time = time.time() - start
+
+    print("Full scoring = %.2f s, deduplicated scoring = %.2f s, speedup = %.2fx, max proba diff = %.2e"
+          % (full_time, dedup_time, full_time / dedup_time, np.abs(full - dedup).max()))
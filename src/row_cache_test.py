@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The test cases for features rows deduplication and probabilities cache
+
+@author: yaric
+"""
+import tempfile
+import unittest
+
+import numpy as np
+
+import row_cache as rc
+
+def scoreRows(X):
+    """
+    The dummy probabilities predictor
+    """
+    return np.stack([X[:, 0] / 10, X[:, 1] / 10, X[:, 2] / 10, X[:, 3] / 10], axis = 1)
+
+class TestRowCacheMethods(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        rnd = np.random.RandomState(123)
+        cls.X = rnd.randint(0, 4, size = (500, 16)).astype("f")
+        cls.X[:, 4:] = 0
+        cls.n_unique = len(np.unique(cls.X, axis = 0))
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        cls.cache_dir = cls.temp_dir.name + "/row_cache"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.temp_dir.cleanup()
+
+    def test_unique_rows(self):
+        unique, inverse = rc.uniqueRows(self.X)
+        self.assertEqual(len(unique), self.n_unique, "Wrong number of unique rows")
+        self.assertTrue(np.array_equal(unique[inverse], self.X), "Wrong inverse indices")
+
+    def test_predict_unique(self):
+        calls = list()
+        def predict_proba(X):
+            calls.append(len(X))
+            return scoreRows(X)
+
+        labels = rc.predictUnique(predict_proba, self.X)
+        self.assertEqual(calls, [self.n_unique], "Only unique rows should be scored")
+        self.assertTrue(np.array_equal(labels, scoreRows(self.X)), "Wrong scattered probabilities")
+
+    def test_row_cache(self):
+        checksum = rc.modelChecksum("model", "scaler")
+        cache = rc.RowProbabilityCache(checksum, self.cache_dir)
+        rc.predictUnique(scoreRows, self.X[:100], cache)
+
+        calls = list()
+        def predict_proba(X):
+            calls.append(len(X))
+            return scoreRows(X)
+
+        # new cache instance loads stored probabilities
+        cache = rc.RowProbabilityCache(checksum, self.cache_dir)
+        labels = rc.predictUnique(predict_proba, self.X, cache)
+        self.assertTrue(np.array_equal(labels, scoreRows(self.X)), "Wrong cached probabilities")
+        self.assertEqual(calls, [self.n_unique - len(rc.uniqueRows(self.X[:100])[0])], "Cached rows should not be scored")
+
+        other = rc.RowProbabilityCache(rc.modelChecksum("other model", "scaler"), self.cache_dir)
+        self.assertIsNone(other.rows, "Cache should not be shared between models")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The predictor model based on linear SGDClassifier with logistic loss trained over
+sparse one-hot encoding of the words Glove indices and POS tags features
+
+@author: yaric
+"""
+
+import config
+
+RANDOM_STATE = 123
+
+class SparseLinear(object):
+    
+    def __init__(self, alpha = 1e-5, n_epochs = 20, 
+                 model_path = config.models_dir +  "/sparse_linear/model.pkl", 
+                 scaler_path = config.models_dir + "/sparse_linear/scaler.pkl",
+                 manifest_path = config.models_dir + "/sparse_linear/manifest.json"):
+        self.model_path = model_path
+        self.scaler_path = scaler_path
+        self.manifest_path = manifest_path
+        self.alpha = alpha
+        self.n_epochs = n_epochs
+    
+    def createScaler(self):
+        """
+        Creates the transformer of features to be fitted over train data before training.
+        Each of word Glove index and POS tag features is categorical, so it encoded as 
+        scipy.sparse one-hot matrix, where unknown at train time values are ignored.
+        """
+        from sklearn.preprocessing import OneHotEncoder
+        return OneHotEncoder(handle_unknown = 'ignore')
+
+    def createClassifier(self):
+        """
+        Creates not trained linear classifier
+        """
+        from sklearn.linear_model import SGDClassifier
+        return SGDClassifier(loss = 'log_loss', alpha = self.alpha, max_iter = self.n_epochs, 
+                             tol = None, random_state = RANDOM_STATE)
+
+    def train(self, X_train, labels, sample_weight = None):
+        """
+        Train model with given data corpus
+        Arguments:
+            X_train: the one-hot encoded train data [n_samples, n_encoded_features]
+            labels: the GT labels [n_samples, n_classes]
+            sample_weight: the weights of train samples [optional]
+        Return:
+            return trained model
+        """
+        self.model = self.createClassifier().fit(X_train, labels, sample_weight = sample_weight)
+        
+        train_score = self.model.score(X_train, labels)
+        print("SparseLinear:\ntrain score = %.3f, n_features = %d" % (train_score, X_train.shape[1]))
+        
+        return self.model
+
+    def manifest(self):
+        """
+        Returns the dictionary with trained model description to be saved along with model
+        """
+        return {"predictor":"SparseLinear", 
+                "alpha":self.alpha,
+                "n_epochs":self.n_epochs}
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The test cases for predictor model based on linear SGDClassifier over one-hot features
+
+@author: yaric
+"""
+import pickle
+import unittest
+
+import numpy as np
+import scipy.sparse
+
+from sparse_linear_model import SparseLinear
+
+class TestSparseLinearMethods(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        rnd = np.random.RandomState(123)
+        # integer valued features similar to glove indices and POS tags
+        cls.X = rnd.randint(0, 40, size = (600, 16)).astype("f")
+        cls.labels = (cls.X[:, 0] + cls.X[:, 4] + rnd.randint(0, 20, size = 600)).astype("int") % 4
+        cls.predictor = SparseLinear(n_epochs = 5)
+        cls.X_scaler = cls.predictor.createScaler()
+        cls.X_train = cls.X_scaler.fit_transform(cls.X)
+        cls.model = cls.predictor.train(cls.X_train, cls.labels)
+
+    def test_one_hot_features(self):
+        self.assertTrue(scipy.sparse.issparse(self.X_train), "Features not encoded as sparse matrix")
+        n_encoded = sum(len(np.unique(self.X[:, col])) for col in range(self.X.shape[1]))
+        self.assertEqual(self.X_train.shape, (len(self.X), n_encoded), "Wrong encoded features shape")
+        self.assertTrue(np.all(self.X_train.sum(axis = 1) == self.X.shape[1]), "Not one category per feature")
+        self.assertTrue(np.array_equal(self.X_scaler.inverse_transform(self.X_train), self.X),
+                        "Encoded features do not decode back")
+
+    def test_unknown_categories(self):
+        X = self.X[:3].copy()
+        X[:, 2] = 1000
+        encoded = self.X_scaler.transform(X)
+        self.assertTrue(np.all(encoded.sum(axis = 1) == self.X.shape[1] - 1), "Unknown category encoded")
+
+    def test_predict_proba(self):
+        proba = self.model.predict_proba(self.X_scaler.transform(self.X[:50]))
+        self.assertEqual(proba.shape, (50, 4), "Wrong probabilities shape")
+        self.assertTrue(np.allclose(proba.sum(axis = 1), 1.), "Probabilities do not sum to one")
+
+    def test_save_load(self):
+        model = pickle.loads(pickle.dumps(self.model))
+        X_scaler = pickle.loads(pickle.dumps(self.X_scaler))
+        self.assertTrue(np.allclose(model.predict_proba(X_scaler.transform(self.X)),
+                                    self.model.predict_proba(self.X_train)),
+                        "Loaded model predictions differ")
+
+if __name__ == '__main__':
+    unittest.main()
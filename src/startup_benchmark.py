@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The startup time benchmark of command line entry points. Each entry point module
+is imported in the fresh interpreter with `python -X importtime` and the heavy libraries
+loaded along with the cumulative import time are reported against the budget. The heavy
+libraries loaded are deterministic and enforced, while the import time depends on the
+machine and its load, so it is only reported here and checked with tolerance margin by the
+unit tests (which can be skipped on slow machines with SKIP_STARTUP_TIME environment variable).
+
+@author: yaric
+"""
+import os
+import sys
+import subprocess
+import argparse
+
+# The heavy libraries which should be loaded only on the code paths that need them
+HEAVY_MODULES = ["sklearn", "scipy", "pandas", "nltk", "joblib"]
+
+# The import time budget in seconds per entry point module, not including the import
+# time of its allowed packages
+ENTRY_POINTS = {"data_set":0.5,
+                "results_generator":0.5,
+                "threshold_sweep":0.5,
+                "ngram_res":0.5,
+                "ngram_store":0.5,
+                "ngram_shards":0.5,
+                "ngram_stream":0.5,
+                "ngram_scoring":0.5,
+                "ngram_decision_table":0.5,
+                "ngram_pruning":0.5,
+                "ngram_perplexity":0.5,
+                "ngram_sketch":0.5,
+                "ngram_quantized":0.5,
+                "evaluate":0.5,
+                "predictor":0.5,
+                "flat_forest":0.5,
+                "forest_compression":0.5,
+                "row_cache":0.5,
+                "nltk_ngram":0.5}
+
+# The packages allowed per entry point along with all the libraries they load. The n-gram
+# model is built with nltk data structures and nltk package initialization loads its
+# integrations with other libraries as well, which can not be avoided with nltk_ngram
+ALLOWED_PACKAGES = {"nltk_ngram":["nltk"]}
+
+def importTime(module, repeats = 1):
+    """
+    Measures the import time of module in the fresh interpreter
+    Arguments:
+        module: the name of module to import
+        repeats: the number of measurements, the best one is returned
+    Return:
+        the tuple with cumulative import time in seconds and the set of top level 
+        packages imported
+    """
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    best = None
+    for _ in range(repeats):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + module],
+                              cwd = src_dir, stdout = subprocess.PIPE, stderr = subprocess.PIPE,
+                              universal_newlines = True)
+        if proc.returncode != 0:
+            raise Exception("Failed to import module: %s\n%s" % (module, proc.stderr))
+        
+        elapsed = None
+        packages = set()
+        for line in proc.stderr.splitlines():
+            if line.startswith("import time:") == False or "|" not in line:
+                continue
+            _, cumulative, name = line.split("|")
+            if name.strip() == "imported package":
+                # the header line
+                continue
+            packages.add(name.strip().split(".")[0])
+            if name.rstrip() == " " + module:
+                elapsed = int(cumulative) / 1e6
+        if elapsed == None:
+            raise Exception("Import time of module: %s not found in the output of -X importtime" % module)
+        if best == None or elapsed < best:
+            best = elapsed
+    return (best, packages)
+
+def checkEntryPoint(module, repeats = 1):
+    """
+    Checks the entry point module against its startup budget. The budget is relative
+    to the import time of allowed packages measured the same way.
+    Arguments:
+        module: the name of entry point module
+        repeats: the number of measurements, the best one is used
+    Return:
+        the tuple with import time in seconds, budget in seconds and the list of 
+        not allowed heavy libraries loaded
+    """
+    elapsed, packages = importTime(module, repeats)
+    budget = ENTRY_POINTS[module]
+    allowed = set()
+    for package in ALLOWED_PACKAGES.get(module, []):
+        package_time, package_imports = importTime(package, repeats)
+        budget += package_time
+        allowed |= package_imports
+    heavy = [m for m in HEAVY_MODULES if m in packages and m not in allowed]
+    return (elapsed, budget, heavy)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='The startup time benchmark of command line entry points')
+    parser.add_argument('--repeats', type=int, default=3, 
+                        help='the number of measurements per entry point, the best one is reported')
+    args = parser.parse_args()
+    
+    failed = slow = 0
+    for module in sorted(ENTRY_POINTS.keys()):
+        elapsed, budget, heavy = checkEntryPoint(module, args.repeats)
+        failed += 1 if len(heavy) > 0 else 0
+        slow += 1 if elapsed > budget else 0
+        print("%-20s import time = %7.1f ms, budget = %7.1f ms%s, heavy modules: %-20s %s" 
+              % (module, elapsed * 1000, budget * 1000, " (SLOW)" if elapsed > budget else "",
+                 ",".join(heavy) if len(heavy) > 0 else "-", "OK" if len(heavy) == 0 else "FAILED"))
+    print("%d of %d entry points load heavy modules, %d are out of time budget"
+          % (failed, len(ENTRY_POINTS), slow))
+    sys.exit(1 if failed > 0 else 0)
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The test cases to enforce heavy libraries loaded at startup of command line entry points
+
+@author: yaric
+"""
+import os
+import unittest
+
+import startup_benchmark as sb
+
+# The margin over the time budget to tolerate the machine load
+BUDGET_TOLERANCE = 3.
+
+class TestStartupBudgets(unittest.TestCase):
+
+    def test_entry_points_heavy_modules(self):
+        for module in sorted(sb.ENTRY_POINTS.keys()):
+            _, _, heavy = sb.checkEntryPoint(module)
+            self.assertEqual(heavy, [], "Heavy modules loaded at startup of: " + module)
+
+    @unittest.skipIf(os.environ.get("SKIP_STARTUP_TIME") != None, 
+                     "Startup time not checked on slow machines (SKIP_STARTUP_TIME is set)")
+    def test_entry_points_startup_time(self):
+        for module in sorted(sb.ENTRY_POINTS.keys()):
+            elapsed, budget, _ = sb.checkEntryPoint(module, repeats = 3)
+            self.assertLess(elapsed, budget * BUDGET_TOLERANCE, 
+                            "Startup time of %s: %.1f ms out of budget: %.1f ms" % (module, elapsed * 1000, budget * 1000))
+
+    def test_import_time_not_found(self):
+        with self.assertRaisesRegex(Exception, "not found"):
+            # the module loaded at interpreter startup is not reported by -X importtime
+            sb.importTime("os")
+
+    def test_allowed_packages(self):
+        _, budget, heavy = sb.checkEntryPoint("nltk_ngram")
+        self.assertEqual(heavy, [], "Heavy modules loaded by nltk_ngram beyond nltk itself")
+        self.assertGreater(budget, sb.ENTRY_POINTS["nltk_ngram"], "Budget not relative to nltk import time")
+
+    def test_utils_without_pandas(self):
+        _, packages = sb.importTime("utils")
+        self.assertNotIn("pandas", packages, "The pandas should be loaded only for corpora sanity check")
+
+if __name__ == '__main__':
+    unittest.main()
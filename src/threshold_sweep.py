@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The calibration tool of confidence threshold for suggested corrections. The predicted
+probabilities (or the submission generated without threshold) are matched with ground
+truth corrections once and target score with accuracy are calculated for every candidate
+threshold in one vectorized pass. The thresholds per suggested article can be calibrated
+as well and the optimum is written into the model manifest to be used by results_generator.py
+
+@author: yaric
+"""
+import os
+import json
+import argparse
+
+import numpy as np
+
+import evaluate
+import config
+
+ARTICLES = ['a', 'an', 'the']
+
+def submissionArrays(text, correct, submission):
+    """
+    Matches submission with ground truth corrections the same way as evaluate.py does
+    Arguments:
+        text: the text corpora as loaded from JSON
+        correct: the ground truth corrections as loaded from JSON
+        submission: the submission results as loaded from JSON
+    Return:
+        the tuple with arrays of confidence (-inf if no correction suggested), flags whether
+        suggested correction is correct, flags whether article has ground truth correction and
+        suggested article ('' if no correction suggested) per article in corpora
+    """
+    data = []
+    for sent, cor, sub in zip(text, correct, submission):
+        for w, c, s in zip(sent, cor, sub):
+            w = w.lower()
+            if w in ARTICLES:
+                if s is None or s[0] == w:
+                    s = ['', float('-inf')]
+                data.append((s[1], s[0] == c, c is not None, s[0]))
+
+    if len(data) == 0:
+        return (np.zeros(0), np.zeros(0, dtype = bool), np.zeros(0, dtype = bool), np.zeros(0, dtype = '<U3'))
+    confidence, is_correct, is_mistake, suggested = zip(*data)
+    return (np.array(confidence, dtype = np.float64), np.array(is_correct, dtype = bool),
+            np.array(is_mistake, dtype = bool), np.array(suggested, dtype = '<U3'))
+
+def sweepThresholds(confidence, correct, mistake, thresholds = None, fp_rate = 0.02):
+    """
+    Calculates target score and accuracy for every candidate threshold, where suggested
+    correction kept only if its confidence is above threshold. As articles sorted by
+    descending confidence the kept corrections for any threshold form a prefix of the same
+    sorted order, so all thresholds are evaluated from cumulative sums of one sort.
+    Arguments:
+        confidence: the confidence of suggested correction per article, -inf if no correction suggested
+        correct: the flags whether suggested correction equals to the ground truth correction
+        mistake: the flags whether article has ground truth correction
+        thresholds: the candidate thresholds [optional], if None all distinct confidences used
+        fp_rate: the false positive rate level
+    Return:
+        the tuple with arrays of thresholds, target scores and accuracies
+    """
+    confidence = np.asarray(confidence, dtype = np.float64)
+    correct = np.asarray(correct, dtype = bool)
+    mistake = np.asarray(mistake, dtype = bool)
+    if thresholds is None:
+        thresholds = np.concatenate(([float('-inf')], np.unique(confidence[np.isfinite(confidence)])))
+    thresholds = np.asarray(thresholds, dtype = np.float64)
+    n = len(confidence)
+    if n == 0:
+        return (thresholds, np.zeros(len(thresholds)), np.zeros(len(thresholds)))
+
+    # the same order as in evaluate.targetScore
+    order = np.lexsort((mistake, correct, -confidence))
+    neg_confidence = -confidence[order]
+    correct = correct[order]
+    mistake = mistake[order]
+    all_mistakes = mistake.sum()
+    tp = np.cumsum(correct)
+    fp2 = np.cumsum(~correct)
+    gain = tp - np.cumsum(~mistake)
+
+    # the number of kept corrections per threshold
+    kept = np.searchsorted(neg_confidence, -thresholds, side = 'left')
+    # the last position within false positive rate, beyond the kept prefix
+    # only false positives are added, so it is capped by the prefix end
+    last = min(np.searchsorted(fp2, fp_rate * n, side = 'right'), n) - 1
+    index = np.minimum(last, kept - 1)
+    scores = np.zeros(len(thresholds))
+    if all_mistakes > 0:
+        scores = np.where(index >= 0, tp[np.maximum(index, 0)] / all_mistakes, 0.)
+
+    # beyond the kept prefix articles without mistake come first and only decrease the gain
+    best_gain = np.maximum.accumulate(gain)[np.maximum(kept - 1, 0)]
+    best_gain = np.where(kept > 0, best_gain, 0 if mistake.all() else -1)
+    accuracies = np.maximum(0., 1 - (all_mistakes - best_gain) / n)
+    return (thresholds, scores, accuracies)
+
+def applyThresholds(confidence, correct, suggested, thresholds):
+    """
+    Drops suggested corrections with confidence not above the threshold of suggested article
+    Arguments:
+        confidence: the confidence of suggested correction per article
+        correct: the flags whether suggested correction equals to the ground truth correction
+        suggested: the suggested article per article in corpora
+        thresholds: the dictionary with threshold per suggested article
+    Return:
+        the tuple with confidence and correct flags of kept corrections
+    """
+    threshold = np.full(len(confidence), float('-inf'))
+    for article, value in thresholds.items():
+        threshold[suggested == article] = value
+    keep = confidence > threshold
+    return (np.where(keep, confidence, float('-inf')), correct & keep)
+
+def calibrateThresholds(confidence, correct, mistake, suggested = None, per_article = False,
+                        n_candidates = 50, n_rounds = 3, fp_rate = 0.02):
+    """
+    Finds the confidence threshold with the best target score (the accuracy breaks ties)
+    Arguments:
+        confidence: the confidence of suggested correction per article, -inf if no correction suggested
+        correct: the flags whether suggested correction equals to the ground truth correction
+        mistake: the flags whether article has ground truth correction
+        suggested: the suggested article per article in corpora (only for per article thresholds)
+        per_article: the flag to indicate whether to calibrate thresholds per suggested article
+                     with coordinate search started from the best common threshold
+        n_candidates: the number of candidate thresholds per article for coordinate search
+        n_rounds: the number of coordinate search rounds
+        fp_rate: the false positive rate level
+    Return:
+        the dictionary with best common threshold, thresholds per article (None if not
+        calibrated), target score and accuracy
+    """
+    thresholds, scores, accuracies = sweepThresholds(confidence, correct, mistake, fp_rate = fp_rate)
+    best = np.lexsort((accuracies, scores))[-1]
+    result = {"threshold":float(thresholds[best]), "per_article":None,
+              "target_score":float(scores[best]), "accuracy":float(accuracies[best])}
+    print("Common threshold = %.4f: target score = %.2f %%, accuracy = %.2f %% (%d thresholds evaluated)"
+          % (result["threshold"], result["target_score"] * 100, result["accuracy"] * 100, len(thresholds)))
+    if per_article == False:
+        return result
+
+    per_article_thr = {article:result["threshold"] for article in ARTICLES}
+    best_score = (result["target_score"], result["accuracy"])
+    for _ in range(n_rounds):
+        improved = False
+        for article in ARTICLES:
+            article_conf = confidence[(suggested == article) & np.isfinite(confidence)]
+            if len(article_conf) == 0:
+                continue
+            candidates = np.unique(np.concatenate(([float('-inf')],
+                np.quantile(article_conf, np.linspace(0, 1, n_candidates)))))
+            for value in candidates:
+                trial = dict(per_article_thr)
+                trial[article] = float(value)
+                score = evaluate.targetScore(*applyThresholds(confidence, correct, suggested, trial),
+                                             mistake, fp_rate)
+                if score > best_score:
+                    best_score = score
+                    per_article_thr = trial
+                    improved = True
+        if improved == False:
+            break
+
+    result.update({"per_article":per_article_thr,
+                   "target_score":float(best_score[0]), "accuracy":float(best_score[1])})
+    print("Per article thresholds = %s: target score = %.2f %%, accuracy = %.2f %%"
+          % (per_article_thr, best_score[0] * 100, best_score[1] * 100))
+    return result
+
+def saveThresholds(manifest_path, result):
+    """
+    Writes calibrated thresholds into the model manifest, other manifest entries are kept.
+    The -inf threshold (all suggested corrections kept) is not valid JSON number, so it
+    is written as null.
+    Arguments:
+        manifest_path: the path to the model manifest file
+        result: the calibration result returned by calibrateThresholds
+    """
+    manifest = dict()
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    to_json = lambda value: None if value == float('-inf') else value
+    result = dict(result, threshold = to_json(result["threshold"]))
+    if result.get("per_article") != None:
+        result["per_article"] = {article:to_json(value) for article, value in result["per_article"].items()}
+    manifest["confidence_thresholds"] = result
+    with open(manifest_path, mode = 'w') as f:
+        json.dump(manifest, f, indent = 2, allow_nan = False)
+    print("Confidence thresholds saved to: " + manifest_path)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='The calibration of confidence threshold for suggested corrections')
+    parser.add_argument('--submission_file', default=None,
+                        help='the path to the submission results generated without confidence threshold')
+    parser.add_argument('--labels_file', default=None,
+                        help='the path to the predicted labels probabilities Numpy array of features with pos tags')
+    parser.add_argument('--sentences_file', default=config.sentence_validate_path,
+                        help="the text's corpora file")
+    parser.add_argument('--corrections_file', default=config.corrections_validate_path,
+                        help='the path to the file with ground truth corrections')
+    parser.add_argument('--per_article', action='store_true',
+                        help='if set then thresholds calibrated per suggested article')
+    parser.add_argument('--manifest', default=None,
+                        help='the path to the model manifest to write calibrated thresholds into')
+    args = parser.parse_args()
+
+    if (args.submission_file == None) == (args.labels_file == None):
+        raise Exception("Either submission file or labels file should be provided")
+
+    with open(args.sentences_file) as f:
+        text = json.load(f)
+    with open(args.corrections_file) as f:
+        correct = json.load(f)
+    if args.submission_file != None:
+        with open(args.submission_file) as f:
+            submission = json.load(f)
+    else:
+        import results_generator as rg
+        labels = np.load(args.labels_file)
+        predictions = rg.predictionsFromTagLabels(text, labels, thresholds = float('-inf'))
+        submission = rg.submissionFromPredictions(predictions)
+
+    confidence, is_correct, is_mistake, suggested = submissionArrays(text, correct, submission)
+    result = calibrateThresholds(confidence, is_correct, is_mistake, suggested, per_article = args.per_article)
+    if args.manifest != None:
+        saveThresholds(args.manifest, result)
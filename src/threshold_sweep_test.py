@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+The test cases for confidence threshold calibration tool
+
+@author: yaric
+"""
+import json
+import tempfile
+import unittest
+
+import numpy as np
+
+import threshold_sweep as ts
+import results_generator as rg
+import evaluate
+
+class TestThresholdSweepMethods(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        rnd = np.random.RandomState(123)
+        n = 2000
+        cls.suggested = np.array(ts.ARTICLES)[rnd.randint(0, 3, size = n)]
+        # the confidences are rounded to get ties
+        cls.confidence = np.round(rnd.rand(n), 2)
+        cls.confidence[rnd.rand(n) < 0.3] = float('-inf')
+        cls.suggested[np.isinf(cls.confidence)] = ''
+        cls.mistake = rnd.rand(n) < 0.15
+        cls.correct = cls.mistake & np.isfinite(cls.confidence) & (rnd.rand(n) < cls.confidence)
+
+    def test_sweep_thresholds(self):
+        thresholds, scores, accuracies = ts.sweepThresholds(self.confidence, self.correct, self.mistake)
+        self.assertEqual(len(thresholds), len(np.unique(self.confidence)), "Wrong candidate thresholds")
+        for t, score, acc in zip(thresholds, scores, accuracies):
+            keep = self.confidence > t
+            expected = evaluate.targetScore(np.where(keep, self.confidence, float('-inf')),
+                                            self.correct & keep, self.mistake)
+            self.assertAlmostEqual(score, expected[0], 12, "Wrong target score at threshold: %f" % t)
+            self.assertAlmostEqual(acc, expected[1], 12, "Wrong accuracy at threshold: %f" % t)
+
+    def test_calibrate_per_article(self):
+        common = ts.calibrateThresholds(self.confidence, self.correct, self.mistake)
+        result = ts.calibrateThresholds(self.confidence, self.correct, self.mistake, self.suggested,
+                                        per_article = True)
+        self.assertGreaterEqual((result["target_score"], result["accuracy"]),
+                                (common["target_score"], common["accuracy"]), "Per article thresholds should not be worse")
+        score = evaluate.targetScore(*ts.applyThresholds(self.confidence, self.correct, self.suggested,
+                                                         result["per_article"]), self.mistake)
+        self.assertEqual(score, (result["target_score"], result["accuracy"]), "Wrong per article score")
+
+    def test_submission_arrays(self):
+        text = [["It", "is", "a", "dog", "and", "the", "cat", "."]]
+        correct = [[None, None, "the", None, None, None, None, None]]
+        submission = [[None, None, ["the", 0.8], None, None, ["the", 0.9], None, None]]
+        confidence, is_correct, is_mistake, suggested = ts.submissionArrays(text, correct, submission)
+        self.assertEqual(confidence.tolist(), [0.8, float('-inf')], "Wrong confidences")
+        self.assertEqual(is_correct.tolist(), [True, False], "Wrong correct flags")
+        self.assertEqual(is_mistake.tolist(), [True, False], "Wrong mistake flags")
+        self.assertEqual(suggested.tolist(), ["the", ""], "Wrong suggested articles")
+
+    def test_manifest_thresholds(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        path = temp_dir.name + "/threshold_manifest.json"
+        with open(path, mode = 'w') as f:
+            json.dump({"predictor":"RandomForest"}, f)
+        ts.saveThresholds(path, {"threshold":0.3, "per_article":{"a":0.2, "an":float('-inf'), "the":0.5},
+                                 "target_score":0.1, "accuracy":0.9})
+        with open(path) as f:
+            self.assertNotIn("Infinity", f.read(), "Non-standard JSON written to manifest")
+        with open(path) as f:
+            manifest = json.load(f)
+        self.assertEqual(manifest["predictor"], "RandomForest", "Manifest entries should be kept")
+        self.assertIsNone(manifest["confidence_thresholds"]["per_article"]["an"], "-inf threshold not written as null")
+        thresholds = rg.thresholdsFromManifest(path)
+        self.assertEqual(thresholds["an"], float('-inf'), "Null threshold not read as -inf")
+        self.assertEqual(rg.thresholdsFromManifest(path, per_article = False), 0.3, "Wrong common threshold")
+
+        ts.saveThresholds(path, {"threshold":float('-inf'), "per_article":None, "target_score":0.1, "accuracy":0.9})
+        self.assertEqual(rg.thresholdsFromManifest(path), float('-inf'), "Wrong -inf common threshold")
+        ts.saveThresholds(path, {"threshold":0.3, "per_article":{"a":0.2, "an":float('-inf'), "the":0.5},
+                                 "target_score":0.1, "accuracy":0.9})
+
+        text_data = [["It", "is", "a", "dog", "and", "an", "cat", "the", "."]]
+        labels = np.array([[0.1, 0.1, 0.1, 0.7], [0.1, 0.15, 0.75, 0.0], [0.3, 0.1, 0.15, 0.45]])
+        predictions = rg.predictionsFromTagLabels(text_data, labels, thresholds = thresholds)
+        self.assertEqual(predictions[0][2], [3, 0.7], "Correction above threshold should be kept")
+        self.assertEqual(predictions[0][5][0], 2, "Correction above -inf threshold should be kept")
+        self.assertEqual(predictions[0][7], [0, 0], "Correction below threshold should be dropped")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,7 +6,6 @@ Created on Fri Mar 10 21:40:08 2017
 @author: yaric
 """
 import json
-import pandas as pd
     
 import config
 
@@ -41,6 +40,8 @@ def checkDataCorporaSanity(data_dir, corpora_name):
         data_dir: the directory to look for corpora data
         corpora_name: the name of corpora to test
     """
+    import pandas as pd
+    
     corrections_file = "%s/corrections_%s.txt" % (data_dir, corpora_name)
     corpus_file = "%s/sentence_%s.txt" % (data_dir, corpora_name)
     cor_df = pd.read_json(corrections_file, dtype="string")